@@ -0,0 +1,253 @@
+"""
+Prueba de carga de la API
+
+Reproduce contra un servidor en marcha una mezcla de tráfico parecida a la del
+uso real: listados, detalles, dashboard, autoguardados (PUT) y descargas de
+Excel, con --concurrencia clientes durante --duracion segundos. Al terminar
+reporta por operación cantidad de peticiones, errores, rechazos por control de
+admisión (429), latencia p50/p95/p99 y throughput.
+
+Los ids se toman al inicio de los listados de la propia API, por lo que sirve
+tanto con datos reales como con los generados por benchmarks.dataset.
+La descarga de recepciones tiene peso 0 por defecto: cada una tarda decenas de
+segundos en generarse y dominaría la prueba; se activa con --mezcla.
+
+Ejemplos (desde backend/, con el servidor en http://127.0.0.1:8000):
+    python -m benchmarks.carga --duracion 60 --concurrencia 16
+    python -m benchmarks.carga --mezcla dashboard=1,detalle_ot=5,descarga_ot=2 --json resultados.json
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import statistics
+import time
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+# Operación -> peso por defecto en la mezcla
+MEZCLA_POR_DEFECTO = {
+    'listado_recepciones': 12,
+    'detalle_recepcion': 15,
+    'listado_ot': 8,
+    'detalle_ot': 12,
+    'listado_verificaciones': 5,
+    'detalle_verificacion': 8,
+    'dashboard': 10,
+    'autoguardado_ot': 12,
+    'autoguardado_verificacion': 8,
+    'descarga_ot': 5,
+    'descarga_verificacion': 5,
+    'descarga_recepcion': 0,
+}
+
+# Entidad -> listado del que se toman los ids
+LISTADOS = {
+    'recepcion': "/api/ordenes/",
+    'ot': "/api/ot/",
+    'verificacion': "/api/verificacion/",
+}
+TAMANO_PAGINA = 50
+
+# Operación -> entidad de cuyos ids depende
+ENTIDAD_OPERACION = {
+    'listado_recepciones': 'recepcion', 'detalle_recepcion': 'recepcion', 'descarga_recepcion': 'recepcion',
+    'listado_ot': 'ot', 'detalle_ot': 'ot', 'autoguardado_ot': 'ot', 'descarga_ot': 'ot',
+    'listado_verificaciones': 'verificacion', 'detalle_verificacion': 'verificacion',
+    'autoguardado_verificacion': 'verificacion', 'descarga_verificacion': 'verificacion',
+}
+
+Peticion = Tuple[str, str, Optional[Dict[str, Any]]]
+
+
+class Escenario:
+    """Arma cada petición de la mezcla a partir de los ids disponibles"""
+    
+    def __init__(self, ids: Dict[str, List[int]], rng: random.Random):
+        self.ids = ids
+        self.rng = rng
+        self.operaciones: Dict[str, Callable[[], Peticion]] = {
+            'listado_recepciones': lambda: ("GET", self._pagina(LISTADOS['recepcion'], 'recepcion'), None),
+            'detalle_recepcion': lambda: ("GET", f"/api/ordenes/{self._id('recepcion')}", None),
+            'listado_ot': lambda: ("GET", self._pagina(LISTADOS['ot'], 'ot'), None),
+            'detalle_ot': lambda: ("GET", f"/api/ot/{self._id('ot')}", None),
+            'listado_verificaciones': lambda: ("GET", self._pagina(LISTADOS['verificacion'], 'verificacion'), None),
+            'detalle_verificacion': lambda: ("GET", f"/api/verificacion/{self._id('verificacion')}", None),
+            'dashboard': lambda: ("GET", "/api/dashboard/stats", None),
+            'autoguardado_ot': lambda: (
+                "PUT", f"/api/ot/{self._id('ot')}", {'observaciones': f"Autoguardado {time.time():.3f}"}
+            ),
+            'autoguardado_verificacion': lambda: (
+                "PUT", f"/api/verificacion/{self._id('verificacion')}",
+                {'verificado_por': f"TEC-{self.rng.randint(1, 12):02d}"}
+            ),
+            'descarga_ot': lambda: ("GET", f"/api/ot/{self._id('ot')}/excel", None),
+            'descarga_verificacion': lambda: (
+                "GET", f"/api/verificacion/{self._id('verificacion')}/descargar-excel", None
+            ),
+            'descarga_recepcion': lambda: ("GET", f"/api/ordenes/{self._id('recepcion')}/excel", None),
+        }
+    
+    def _id(self, entidad: str) -> int:
+        return self.rng.choice(self.ids[entidad])
+    
+    def _pagina(self, ruta: str, entidad: str) -> str:
+        paginas = max(1, len(self.ids[entidad]) // TAMANO_PAGINA)
+        return f"{ruta}?skip={self.rng.randrange(paginas) * TAMANO_PAGINA}&limit={TAMANO_PAGINA}"
+    
+    def disponible(self, operacion: str) -> bool:
+        """Las operaciones sobre una entidad sin datos se excluyen de la mezcla"""
+        entidad = ENTIDAD_OPERACION.get(operacion)
+        return entidad is None or bool(self.ids[entidad])
+
+
+async def descubrir_ids(cliente: httpx.AsyncClient, max_ids: int) -> Dict[str, List[int]]:
+    """Recorrer los listados de la API hasta juntar max_ids ids por entidad"""
+    ids: Dict[str, List[int]] = {}
+    for entidad, ruta in LISTADOS.items():
+        ids[entidad] = []
+        while len(ids[entidad]) < max_ids:
+            respuesta = await cliente.get(ruta, params={'skip': len(ids[entidad]), 'limit': 500})
+            respuesta.raise_for_status()
+            pagina = [fila['id'] for fila in respuesta.json()]
+            ids[entidad].extend(pagina)
+            if len(pagina) < 500:
+                break
+    return ids
+
+
+def percentil(valores: List[float], p: float) -> float:
+    """Percentil por rango más cercano sobre una lista ordenada"""
+    if not valores:
+        return 0.0
+    return valores[max(0, math.ceil(p / 100 * len(valores)) - 1)]
+
+
+class Resultados:
+    """Latencias y errores por operación"""
+    
+    def __init__(self):
+        self.latencias: Dict[str, List[float]] = defaultdict(list)
+        self.errores: Dict[str, int] = defaultdict(int)
+        self.rechazadas: Dict[str, int] = defaultdict(int)
+    
+    def registrar(self, operacion: str, segundos: float, estado: Optional[int]) -> None:
+        self.latencias[operacion].append(segundos)
+        if estado == 429:
+            self.rechazadas[operacion] += 1
+        elif estado is None or estado >= 400:
+            self.errores[operacion] += 1
+    
+    def resumen(self, duracion: float) -> List[Dict[str, Any]]:
+        filas = []
+        todas = []
+        for operacion in sorted(self.latencias):
+            latencias = sorted(self.latencias[operacion])
+            todas.extend(latencias)
+            filas.append(self._fila(operacion, latencias, duracion,
+                                    self.errores[operacion], self.rechazadas[operacion]))
+        filas.append(self._fila('TOTAL', sorted(todas), duracion,
+                                sum(self.errores.values()), sum(self.rechazadas.values())))
+        return filas
+    
+    @staticmethod
+    def _fila(operacion: str, latencias: List[float], duracion: float, errores: int, rechazadas: int) -> Dict[str, Any]:
+        return {
+            'operacion': operacion,
+            'peticiones': len(latencias),
+            'errores': errores,
+            'rechazadas_429': rechazadas,
+            'p50_ms': round(1000 * percentil(latencias, 50), 1),
+            'p95_ms': round(1000 * percentil(latencias, 95), 1),
+            'p99_ms': round(1000 * percentil(latencias, 99), 1),
+            'media_ms': round(1000 * statistics.fmean(latencias), 1) if latencias else 0.0,
+            'throughput_rps': round(len(latencias) / duracion, 2) if duracion else 0.0
+        }
+
+
+async def cliente_virtual(cliente: httpx.AsyncClient, escenario: Escenario, operaciones: List[str],
+                          pesos: List[int], fin: float, resultados: Resultados, pausa: float) -> None:
+    while time.monotonic() < fin:
+        operacion = escenario.rng.choices(operaciones, weights=pesos)[0]
+        metodo, ruta, cuerpo = escenario.operaciones[operacion]()
+        inicio = time.perf_counter()
+        try:
+            respuesta = await cliente.request(metodo, ruta, json=cuerpo)
+            await respuesta.aread()
+            estado = respuesta.status_code
+        except httpx.HTTPError:
+            estado = None
+        resultados.registrar(operacion, time.perf_counter() - inicio, estado)
+        if pausa:
+            await asyncio.sleep(escenario.rng.uniform(0, 2 * pausa))
+
+
+def leer_mezcla(texto: Optional[str]) -> Dict[str, int]:
+    mezcla = dict(MEZCLA_POR_DEFECTO)
+    if texto:
+        mezcla = {operacion: 0 for operacion in MEZCLA_POR_DEFECTO}
+        for parte in texto.split(','):
+            operacion, _, peso = parte.partition('=')
+            operacion = operacion.strip()
+            if operacion not in MEZCLA_POR_DEFECTO:
+                raise SystemExit(f"Operación desconocida: {operacion} (opciones: {', '.join(MEZCLA_POR_DEFECTO)})")
+            mezcla[operacion] = int(peso or 1)
+    return mezcla
+
+
+def imprimir_tabla(filas: List[Dict[str, Any]]) -> None:
+    print(f"{'operación':<27}{'peticiones':>11}{'errores':>9}{'429':>6}{'p50 ms':>10}{'p95 ms':>10}"
+          f"{'p99 ms':>10}{'req/s':>9}")
+    for f in filas:
+        print(f"{f['operacion']:<27}{f['peticiones']:>11}{f['errores']:>9}{f['rechazadas_429']:>6}"
+              f"{f['p50_ms']:>10.1f}{f['p95_ms']:>10.1f}{f['p99_ms']:>10.1f}{f['throughput_rps']:>9.2f}")
+
+
+async def ejecutar(args) -> List[Dict[str, Any]]:
+    limites = httpx.Limits(max_connections=args.concurrencia, max_keepalive_connections=args.concurrencia)
+    async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout, limits=limites) as cliente:
+        ids = await descubrir_ids(cliente, args.max_ids)
+        print("Ids disponibles: " + ", ".join(f"{entidad} {len(valores)}" for entidad, valores in ids.items()))
+        
+        escenario = Escenario(ids, random.Random(args.semilla))
+        mezcla = {op: peso for op, peso in leer_mezcla(args.mezcla).items() if peso > 0 and escenario.disponible(op)}
+        if not mezcla:
+            raise SystemExit("La mezcla no tiene operaciones con datos disponibles")
+        
+        resultados = Resultados()
+        inicio = time.monotonic()
+        fin = inicio + args.duracion
+        await asyncio.gather(*(
+            cliente_virtual(cliente, escenario, list(mezcla), list(mezcla.values()), fin, resultados, args.pausa)
+            for _ in range(args.concurrencia)
+        ))
+        return resultados.resumen(time.monotonic() - inicio)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Prueba de carga de la API con una mezcla de tráfico realista")
+    parser.add_argument('--url', default="http://127.0.0.1:8000")
+    parser.add_argument('--concurrencia', type=int, default=16, help="Clientes virtuales simultáneos")
+    parser.add_argument('--duracion', type=float, default=60, help="Segundos de prueba")
+    parser.add_argument('--pausa', type=float, default=0.0,
+                        help="Pausa media entre peticiones de cada cliente en segundos (0 = sin pausa)")
+    parser.add_argument('--mezcla', help="Pesos por operación, p. ej. detalle_ot=5,descarga_ot=1 (el resto queda en 0)")
+    parser.add_argument('--max-ids', type=int, default=5000, help="Ids por entidad tomados de los listados")
+    parser.add_argument('--timeout', type=float, default=120)
+    parser.add_argument('--semilla', type=int, default=42)
+    parser.add_argument('--json', help="Guardar el resumen en este archivo")
+    args = parser.parse_args(argv)
+    
+    filas = asyncio.run(ejecutar(args))
+    imprimir_tabla(filas)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'parametros': vars(args), 'resultados': filas}, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
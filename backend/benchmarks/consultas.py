@@ -0,0 +1,126 @@
+"""
+Presupuesto de consultas SQL por endpoint
+
+Carga un conjunto de datos sintético chico (benchmarks.dataset) en una base
+SQLite temporal, llama a los endpoints de lectura con TestClient y compara la
+cantidad de consultas de cada uno (header X-DB-Queries) con su presupuesto.
+Termina con código 1 si alguno lo supera, de modo que un N+1 nuevo (una
+consulta por fila de un listado, una relación cargada de forma perezosa en un
+response model...) hace fallar CI.
+
+Los listados se piden con más filas que las de cualquier presupuesto, para que
+una consulta por fila no pase inadvertida. Al corregir un N+1 conviene bajar
+el presupuesto correspondiente.
+
+Ejemplos (desde backend/):
+    python -m benchmarks.consultas
+    python -m benchmarks.consultas --verbose
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Base propia: se define antes de importar la aplicación y sus módulos
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.chdir(BACKEND_DIR)
+sys.path.insert(0, BACKEND_DIR)
+_DIRECTORIO = tempfile.mkdtemp(prefix="bench_consultas_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_DIRECTORIO, 'consultas.db')}"
+os.environ.setdefault("OUTPUT_DIR", os.path.join(_DIRECTORIO, "output"))
+os.environ.setdefault("PRERENDER_ENABLED", "false")
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from benchmarks.dataset import cargar  # noqa: E402
+from main import app  # noqa: E402
+
+FILAS_LISTADO = 50
+
+# (nombre, ruta a partir de los ids de cada entidad, presupuesto de consultas)
+# Los endpoints de lectura usan la sesión async y cargan cada relación de la
+# respuesta con selectinload: una consulta para las filas y otra por relación
+PRESUPUESTOS: List[Tuple[str, Callable[[Dict[str, int]], str], int]] = [
+    ('dashboard', lambda ids: "/api/dashboard/stats", 4),
+    ('listado_recepciones', lambda ids: f"/api/ordenes/?limit={FILAS_LISTADO}", 2),
+    ('detalle_recepcion', lambda ids: f"/api/ordenes/{ids['recepcion']}", 2),
+    ('listado_ot', lambda ids: f"/api/ot/?limit={FILAS_LISTADO}", 2),
+    ('detalle_ot', lambda ids: f"/api/ot/{ids['ot']}", 2),
+    ('listado_controles', lambda ids: f"/api/concreto/controles?limit={FILAS_LISTADO}", 2),
+    ('detalle_control', lambda ids: f"/api/concreto/control/{ids['control']}", 2),
+    ('listado_verificaciones', lambda ids: f"/api/verificacion/?limit={FILAS_LISTADO}", 2),
+    ('detalle_verificacion', lambda ids: f"/api/verificacion/{ids['verificacion']}", 2),
+    ('estadisticas_verificacion', lambda ids: "/api/verificacion/estadisticas", 1),
+]
+
+LISTADOS = {
+    'recepcion': "/api/ordenes/",
+    'ot': "/api/ot/",
+    'control': "/api/concreto/controles",
+    'verificacion': "/api/verificacion/",
+}
+
+
+def primeros_ids(cliente: TestClient) -> Dict[str, int]:
+    ids = {}
+    for entidad, ruta in LISTADOS.items():
+        respuesta = cliente.get(ruta, params={'limit': 1})
+        respuesta.raise_for_status()
+        ids[entidad] = respuesta.json()[0]['id']
+    return ids
+
+
+def medir(cliente: TestClient, verbose: bool) -> List[Dict[str, object]]:
+    ids = primeros_ids(cliente)
+    resultados = []
+    for nombre, ruta, presupuesto in PRESUPUESTOS:
+        respuesta = cliente.get(ruta(ids))
+        consultas = int(respuesta.headers.get('x-db-queries', -1))
+        resultados.append({
+            'endpoint': nombre,
+            'estado': respuesta.status_code,
+            'consultas': consultas,
+            'presupuesto': presupuesto,
+            'db_ms': float(respuesta.headers.get('x-db-time-ms', 0)),
+        })
+        if verbose:
+            print(f"GET {ruta(ids)} -> {respuesta.status_code}, {consultas} consultas")
+    return resultados
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Verificar el presupuesto de consultas SQL por endpoint")
+    parser.add_argument('--recepciones', type=int, default=2 * FILAS_LISTADO,
+                        help="Recepciones del conjunto de datos (controles y verificaciones: la mitad)")
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args(argv)
+    
+    cargar(recepciones=args.recepciones, controles=args.recepciones // 2, verificaciones=args.recepciones // 2,
+           max_items=20, lote=500, prefijo="QRY", semilla=42)
+    
+    with TestClient(app) as cliente:
+        resultados = medir(cliente, args.verbose)
+    
+    print(f"{'endpoint':<28}{'estado':>7}{'consultas':>11}{'presupuesto':>13}{'db ms':>9}")
+    fallas = []
+    for r in resultados:
+        print(f"{r['endpoint']:<28}{r['estado']:>7}{r['consultas']:>11}{r['presupuesto']:>13}{r['db_ms']:>9.1f}")
+        if r['estado'] != 200:
+            fallas.append(f"{r['endpoint']}: respondió {r['estado']}")
+        elif r['consultas'] < 0:
+            fallas.append(f"{r['endpoint']}: sin header X-DB-Queries (SQL_INSTRUMENTATION_ENABLED=false?)")
+        elif r['consultas'] > r['presupuesto']:
+            fallas.append(f"{r['endpoint']}: {r['consultas']} consultas, presupuesto {r['presupuesto']}")
+    
+    if fallas:
+        print("\nPresupuestos superados:")
+        for falla in fallas:
+            print(f"  {falla}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,270 @@
+"""
+Generador de datos sintéticos para pruebas de volumen
+
+Carga en la base de datos configurada (DATABASE_URL, SQLite o PostgreSQL)
+recepciones con sus muestras, órdenes de trabajo con sus items, controles de
+concreto con sus probetas y verificaciones con sus muestras verificadas.
+La cantidad de items por documento sigue una distribución sesgada hacia
+documentos chicos (como en producción) entre 1 y --max-items.
+
+Las filas se insertan por lotes con INSERT multi-fila de SQLAlchemy Core, con
+ids asignados a partir del máximo existente, por lo que el generador puede
+ejecutarse sobre una base con datos; los números de OT, control y verificación
+llevan el prefijo --prefijo para no chocar con los reales.
+
+Ejemplos (desde backend/):
+    DATABASE_URL=sqlite:///./volumen.db python -m benchmarks.dataset --recepciones 100000
+    python -m benchmarks.dataset --recepciones 5000 --controles 500 --verificaciones 500 --semilla 7
+"""
+
+import argparse
+import logging
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from sqlalchemy import func, select, text  # noqa: E402
+
+from database import Base, engine  # noqa: E402
+from models import (  # noqa: E402
+    RecepcionMuestra, MuestraConcreto, OrdenTrabajo, ItemOrdenTrabajo,
+    ControlConcreto, ProbetaConcreto, VerificacionMuestras, MuestraVerificada
+)
+
+logger = logging.getLogger(__name__)
+
+CLIENTES = [
+    'CONSTRUCTORA ANDINA S.A.C.', 'INMOBILIARIA DEL PACÍFICO S.A.', 'CONSORCIO VIAL SUR',
+    'EDIFICACIONES LIMA NORTE E.I.R.L.', 'MUNICIPALIDAD DISTRITAL DE PRUEBA', 'OBRAS CIVILES DEL CENTRO S.A.C.'
+]
+ESTRUCTURAS = ['Columna', 'Viga', 'Losa', 'Zapata', 'Placa', 'Muro']
+ESTADOS = ['PENDIENTE', 'PENDIENTE', 'EN_PROCESO', 'COMPLETADA']
+TIPOS_TESTIGO = ['6in x 12in', '4in x 8in', 'Diamantina']
+FECHA_INICIO = datetime(2023, 1, 1)
+
+
+class Generador:
+    """Construye las filas de cada tabla con ids consecutivos desde el máximo existente"""
+    
+    def __init__(self, conn, prefijo: str, max_items: int, rng: random.Random):
+        self.prefijo = prefijo
+        self.max_items = max_items
+        self.rng = rng
+        self._siguiente = {
+            tabla: (conn.execute(select(func.max(tabla.c.id))).scalar() or 0) + 1
+            for tabla in TABLAS
+        }
+    
+    def _id(self, tabla) -> int:
+        valor = self._siguiente[tabla]
+        self._siguiente[tabla] += 1
+        return valor
+    
+    def cantidad_items(self) -> int:
+        # Exponencial con media ~17 truncada a [1, max_items]
+        return min(self.max_items, 1 + int(self.rng.expovariate(1 / 16)))
+    
+    def fecha(self) -> datetime:
+        return FECHA_INICIO + timedelta(minutes=self.rng.randrange(3 * 365 * 24 * 60))
+    
+    def recepcion(self, filas: Dict[Any, List[dict]]) -> None:
+        recepcion_id = self._id(RecepcionMuestra.__table__)
+        creada = self.fecha()
+        cliente = self.rng.choice(CLIENTES)
+        numero_ot = f"{self.prefijo}-{recepcion_id}-25"
+        numero_recepcion = f"{self.prefijo}-REC-{recepcion_id}"
+        filas[RecepcionMuestra.__table__].append({
+            'id': recepcion_id, 'numero_ot': numero_ot, 'numero_recepcion': numero_recepcion,
+            'numero_cotizacion': f"COT-{recepcion_id % 9000 + 1000}-25",
+            'cliente': cliente, 'domicilio_legal': 'Av. Los Ingenieros 123, Lima', 'ruc': f"20{recepcion_id:09d}",
+            'persona_contacto': 'Juan Pérez', 'email': 'contacto@example.com', 'telefono': '999888777',
+            'solicitante': cliente, 'domicilio_solicitante': 'Av. Los Ingenieros 123, Lima',
+            'proyecto': f"Proyecto {recepcion_id % 500}", 'ubicacion': 'Lima',
+            'fecha_recepcion': creada, 'fecha_estimada_culminacion': creada + timedelta(days=28),
+            'emision_fisica': self.rng.random() < 0.5, 'emision_digital': True,
+            'entregado_por': 'Cliente', 'recibido_por': 'Laboratorio',
+            'codigo_laboratorio': 'F-LEM-P-01.02', 'version': '07',
+            'fecha_creacion': creada, 'estado': self.rng.choice(ESTADOS)
+        })
+        
+        n = self.cantidad_items()
+        for item in range(1, n + 1):
+            edad = self.rng.choice((7, 14, 28))
+            moldeo = creada - timedelta(days=self.rng.randint(0, 3))
+            filas[MuestraConcreto.__table__].append({
+                'id': self._id(MuestraConcreto.__table__), 'recepcion_id': recepcion_id, 'item_numero': item,
+                'codigo_muestra': f"M-{item:03d}", 'codigo_muestra_lem': f"{recepcion_id}-{item}-CO-25",
+                'identificacion_muestra': f"Probeta {item}", 'estructura': self.rng.choice(ESTRUCTURAS),
+                'fc_kg_cm2': self.rng.choice((175.0, 210.0, 280.0, 350.0)),
+                'fecha_moldeo': moldeo.strftime('%d/%m/%Y'), 'hora_moldeo': moldeo.strftime('%H:%M'),
+                'edad': edad, 'fecha_rotura': (moldeo + timedelta(days=edad)).strftime('%d/%m/%Y'),
+                'requiere_densidad': self.rng.random() < 0.1, 'fecha_creacion': creada
+            })
+        
+        ot_id = self._id(OrdenTrabajo.__table__)
+        filas[OrdenTrabajo.__table__].append({
+            'id': ot_id, 'numero_ot': numero_ot, 'numero_recepcion': numero_recepcion,
+            'fecha_recepcion': creada, 'plazo_entrega_dias': 28,
+            'fecha_inicio_programado': creada + timedelta(days=1),
+            'fecha_fin_programado': creada + timedelta(days=28),
+            'aperturada_por': 'Laboratorio', 'designada_a': 'Técnico', 'estado': self.rng.choice(ESTADOS),
+            'codigo_laboratorio': 'F-LEM-P-02.01', 'version': '03', 'fecha_creacion': creada
+        })
+        for item in range(1, n + 1):
+            filas[ItemOrdenTrabajo.__table__].append({
+                'id': self._id(ItemOrdenTrabajo.__table__), 'orden_trabajo_id': ot_id, 'item_numero': item,
+                'codigo_muestra': f"{recepcion_id}-{item}-CO-25",
+                'descripcion': 'Ensayo de compresión de probeta cilíndrica', 'cantidad': 1,
+                'fecha_creacion': creada
+            })
+    
+    def control(self, filas: Dict[Any, List[dict]]) -> None:
+        control_id = self._id(ControlConcreto.__table__)
+        creado = self.fecha()
+        filas[ControlConcreto.__table__].append({
+            'id': control_id, 'numero_control': f"{self.prefijo}-CTRL-{control_id}",
+            'codigo_documento': 'F-LEM-P-01.09', 'version': '04',
+            'fecha_documento': creado.strftime('%d/%m/%Y'), 'pagina': '1 de 1', 'fecha_creacion': creado
+        })
+        for item in range(1, self.cantidad_items() + 1):
+            filas[ProbetaConcreto.__table__].append({
+                'id': self._id(ProbetaConcreto.__table__), 'control_id': control_id, 'item_numero': item,
+                'orden_trabajo': f"{self.prefijo}-{control_id}-25", 'codigo_muestra': f"{control_id}-{item}-CO-25",
+                'codigo_muestra_cliente': f"M-{item:03d}",
+                'fecha_rotura': (creado + timedelta(days=28)).strftime('%d/%m/%Y'),
+                'elemento': self.rng.choice(TIPOS_TESTIGO[:2]), 'fc_kg_cm2': 210.0,
+                'status_ensayado': self.rng.choice(('PENDIENTE', 'ROTURADO')), 'fecha_creacion': creado
+            })
+    
+    def verificacion(self, filas: Dict[Any, List[dict]]) -> None:
+        verificacion_id = self._id(VerificacionMuestras.__table__)
+        creada = self.fecha()
+        filas[VerificacionMuestras.__table__].append({
+            'id': verificacion_id, 'numero_verificacion': f"{self.prefijo}-V-{verificacion_id}",
+            'codigo_documento': 'F-LEM-P-01.12', 'version': '03',
+            'fecha_documento': creada.strftime('%d/%m/%Y'), 'pagina': '1 de 1',
+            'verificado_por': f"TEC-{verificacion_id % 12:02d}", 'fecha_verificacion': creada.strftime('%d/%m/%Y'),
+            'cliente': self.rng.choice(CLIENTES), 'equipo_bernier': 'EQ-01', 'equipo_lainas_1': 'EQ-02',
+            'equipo_lainas_2': 'EQ-03', 'equipo_escuadra': 'EQ-04', 'equipo_balanza': 'EQ-05',
+            'fecha_creacion': creada
+        })
+        for item in range(1, self.cantidad_items() + 1):
+            diametro_1 = round(self.rng.gauss(150, 0.8), 1)
+            diametro_2 = round(self.rng.gauss(150, 0.8), 1)
+            tolerancia = round(abs(diametro_1 - diametro_2) / min(diametro_1, diametro_2) * 100, 2)
+            cumple = tolerancia <= 2
+            planitud = self.rng.random() > 0.05
+            filas[MuestraVerificada.__table__].append({
+                'id': self._id(MuestraVerificada.__table__), 'verificacion_id': verificacion_id, 'item_numero': item,
+                'codigo_lem': f"{verificacion_id}-{item}-CO-25", 'codigo_cliente': f"M-{item:03d}",
+                'tipo_testigo': self.rng.choice(TIPOS_TESTIGO), 'diametro_1_mm': diametro_1, 'diametro_2_mm': diametro_2,
+                'tolerancia_porcentaje': tolerancia, 'cumple_tolerancia': cumple,
+                'aceptacion_diametro': 'Cumple' if cumple else 'No cumple',
+                'perpendicularidad_sup1': True, 'perpendicularidad_sup2': True,
+                'perpendicularidad_inf1': True, 'perpendicularidad_inf2': True, 'perpendicularidad_medida': True,
+                'perpendicularidad_cumple': True, 'planitud_medida': planitud,
+                'planitud_superior_aceptacion': 'Cumple' if planitud else 'No cumple',
+                'planitud_inferior_aceptacion': 'Cumple', 'planitud_depresiones_aceptacion': 'Cumple',
+                'accion_realizar': '-' if planitud else 'Refrentar', 'conformidad': 'Ensayar',
+                'conformidad_correccion': True,
+                'longitud_1_mm': round(self.rng.gauss(300, 1), 1), 'longitud_2_mm': round(self.rng.gauss(300, 1), 1),
+                'longitud_3_mm': round(self.rng.gauss(300, 1), 1), 'fecha_creacion': creada
+            })
+
+
+# Orden de inserción: padres antes que hijos
+TABLAS = [
+    RecepcionMuestra.__table__, MuestraConcreto.__table__,
+    OrdenTrabajo.__table__, ItemOrdenTrabajo.__table__,
+    ControlConcreto.__table__, ProbetaConcreto.__table__,
+    VerificacionMuestras.__table__, MuestraVerificada.__table__,
+]
+
+
+def _insertar(conn, filas: Dict[Any, List[dict]]) -> int:
+    total = 0
+    for tabla in TABLAS:
+        if filas[tabla]:
+            conn.execute(tabla.insert(), filas[tabla])
+            total += len(filas[tabla])
+            filas[tabla] = []
+    return total
+
+
+def _ajustar_secuencias(conn) -> None:
+    """En PostgreSQL las secuencias de los ids no avanzan con ids explícitos"""
+    for tabla in TABLAS:
+        conn.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{tabla.name}', 'id'), "
+            f"COALESCE((SELECT MAX(id) FROM {tabla.name}), 1))"
+        ))
+
+
+def cargar(recepciones: int, controles: int, verificaciones: int, max_items: int,
+           lote: int, prefijo: str, semilla: int) -> None:
+    Base.metadata.create_all(bind=engine)
+    rng = random.Random(semilla)
+    inicio = time.monotonic()
+    filas_totales = 0
+    
+    with engine.connect() as conn:
+        if engine.dialect.name == "sqlite":
+            # Carga masiva: menos fsync; el archivo queda en WAL como en el servidor
+            conn.execute(text("PRAGMA journal_mode=WAL"))
+            conn.execute(text("PRAGMA synchronous=OFF"))
+        generador = Generador(conn, prefijo, max_items, rng)
+        conn.commit()
+        
+        for cantidad, crear in ((recepciones, generador.recepcion),
+                                (controles, generador.control),
+                                (verificaciones, generador.verificacion)):
+            filas: Dict[Any, List[dict]] = {tabla: [] for tabla in TABLAS}
+            for numero in range(1, cantidad + 1):
+                crear(filas)
+                if numero % lote == 0 or numero == cantidad:
+                    filas_totales += _insertar(conn, filas)
+                    conn.commit()
+                    logger.info(
+                        f"{crear.__name__}: {numero}/{cantidad} "
+                        f"({filas_totales} filas, {filas_totales / (time.monotonic() - inicio):.0f} filas/s)"
+                    )
+        
+        if engine.dialect.name == "postgresql":
+            _ajustar_secuencias(conn)
+            conn.commit()
+    
+    logger.info(f"Carga terminada: {filas_totales} filas en {time.monotonic() - inicio:.1f} s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Generar un conjunto de datos sintético para pruebas de volumen")
+    parser.add_argument('--recepciones', type=int, default=100000, help="Recepciones (cada una con su OT)")
+    parser.add_argument('--controles', type=int, help="Controles de concreto (por defecto recepciones / 10)")
+    parser.add_argument('--verificaciones', type=int, help="Verificaciones (por defecto recepciones / 10)")
+    parser.add_argument('--max-items', type=int, default=150, help="Máximo de items por documento")
+    parser.add_argument('--lote', type=int, default=500, help="Documentos por transacción")
+    parser.add_argument('--prefijo', default="SYN", help="Prefijo de los números de documento")
+    parser.add_argument('--semilla', type=int, default=42)
+    args = parser.parse_args()
+    
+    cargar(
+        recepciones=args.recepciones,
+        controles=args.recepciones // 10 if args.controles is None else args.controles,
+        verificaciones=args.recepciones // 10 if args.verificaciones is None else args.verificaciones,
+        max_items=max(1, args.max_items),
+        lote=max(1, args.lote),
+        prefijo=args.prefijo,
+        semilla=args.semilla
+    )
+
+
+if __name__ == "__main__":
+    # Solo como script: importado (p. ej. desde benchmarks.consultas) usa la configuración de quien lo importa
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    main()
@@ -0,0 +1,115 @@
+"""
+Datos sintéticos de los documentos (recepción, orden de trabajo, control de
+concreto y verificación) con n items, con la misma forma que los que prepara
+services.datos_documentos; sin base de datos. Los usan el benchmark de Excel
+y las pruebas.
+"""
+
+from datetime import date, timedelta
+from types import SimpleNamespace
+from typing import Any, Callable, Dict
+
+from models import MuestraVerificada, VerificacionMuestras
+
+TIPOS = ('recepcion', 'ot', 'control', 'verificacion')
+FECHA_BASE = date(2025, 3, 3)
+
+
+def _fecha(dias: int) -> str:
+    return (FECHA_BASE + timedelta(days=dias)).strftime('%d/%m/%Y')
+
+
+def datos_recepcion(n: int) -> Dict[str, Any]:
+    recepcion = {
+        'numero_ot': 'BENCH-OT-25', 'numero_recepcion': 'BENCH-REC-25', 'numero_cotizacion': 'COT-0001-25',
+        'cliente': 'CONSTRUCTORA DE PRUEBA S.A.C.', 'domicilio_legal': 'Av. Los Ingenieros 123, Lima',
+        'ruc': '20123456789', 'persona_contacto': 'Juan Pérez', 'email': 'contacto@example.com',
+        'telefono': '999888777', 'solicitante': 'CONSTRUCTORA DE PRUEBA S.A.C.',
+        'domicilio_solicitante': 'Av. Los Ingenieros 123, Lima', 'proyecto': 'Edificio multifamiliar',
+        'ubicacion': 'Lima', 'fecha_recepcion': _fecha(0), 'fecha_estimada_culminacion': _fecha(28),
+        'emision_fisica': True, 'emision_digital': True, 'entregado_por': 'Cliente',
+        'recibido_por': 'Laboratorio', 'codigo_laboratorio': 'F-LEM-P-01.02', 'version': '07'
+    }
+    muestras = [{
+        'item_numero': i,
+        'codigo_muestra_lem': f"{i}-CO-25",
+        'codigo_muestra': f"M-{i:04d}",
+        'identificacion_muestra': f"Probeta {i}",
+        'estructura': 'Columna' if i % 2 else 'Losa',
+        'fc_kg_cm2': 210 + 70 * (i % 3),
+        'fecha_moldeo': _fecha(-7),
+        'hora_moldeo': '08:30',
+        'edad': (7, 14, 28)[i % 3],
+        'fecha_rotura': _fecha((7, 14, 28)[i % 3] - 7),
+        'requiere_densidad': i % 5 == 0
+    } for i in range(1, n + 1)]
+    return {'recepcion': recepcion, 'muestras': muestras}
+
+
+def datos_ot(n: int) -> Dict[str, Any]:
+    ot = {
+        'numero_ot': 'BENCH-OT-25', 'numero_recepcion': 'BENCH-REC-25', 'fecha_recepcion': _fecha(0),
+        'plazo_entrega_dias': 28, 'fecha_inicio_programado': _fecha(1), 'fecha_fin_programado': _fecha(28),
+        'fecha_inicio_real': _fecha(1), 'fecha_fin_real': _fecha(29), 'variacion_inicio': 0,
+        'variacion_fin': 1, 'duracion_real_dias': 28, 'observaciones': 'Generado para benchmark',
+        'aperturada_por': 'Laboratorio', 'designada_a': 'Técnico', 'estado': 'PENDIENTE',
+        'codigo_laboratorio': 'F-LEM-P-02.01', 'version': '03'
+    }
+    items = [{
+        'item_numero': i,
+        'codigo_muestra': f"{i}-CO-25",
+        'descripcion': 'Ensayo de compresión de probeta cilíndrica',
+        'cantidad': 1 + i % 3
+    } for i in range(1, n + 1)]
+    return {'ot': ot, 'items': items}
+
+
+def datos_control(n: int) -> Dict[str, Any]:
+    probetas = [{
+        'item_numero': i,
+        'orden_trabajo': 'BENCH-OT-25',
+        'codigo_muestra': f"{i}-CO-25",
+        'codigo_muestra_cliente': f"M-{i:04d}",
+        'fecha_rotura': _fecha(28),
+        'elemento': '6in x 12in' if i % 2 else '4in x 8in',
+        'fc_kg_cm2': 210 + 70 * (i % 3),
+        'status_ensayado': 'PENDIENTE'
+    } for i in range(1, n + 1)]
+    cliente = {'codigo_documento': 'F-LEM-P-01.09', 'version': '03', 'fecha_documento': _fecha(0), 'pagina': '1 de 1'}
+    return {'probetas': probetas, 'cliente': cliente}
+
+
+def datos_verificacion(n: int) -> Dict[str, Any]:
+    # Mismos atributos que preparar_datos_verificacion obtiene de los modelos
+    base_muestra = {columna.key: None for columna in MuestraVerificada.__table__.columns}
+    muestras = [SimpleNamespace(**dict(
+        base_muestra,
+        id=i, item_numero=i, codigo_lem=f"{i}-CO-25", codigo_cliente=f"M-{i:04d}",
+        tipo_testigo='6in x 12in' if i % 2 else '4in x 8in',
+        diametro_1_mm=150.2, diametro_2_mm=150.9, tolerancia_porcentaje=0.47,
+        aceptacion_diametro='Cumple', cumple_tolerancia=True,
+        perpendicularidad_sup1=True, perpendicularidad_sup2=True,
+        perpendicularidad_inf1=True, perpendicularidad_inf2=i % 7 != 0,
+        perpendicularidad_medida=True, perpendicularidad_cumple=True,
+        planitud_medida=True, planitud_superior_aceptacion='Cumple',
+        planitud_inferior_aceptacion='Cumple', planitud_depresiones_aceptacion='Cumple',
+        accion_realizar='-', conformidad='Ensayar', conformidad_correccion=True,
+        longitud_1_mm=300.1, longitud_2_mm=300.4, longitud_3_mm=299.8, masa_muestra_aire_g=12500.0
+    )) for i in range(1, n + 1)]
+    base = {columna.key: None for columna in VerificacionMuestras.__table__.columns}
+    verificacion = SimpleNamespace(**dict(
+        base,
+        id=1, numero_verificacion='V-BENCH', codigo_documento='F-LEM-P-01.12', version='03',
+        fecha_documento=_fecha(0), pagina='1 de 1', verificado_por='TEC-01', fecha_verificacion=_fecha(0),
+        cliente='CONSTRUCTORA DE PRUEBA S.A.C.', equipo_bernier='EQ-01', equipo_lainas_1='EQ-02',
+        equipo_lainas_2='EQ-03', equipo_escuadra='EQ-04', equipo_balanza='EQ-05', nota='Generado para benchmark'
+    ), muestras_verificadas=muestras)
+    return {'verificacion': verificacion}
+
+
+DATOS: Dict[str, Callable[[int], Dict[str, Any]]] = {
+    'recepcion': datos_recepcion,
+    'ot': datos_ot,
+    'control': datos_control,
+    'verificacion': datos_verificacion,
+}
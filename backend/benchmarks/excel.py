@@ -0,0 +1,214 @@
+"""
+Benchmark de generación de documentos Excel
+
+Genera con datos sintéticos (benchmarks.datos, sin base de datos) los
+documentos de recepción, orden de trabajo, control de concreto y verificación
+para distintas cantidades de items, usando las plantillas del repositorio. Por cada combinación de
+documento, motor, modo de cache y cantidad de items mide el tiempo (mediana de
+las repeticiones), el pico de memoria con tracemalloc (en una ejecución aparte,
+para no distorsionar el tiempo) y el tamaño del archivo generado.
+
+Motores:
+    openpyxl     servicio de Excel usado por la API, documento serializado en memoria
+    archivo      mismo servicio, escrito en un archivo temporal (descargas por streaming)
+    ot_legacy    OTExcelService, la implementación anterior de la OT (solo tipo ot)
+
+Modos de cache:
+    frio         cada repetición genera el documento completo
+    cache        descarga repetida de un documento ya generado: huella de los
+                 datos + acierto en el cache de documentos (PrecargaService)
+
+Con --baseline se comparan los resultados con una ejecución anterior guardada
+con --guardar; el proceso termina con código 1 si algún tiempo o pico de
+memoria supera el de la línea base en más del umbral.
+
+Ejemplos (desde backend/):
+    python -m benchmarks.excel --guardar benchmarks/baseline.json
+    python -m benchmarks.excel --tipo ot --tipo control --items 1,50,500 --baseline benchmarks/baseline.json
+    python -m benchmarks.excel --tipo ot --motor openpyxl --motor ot_legacy --modo frio
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional
+
+# Las plantillas se buscan con rutas relativas a backend/ y los documentos del
+# modo cache se guardan en un directorio temporal propio
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.chdir(BACKEND_DIR)
+sys.path.insert(0, BACKEND_DIR)
+os.environ.setdefault("OUTPUT_DIR", tempfile.mkdtemp(prefix="bench_excel_"))
+
+from benchmarks.datos import DATOS, TIPOS  # noqa: E402
+from services.dossier_service import renderizar_documento, renderizar_documento_en_archivo  # noqa: E402
+from services.ot_excel_service import OTExcelService  # noqa: E402
+from services.precarga_service import PrecargaService  # noqa: E402
+from utils.cache import TTLCache  # noqa: E402
+from utils.workers import cerrar_pool_procesos  # noqa: E402
+
+ITEMS_POR_DEFECTO = (1, 17, 50, 150, 500)
+
+
+# --- Motores ------------------------------------------------------------------
+
+def motor_openpyxl(tipo: str, datos: Dict[str, Any]) -> int:
+    return len(renderizar_documento(tipo, datos))
+
+
+def motor_archivo(tipo: str, datos: Dict[str, Any]) -> int:
+    descriptor, ruta = tempfile.mkstemp(suffix=".xlsx")
+    os.close(descriptor)
+    try:
+        renderizar_documento_en_archivo(tipo, datos, ruta)
+        return os.path.getsize(ruta)
+    finally:
+        os.unlink(ruta)
+
+
+def motor_ot_legacy(tipo: str, datos: Dict[str, Any]) -> int:
+    return len(OTExcelService().generar_excel_ot(datos['ot'], datos['items']))
+
+
+MOTORES: Dict[str, Callable[[str, Dict[str, Any]], int]] = {
+    'openpyxl': motor_openpyxl,
+    'archivo': motor_archivo,
+    'ot_legacy': motor_ot_legacy,
+}
+MODOS = ('frio', 'cache')
+
+
+def soporta(tipo: str, motor: str, modo: str) -> bool:
+    if motor == 'ot_legacy':
+        return tipo == 'ot' and modo == 'frio'
+    # El cache de documentos guarda lo que genera renderizar_documento
+    return modo == 'frio' or motor == 'openpyxl'
+
+
+# --- Medición -----------------------------------------------------------------
+
+def preparar_funcion(tipo: str, motor: str, modo: str, datos: Dict[str, Any]) -> Callable[[], int]:
+    """Función a medir; retorna el tamaño en bytes del documento"""
+    if modo == 'frio':
+        return lambda: MOTORES[motor](tipo, datos)
+    
+    precarga = PrecargaService(espera_segundos=0, max_pendientes=1, cache=TTLCache("bench", 3600, 100))
+    precarga.generar(tipo, 1, datos)  # Como la pre-generación: genera y guarda
+    return lambda: os.path.getsize(precarga.obtener_o_renderizar(tipo, 1, datos))
+
+
+def medir(tipo: str, motor: str, modo: str, n: int, repeticiones: int) -> Dict[str, Any]:
+    datos = DATOS[tipo](n)
+    funcion = preparar_funcion(tipo, motor, modo, datos)
+    
+    tiempos = []
+    tamano = 0
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        tamano = funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    
+    tracemalloc.start()
+    try:
+        funcion()
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    
+    return {
+        'tipo': tipo,
+        'motor': motor,
+        'modo': modo,
+        'items': n,
+        'repeticiones': repeticiones,
+        'tiempo_ms': round(1000 * statistics.median(tiempos), 2),
+        'tiempo_min_ms': round(1000 * min(tiempos), 2),
+        'memoria_pico_kb': round(pico / 1024, 1),
+        'tamano_bytes': tamano
+    }
+
+
+def clave_resultado(resultado: Dict[str, Any]) -> str:
+    return f"{resultado['tipo']}/{resultado['motor']}/{resultado['modo']}/{resultado['items']}"
+
+
+def comparar(resultados: List[Dict[str, Any]], baseline: Dict[str, Dict[str, Any]], umbral: float) -> List[str]:
+    """Regresiones de tiempo o memoria respecto de la línea base"""
+    regresiones = []
+    for resultado in resultados:
+        anterior = baseline.get(clave_resultado(resultado))
+        if not anterior:
+            continue
+        for metrica in ('tiempo_ms', 'memoria_pico_kb'):
+            if anterior[metrica] and resultado[metrica] > anterior[metrica] * (1 + umbral):
+                regresiones.append(
+                    f"{clave_resultado(resultado)} {metrica}: {anterior[metrica]} -> {resultado[metrica]} "
+                    f"(+{100 * (resultado[metrica] / anterior[metrica] - 1):.0f}%)"
+                )
+    return regresiones
+
+
+def imprimir_tabla(resultados: List[Dict[str, Any]]) -> None:
+    print(f"{'tipo':<13}{'motor':<11}{'modo':<7}{'items':>6}{'tiempo ms':>12}{'min ms':>11}{'pico KB':>11}{'bytes':>10}")
+    for r in resultados:
+        print(
+            f"{r['tipo']:<13}{r['motor']:<11}{r['modo']:<7}{r['items']:>6}{r['tiempo_ms']:>12.1f}"
+            f"{r['tiempo_min_ms']:>11.1f}{r['memoria_pico_kb']:>11.1f}{r['tamano_bytes']:>10}"
+        )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark de generación de documentos Excel")
+    parser.add_argument('--tipo', action='append', choices=TIPOS, help="Documentos a medir (por defecto todos)")
+    parser.add_argument('--items', default=','.join(map(str, ITEMS_POR_DEFECTO)),
+                        help="Cantidades de items separadas por coma")
+    parser.add_argument('--motor', action='append', choices=tuple(MOTORES), help="Motores (por defecto todos)")
+    parser.add_argument('--modo', action='append', choices=MODOS, help="Modos de cache (por defecto todos)")
+    parser.add_argument('--repeticiones', type=int, default=3)
+    parser.add_argument('--guardar', help="Guardar los resultados en este JSON (línea base)")
+    parser.add_argument('--baseline', help="JSON de una ejecución anterior con el que comparar")
+    parser.add_argument('--umbral', type=float, default=0.25,
+                        help="Aumento relativo tolerado respecto de la línea base (0.25 = 25%%)")
+    args = parser.parse_args(argv)
+    
+    cantidades = [int(n) for n in args.items.split(',') if n.strip()]
+    resultados = []
+    try:
+        for tipo in args.tipo or TIPOS:
+            for motor in args.motor or tuple(MOTORES):
+                for modo in args.modo or MODOS:
+                    if not soporta(tipo, motor, modo):
+                        continue
+                    for n in cantidades:
+                        resultado = medir(tipo, motor, modo, n, args.repeticiones)
+                        print(f"  {clave_resultado(resultado)}: {resultado['tiempo_ms']} ms", file=sys.stderr)
+                        resultados.append(resultado)
+    finally:
+        cerrar_pool_procesos()
+    
+    imprimir_tabla(resultados)
+    
+    if args.guardar:
+        with open(args.guardar, 'w', encoding='utf-8') as f:
+            json.dump({'resultados': resultados}, f, indent=2, ensure_ascii=False)
+    
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = {clave_resultado(r): r for r in json.load(f)['resultados']}
+        regresiones = comparar(resultados, baseline, args.umbral)
+        if regresiones:
+            print(f"\nRegresiones (umbral {args.umbral:.0%}):")
+            for regresion in regresiones:
+                print(f"  {regresion}")
+            return 1
+        print(f"\nSin regresiones respecto de {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,177 @@
+"""
+Generación masiva de documentos Excel fuera del servidor de la API
+
+Genera con los servicios de Excel existentes, en paralelo, los documentos de
+recepciones, órdenes de trabajo, controles de concreto y verificaciones.
+Cada documento terminado se registra en <salida>/manifest.jsonl; al volver a
+ejecutar se omiten los documentos cuyo archivo existe y cuyos datos no han
+cambiado, de modo que una ejecución interrumpida continúa donde se quedó.
+
+Ejemplos:
+    python generar_documentos.py --tipo verificacion --fecha-desde 2025-01-01
+    python generar_documentos.py --tipo recepcion --tipo ot --desde-id 100 --hasta-id 500 --workers 8
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime, date, time as dtime
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from sqlalchemy.orm import selectinload
+
+from database import SessionLocal
+from services.datos_documentos import DOCUMENTOS, huella_datos
+from services.dossier_service import renderizar_documento
+from utils.workers import numero_workers
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+MANIFEST = "manifest.jsonl"
+
+
+def generar_archivo(tipo: str, datos: Dict[str, Any], destino: str) -> Tuple[str, int]:
+    """Generar un documento y escribirlo en destino (se ejecuta en un proceso del pool)"""
+    contenido = renderizar_documento(tipo, datos)
+    os.makedirs(os.path.dirname(destino), exist_ok=True)
+    temporal = f"{destino}.tmp"
+    with open(temporal, 'wb') as f:
+        f.write(contenido)
+    os.replace(temporal, destino)
+    return hashlib.sha256(contenido).hexdigest(), len(contenido)
+
+
+def cargar_manifest(ruta: str) -> Dict[Tuple[str, int], dict]:
+    """Última entrada registrada por documento"""
+    registros = {}
+    if not os.path.exists(ruta):
+        return registros
+    with open(ruta, encoding='utf-8') as f:
+        for linea in f:
+            try:
+                registro = json.loads(linea)
+            except json.JSONDecodeError:
+                continue  # Línea incompleta de una ejecución interrumpida
+            registros[(registro['tipo'], registro['id'])] = registro
+    return registros
+
+
+def iterar_entidades(db, tipo: str, desde_id: Optional[int], hasta_id: Optional[int],
+                     fecha_desde: Optional[date], fecha_hasta: Optional[date],
+                     tamano_lote: int) -> Iterator[Any]:
+    """Recorrer las entidades filtradas por id, en lotes ordenados por id"""
+    modelo, relacion, _, _ = DOCUMENTOS[tipo]
+    query = db.query(modelo).options(selectinload(relacion))
+    if desde_id is not None:
+        query = query.filter(modelo.id >= desde_id)
+    if hasta_id is not None:
+        query = query.filter(modelo.id <= hasta_id)
+    if fecha_desde:
+        query = query.filter(modelo.fecha_creacion >= datetime.combine(fecha_desde, dtime.min))
+    if fecha_hasta:
+        query = query.filter(modelo.fecha_creacion <= datetime.combine(fecha_hasta, dtime.max))
+    
+    ultimo_id = 0
+    while True:
+        lote = query.filter(modelo.id > ultimo_id).order_by(modelo.id).limit(tamano_lote).all()
+        if not lote:
+            break
+        yield from lote
+        ultimo_id = lote[-1].id
+        db.expunge_all()
+
+
+def ejecutar(args: argparse.Namespace) -> Dict[str, int]:
+    os.makedirs(args.salida, exist_ok=True)
+    ruta_manifest = os.path.join(args.salida, MANIFEST)
+    manifest = cargar_manifest(ruta_manifest)
+    conteo = {'generados': 0, 'omitidos': 0, 'errores': 0}
+    max_pendientes = args.workers * 4
+    inicio = time.monotonic()
+    
+    db = SessionLocal()
+    try:
+        with ProcessPoolExecutor(max_workers=args.workers) as pool, \
+                open(ruta_manifest, 'a', encoding='utf-8') as salida_manifest:
+            pendientes = {}
+            
+            def recoger(bloquear: bool) -> None:
+                if not pendientes:
+                    return
+                listos, _ = wait(pendientes, timeout=None if bloquear else 0, return_when=FIRST_COMPLETED)
+                for futuro in listos:
+                    registro = pendientes.pop(futuro)
+                    try:
+                        registro['sha256'], registro['bytes'] = futuro.result()
+                    except Exception as e:
+                        conteo['errores'] += 1
+                        logger.error(f"Error generando {registro['tipo']} {registro['id']}: {str(e)}")
+                        continue
+                    registro['fecha'] = datetime.now().isoformat(timespec='seconds')
+                    salida_manifest.write(json.dumps(registro, ensure_ascii=False) + "\n")
+                    salida_manifest.flush()
+                    conteo['generados'] += 1
+                    if conteo['generados'] % 100 == 0:
+                        logger.info(f"{conteo['generados']} documentos generados")
+            
+            for tipo in args.tipo:
+                _, _, preparar, nombre = DOCUMENTOS[tipo]
+                for entidad in iterar_entidades(db, tipo, args.desde_id, args.hasta_id,
+                                                args.fecha_desde, args.fecha_hasta, args.lote):
+                    datos = preparar(entidad)
+                    huella = huella_datos(datos)
+                    archivo = os.path.join(tipo, f"{entidad.id}_{nombre(entidad)}".replace('/', '_'))
+                    
+                    anterior = manifest.get((tipo, entidad.id))
+                    if (not args.forzar and anterior and anterior['huella'] == huella
+                            and os.path.exists(os.path.join(args.salida, anterior['archivo']))):
+                        conteo['omitidos'] += 1
+                        continue
+                    
+                    futuro = pool.submit(generar_archivo, tipo, datos, os.path.join(args.salida, archivo))
+                    pendientes[futuro] = {'tipo': tipo, 'id': entidad.id, 'archivo': archivo, 'huella': huella}
+                    
+                    # Limitar documentos en vuelo para no cargar toda la tabla en memoria
+                    recoger(bloquear=len(pendientes) >= max_pendientes)
+            
+            while pendientes:
+                recoger(bloquear=True)
+    finally:
+        db.close()
+    
+    logger.info(
+        f"Terminado en {time.monotonic() - inicio:.1f}s: {conteo['generados']} generados, "
+        f"{conteo['omitidos']} sin cambios, {conteo['errores']} con error"
+    )
+    return conteo
+
+
+def _fecha(valor: str) -> date:
+    return datetime.strptime(valor, "%Y-%m-%d").date()
+
+
+def crear_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Generación masiva de documentos Excel")
+    parser.add_argument("--tipo", action="append", choices=list(DOCUMENTOS),
+                        help="Tipo de documento (repetible; todos por defecto)")
+    parser.add_argument("--desde-id", type=int, help="ID mínimo (incluido)")
+    parser.add_argument("--hasta-id", type=int, help="ID máximo (incluido)")
+    parser.add_argument("--fecha-desde", type=_fecha, help="Fecha de creación desde (AAAA-MM-DD)")
+    parser.add_argument("--fecha-hasta", type=_fecha, help="Fecha de creación hasta (AAAA-MM-DD)")
+    parser.add_argument("--salida", default="documentos_generados", help="Directorio de salida y del manifest")
+    parser.add_argument("--workers", type=int, default=numero_workers(), help="Procesos en paralelo")
+    parser.add_argument("--lote", type=int, default=200, help="Registros leídos por consulta")
+    parser.add_argument("--forzar", action="store_true", help="Regenerar aunque los datos no hayan cambiado")
+    return parser
+
+
+if __name__ == "__main__":
+    argumentos = crear_parser().parse_args()
+    argumentos.tipo = argumentos.tipo or list(DOCUMENTOS)
+    conteo = ejecutar(argumentos)
+    raise SystemExit(1 if conteo['errores'] else 0)
@@ -3,26 +3,48 @@ Sistema de Gestión y Manipulación de Archivos Excel
 Backend FastAPI para procesamiento de órdenes de trabajo de laboratorio
 """
 
-from fastapi import FastAPI, HTTPException, UploadFile, File, Depends
+from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Depends, Query, Header
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, Response
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from pydantic import ValidationError as PydanticValidationError
 from typing import List, Optional
-from datetime import datetime
+from datetime import datetime, date
+import logging
 import os
+import secrets
+import tempfile
+import zipfile
 
 # Configuración y utilidades
 from config import settings
-from utils.logger import app_logger, api_logger, db_logger
+from utils.logger import app_logger, db_logger, RequestIdMiddleware
 from utils.exceptions import (
     ValidationError, DatabaseError, ExcelProcessingError, 
-    RecepcionNotFoundError, DuplicateRecepcionError
+    RecepcionNotFoundError, DuplicateRecepcionError, FileTooLargeError
 )
 from utils.validators import DataValidator
+from utils.excel_validator import ExcelValidator
+from utils.file_handler import volcar_upload_a_disco, extraer_excels_de_zip, LimiteCuerpoMiddleware
+from utils.workers import cerrar_pool_procesos
+from utils.storage import output_store
+from utils.job_queue import crear_job_store, COMPLETADO
+from utils.streaming import MEDIA_TYPE_XLSX, ArchivoTemporal, respuesta_excel
+from utils.admission import AdmisionMiddleware, control_admision
+from utils.timing import ServerTimingMiddleware, etapa, registro_etapas
+from utils.sql_instrumentation import ConsultasSQLMiddleware, instrumentar_engine
+from utils.profiler import profiler, SesionEnCurso
+from utils.metrics import (
+    CONTENT_TYPE as METRICS_CONTENT_TYPE, MetricsMiddleware, registro_metricas,
+    recolector_admision, recolector_caches, recolector_pool_db, recolector_single_flight
+)
 
 # Base de datos y modelos
-from database import get_db, engine
-from models import Base, RecepcionMuestra, MuestraConcreto, OrdenTrabajo, ItemOrdenTrabajo, ControlConcreto, ProbetaConcreto, VerificacionMuestras, MuestraVerificada
+from database import get_db, get_async_db, engine, engine_async
+from models import Base, ControlConcreto, ProbetaConcreto
 from schemas import (
     RecepcionMuestraCreate, RecepcionMuestraResponse, MuestraConcretoCreate,
     OrdenTrabajoCreate, OrdenTrabajoResponse, OrdenTrabajoUpdate,
@@ -31,18 +53,24 @@ from schemas import (
     VerificacionMuestrasCreate, VerificacionMuestrasResponse, VerificacionMuestrasUpdate,
     MuestraVerificadaCreate, MuestraVerificadaResponse,
     CalculoFormulaRequest, CalculoFormulaResponse,
-    CalculoPatronRequest, CalculoPatronResponse
+    CalculoPatronRequest, CalculoPatronResponse,
+    DossierExportRequest, JobCreateRequest, JobResponse
 )
 
 # Servicios
 from services.excel_service import ExcelService
+from services.datos_documentos import DOCUMENTOS
 from services.orden_service import RecepcionService
+from services.consultas_service import ConsultasService
 from services.ot_service import OTService
-from services.excel_collaborative_service import ExcelCollaborativeService
-from services.ot_excel_collaborative_service import OTExcelCollaborativeService
-from services.concreto_excel_service import ConcretoExcelService
 from services.verificacion_service import VerificacionService
 from services.verificacion_excel_service import VerificacionExcelService
+from services.analytics_service import AnalyticsService
+from services.importacion_service import ImportacionMasivaService
+from services.dossier_service import DossierService
+from services.trabajos_service import TrabajosService
+from services.precarga_service import precarga_service, documentos_cache
+from services.analytics_service import estadisticas_cache
 
 # Crear tablas
 Base.metadata.create_all(bind=engine)
@@ -55,6 +83,15 @@ app = FastAPI(
     debug=settings.debug
 )
 
+# Middlewares: el último registrado es el más externo. De afuera hacia adentro:
+# ServerTiming, RequestId, Metrics, ConsultasSQL, CORS, LimiteCuerpo, Admision
+
+# Control de admisión de endpoints pesados (el más interno, dentro de CORS para que los 429 lleven sus headers)
+app.add_middleware(AdmisionMiddleware)
+
+# Tope del cuerpo de las cargas mientras se recibe (fuera de la admisión: corta antes de ocupar un lugar)
+app.add_middleware(LimiteCuerpoMiddleware)
+
 # Configurar CORS
 app.add_middleware(
     CORSMiddleware,
@@ -64,148 +101,67 @@ app.add_middleware(
     allow_headers=["Content-Type", "Authorization", "Accept"],
 )
 
-# Middleware de logging
-@app.middleware("http")
-async def log_requests(request, call_next):
-    """Middleware para logging de requests"""
-    api_logger.info(f"Request: {request.method} {request.url}")
-    response = await call_next(request)
-    api_logger.info(f"Response: {response.status_code}")
-    return response
+# Consultas SQL por petición (dentro de Server-Timing, que incluye su etapa sql)
+instrumentar_engine(engine)
+instrumentar_engine(engine_async.sync_engine)
+app.add_middleware(ConsultasSQLMiddleware)
+
+# Latencia por ruta y peticiones en curso para /metrics (reemplaza el log de cada request)
+app.add_middleware(MetricsMiddleware)
+
+# Id de cada petición en los registros de log (fuera de todo lo que registra en el log)
+app.add_middleware(RequestIdMiddleware)
+
+# Tiempos por etapa en el header Server-Timing (el más externo, para medir la petición completa,
+# incluida la espera en la cola de admisión)
+app.add_middleware(ServerTimingMiddleware)
+
+registro_metricas.registrar(recolector_pool_db({'sync': engine, 'async': engine_async.sync_engine}))
+registro_metricas.registrar(recolector_caches(documentos_cache, estadisticas_cache))
+registro_metricas.registrar(recolector_single_flight(precarga_service.single_flight))
+registro_metricas.registrar(recolector_admision(control_admision))
+
+@app.exception_handler(PoolTimeoutError)
+async def pool_agotado(request, exc):
+    """Sin conexiones libres en el pool: 503 con Retry-After en lugar de un 500"""
+    db_logger.warning(f"Pool de conexiones agotado: {request.method} {request.url.path}")
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Base de datos ocupada, reintente en unos segundos"},
+        headers={"Retry-After": "2"}
+    )
 
 # Inicializar servicios
 excel_service = ExcelService()
 recepcion_service = RecepcionService()
 ot_service = OTService()
-excel_collaborative_service = ExcelCollaborativeService()
-ot_excel_collaborative_service = OTExcelCollaborativeService()
-
-
-# Funciones auxiliares
-def _prepare_recepcion_data_for_excel(recepcion: RecepcionMuestra) -> dict:
-    """Preparar datos de recepción para Excel"""
-    def format_date(date_value):
-        """Formatear fecha de manera segura"""
-        if not date_value:
-            return ''
-        if isinstance(date_value, str):
-            return date_value
-        if hasattr(date_value, 'strftime'):
-            return date_value.strftime('%d/%m/%Y')
-        return str(date_value)
-    
-    return {
-        'numero_ot': recepcion.numero_ot or '',
-        'numero_recepcion': recepcion.numero_recepcion or '',
-        'numero_cotizacion': recepcion.numero_cotizacion or '',
-        # codigo_trazabilidad eliminado
-        # asunto eliminado
-        'cliente': recepcion.cliente or '',
-        'domicilio_legal': recepcion.domicilio_legal or '',
-        'ruc': recepcion.ruc or '',
-        'persona_contacto': recepcion.persona_contacto or '',
-        'email': recepcion.email or '',
-        'telefono': recepcion.telefono or '',
-        'solicitante': recepcion.solicitante or '',
-        'domicilio_solicitante': recepcion.domicilio_solicitante or '',
-        'proyecto': recepcion.proyecto or '',
-        'ubicacion': recepcion.ubicacion or '',
-        'fecha_recepcion': format_date(recepcion.fecha_recepcion),
-        'fecha_estimada_culminacion': format_date(recepcion.fecha_estimada_culminacion),
-        'emision_fisica': recepcion.emision_fisica or False,
-        'emision_digital': recepcion.emision_digital or False,
-        'entregado_por': recepcion.entregado_por or '',
-        'recibido_por': recepcion.recibido_por or '',
-        'codigo_laboratorio': recepcion.codigo_laboratorio or '',
-        'version': recepcion.version or ''
-    }
+consultas_service = ConsultasService()
+excel_validator = ExcelValidator()
+trabajos_service = TrabajosService(crear_job_store(), settings.job_workers)
 
 
-def _prepare_muestras_data_for_excel(muestras: List[MuestraConcreto]) -> List[dict]:
-    """Preparar datos de muestras para Excel"""
-    def format_date(date_value):
-        """Formatear fecha de manera segura"""
-        if not date_value:
-            return ''
-        if isinstance(date_value, str):
-            return date_value
-        if hasattr(date_value, 'strftime'):
-            return date_value.strftime('%d/%m/%Y')
-        return str(date_value)
-    
-    def format_time(time_value):
-        """Formatear hora de manera segura"""
-        if not time_value:
-            return ''
-        if isinstance(time_value, str):
-            return time_value
-        if hasattr(time_value, 'strftime'):
-            return time_value.strftime('%H:%M')
-        return str(time_value)
-    
-    muestras_dict = []
-    for muestra in muestras:
-        # Incluir explicitamente codigo_muestra_lem para columna B
-        muestras_dict.append({
-            'item_numero': muestra.item_numero or 0,
-            'codigo_muestra_lem': getattr(muestra, 'codigo_muestra_lem', '') or '',
-            'codigo_muestra': muestra.codigo_muestra or '',
-            'identificacion_muestra': muestra.identificacion_muestra or '',
-            'estructura': muestra.estructura or '',
-            'fc_kg_cm2': muestra.fc_kg_cm2 or 0,
-            'fecha_moldeo': format_date(muestra.fecha_moldeo),
-            'hora_moldeo': format_time(muestra.hora_moldeo),
-            'edad': muestra.edad or 0,
-            'fecha_rotura': format_date(muestra.fecha_rotura),
-            'requiere_densidad': muestra.requiere_densidad or False
-        })
-    return muestras_dict
-
-
-def _prepare_ot_data_for_excel(ot: OrdenTrabajo) -> dict:
-    """Preparar datos de orden de trabajo para Excel"""
-    def format_date(date_value):
-        """Formatear fecha de manera segura"""
-        if not date_value:
-            return ''
-        if isinstance(date_value, str):
-            return date_value
-        if hasattr(date_value, 'strftime'):
-            return date_value.strftime('%d/%m/%Y')
-        return str(date_value)
-    
-    return {
-        'numero_ot': ot.numero_ot or '',
-        'numero_recepcion': ot.numero_recepcion or '',
-        'fecha_recepcion': format_date(ot.fecha_recepcion),
-        'plazo_entrega_dias': ot.plazo_entrega_dias or '',
-        'fecha_inicio_programado': format_date(ot.fecha_inicio_programado),
-        'fecha_fin_programado': format_date(ot.fecha_fin_programado),
-        'fecha_inicio_real': format_date(ot.fecha_inicio_real),
-        'fecha_fin_real': format_date(ot.fecha_fin_real),
-        'variacion_inicio': ot.variacion_inicio or '',
-        'variacion_fin': ot.variacion_fin or '',
-        'duracion_real_dias': ot.duracion_real_dias or '',
-        'observaciones': ot.observaciones or '',
-        'aperturada_por': ot.aperturada_por or '',
-        'designada_a': ot.designada_a or '',
-        'estado': ot.estado or '',
-        'codigo_laboratorio': ot.codigo_laboratorio or '',
-        'version': ot.version or ''
-    }
+@app.on_event("startup")
+def iniciar_recursos():
+    """Iniciar el barrido de archivos generados y los hilos de trabajos y pre-generación"""
+    output_store.iniciar_barrido()
+    trabajos_service.iniciar()
+    if settings.prerender_enabled:
+        precarga_service.iniciar()
+
 
+@app.on_event("shutdown")
+def cerrar_recursos():
+    """Detener trabajos y barrido y liberar el pool de procesos al detener la aplicación"""
+    trabajos_service.detener()
+    precarga_service.detener()
+    cerrar_pool_procesos()
+    output_store.detener_barrido()
 
-def _prepare_items_data_for_excel(items: List[ItemOrdenTrabajo]) -> List[dict]:
-    """Preparar datos de items para Excel"""
-    items_dict = []
-    for item in items:
-        items_dict.append({
-            'item_numero': item.item_numero or 0,
-            'codigo_muestra': item.codigo_muestra or '',
-            'descripcion': item.descripcion or '',
-            'cantidad': item.cantidad or 0
-        })
-    return items_dict
+
+@app.on_event("shutdown")
+async def cerrar_engine_async():
+    """Cerrar las conexiones del engine async (desde el event loop que las abrió)"""
+    await engine_async.dispose()
 
 
 @app.get("/")
@@ -216,49 +172,52 @@ async def root():
 async def health_check():
     return {"status": "healthy", "timestamp": datetime.now()}
 
+@app.get("/api/admision/estadisticas")
+async def estadisticas_admision():
+    """Estado del control de admisión por clase: en curso, cola y tiempos de espera"""
+    return control_admision.stats()
+
+@app.get("/metrics", include_in_schema=False)
+async def metricas():
+    """Métricas del proceso en formato de texto de Prometheus"""
+    return Response(registro_metricas.exponer(), media_type=METRICS_CONTENT_TYPE)
+
+@app.get("/api/tiempos/etapas")
+async def estadisticas_etapas():
+    """Histogramas de duración por etapa (consulta, preparación, plantilla, relleno, guardado...)"""
+    return registro_etapas.stats()
+
+def verificar_token_admin(x_admin_token: Optional[str] = Header(None)):
+    """Endpoints de administración: solo con PROFILER_ADMIN_TOKEN configurado y enviado en X-Admin-Token"""
+    if not settings.profiler_admin_token:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not x_admin_token or not secrets.compare_digest(x_admin_token, settings.profiler_admin_token):
+        raise HTTPException(status_code=403, detail="Token de administración inválido")
+
+@app.post("/api/admin/perfil", include_in_schema=False, dependencies=[Depends(verificar_token_admin)])
+async def perfilar_proceso(
+    duracion: float = Query(10.0, gt=0, description="Segundos de muestreo"),
+    intervalo_ms: float = Query(10.0, ge=1, le=1000, description="Milisegundos entre muestras"),
+    memoria: bool = Query(False, description="Registrar además los sitios de asignación con tracemalloc"),
+    formato: str = Query("json", pattern="^(json|colapsado)$", description="colapsado: texto para flamegraph")
+):
+    """Perfilar por muestreo el proceso y los workers del pool durante la ventana indicada"""
+    if duracion > settings.profiler_max_seconds:
+        raise HTTPException(status_code=400, detail=f"La duración máxima es {settings.profiler_max_seconds} segundos")
+    try:
+        resultado = await run_in_threadpool(profiler.perfilar, duracion, intervalo_ms / 1000, memoria)
+    except SesionEnCurso as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if formato == "colapsado":
+        return Response(resultado['colapsado'] + "\n", media_type="text/plain; charset=utf-8")
+    return resultado
+
+
 @app.get("/api/dashboard/stats")
-async def get_dashboard_stats(db: Session = Depends(get_db)):
+async def get_dashboard_stats(db: AsyncSession = Depends(get_async_db)):
     """Obtener estadísticas del dashboard"""
     try:
-        # Contar recepciones por estado
-        total_recepciones = db.query(RecepcionMuestra).count()
-        recepciones_pendientes = db.query(RecepcionMuestra).filter(
-            RecepcionMuestra.estado == "PENDIENTE"
-        ).count()
-        recepciones_completadas = db.query(RecepcionMuestra).filter(
-            RecepcionMuestra.estado == "COMPLETADA"
-        ).count()
-        
-        # Contar total de muestras
-        total_muestras = db.query(MuestraConcreto).count()
-        
-        # Obtener recepciones recientes (últimas 5)
-        recepciones_recientes = db.query(RecepcionMuestra).order_by(
-            RecepcionMuestra.fecha_creacion.desc()
-        ).limit(5).all()
-        
-        # Convertir a formato de respuesta
-        ordenes_recientes = []
-        for recepcion in recepciones_recientes:
-            muestras = db.query(MuestraConcreto).filter(
-                MuestraConcreto.recepcion_id == recepcion.id
-            ).all()
-            ordenes_recientes.append({
-                "id": recepcion.id,
-                "numero_ot": recepcion.numero_ot,
-                "numero_recepcion": recepcion.numero_recepcion,
-                "estado": recepcion.estado,
-                "fecha_creacion": recepcion.fecha_creacion.isoformat() if recepcion.fecha_creacion else None,
-                "items": [{"id": m.id, "item_numero": m.item_numero} for m in muestras]
-            })
-        
-        return {
-            "total_ordenes": total_recepciones,
-            "ordenes_pendientes": recepciones_pendientes,
-            "ordenes_completadas": recepciones_completadas,
-            "total_items": total_muestras,
-            "ordenes_recientes": ordenes_recientes
-        }
+        return await consultas_service.estadisticas_dashboard(db)
     except Exception as e:
         app_logger.error(f"Error obteniendo estadísticas del dashboard: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error obteniendo estadísticas: {str(e)}")
@@ -278,30 +237,24 @@ async def options_debug_ordenes():
 @app.post("/api/debug/ordenes")
 async def debug_crear_recepcion(request: dict):
     """Endpoint de debug para ver qué datos está enviando el frontend"""
-    print("=" * 50)
-    print("DEBUG: Datos recibidos del frontend:")
-    print(f"Tipo: {type(request)}")
-    print(f"Contenido: {request}")
-    print("=" * 50)
+    app_logger.info("Debug: datos recibidos del frontend (%s): %s", type(request).__name__, request)
     
     # Intentar validar los datos
     validation_errors = []
     try:
         # Intentar crear el objeto Pydantic
         recepcion_data = RecepcionMuestraCreate(**request)
-        print("✅ Validación Pydantic exitosa")
+        app_logger.info("Debug: validación Pydantic exitosa")
         return {
             "message": "Datos recibidos y validados correctamente", 
             "data": request,
             "validation": "SUCCESS"
         }
     except Exception as e:
-        print(f"❌ Error de validación Pydantic: {e}")
+        app_logger.info("Debug: error de validación Pydantic: %s", e)
         validation_errors.append(str(e))
         
         # Intentar validar campo por campo
-        print("\n--- ANÁLISIS DETALLADO ---")
-        
         # Verificar campos requeridos
         required_fields = [
             'numero_ot', 'numero_recepcion', 'cliente', 
@@ -314,7 +267,7 @@ async def debug_crear_recepcion(request: dict):
         for field in required_fields:
             if field not in request or not request[field]:
                 missing_fields.append(field)
-                print(f"❌ Campo faltante: {field}")
+                app_logger.info("Debug: campo faltante: %s", field)
         
         if missing_fields:
             validation_errors.append(f"Campos faltantes: {missing_fields}")
@@ -322,18 +275,15 @@ async def debug_crear_recepcion(request: dict):
         # Verificar muestras
         if 'muestras' in request:
             muestras = request['muestras']
-            print(f"📊 Número de muestras: {len(muestras)}")
+            app_logger.info("Debug: número de muestras: %s", len(muestras))
             
             for i, muestra in enumerate(muestras):
-                print(f"  Muestra {i+1}:")
-                if 'item_numero' in muestra:
-                    print(f"    item_numero: {muestra['item_numero']} (tipo: {type(muestra['item_numero'])})")
-                if 'fc_kg_cm2' in muestra:
-                    print(f"    fc_kg_cm2: {muestra['fc_kg_cm2']} (tipo: {type(muestra['fc_kg_cm2'])})")
-                if 'edad' in muestra:
-                    print(f"    edad: {muestra['edad']} (tipo: {type(muestra['edad'])})")
+                for campo in ('item_numero', 'fc_kg_cm2', 'edad'):
+                    if campo in muestra:
+                        app_logger.info("Debug: muestra %s, %s: %r (tipo: %s)",
+                                        i + 1, campo, muestra[campo], type(muestra[campo]).__name__)
         else:
-            print("❌ No hay muestras en el request")
+            app_logger.info("Debug: no hay muestras en el request")
             validation_errors.append("Campo 'muestras' faltante")
         
         return {
@@ -351,18 +301,17 @@ async def crear_recepcion_muestra(
     """Crear nueva recepción de muestra"""
     try:
         app_logger.info(f"Creando recepción: {recepcion.numero_ot}")
-        print(f"DEBUG REAL ENDPOINT: Datos recibidos: {recepcion.model_dump()}")
+        if app_logger.isEnabledFor(logging.DEBUG):
+            app_logger.debug("Datos recibidos: %s", recepcion.model_dump())
         
         # Validar datos antes de procesar
         validation_errors = DataValidator.validate_recepcion_data(recepcion.model_dump())
         if validation_errors:
             app_logger.warning(f"Errores de validación: {validation_errors}")
-            print(f"DEBUG REAL ENDPOINT: Errores de validación: {validation_errors}")
             raise ValidationError("Datos de recepción inválidos", details={"errors": validation_errors})
         
         result = recepcion_service.crear_recepcion(db, recepcion)
         app_logger.info(f"Recepción creada exitosamente: {result.id}")
-        print(f"DEBUG REAL ENDPOINT: Recepción creada exitosamente: {result.id}")
         return result
         
     except ValidationError as e:
@@ -395,18 +344,18 @@ async def crear_recepcion_muestra(
 async def listar_recepciones(
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Listar recepciones de muestras"""
-    return recepcion_service.listar_recepciones(db, skip=skip, limit=limit)
+    return await consultas_service.listar_recepciones(db, skip=skip, limit=limit)
 
 @app.get("/api/ordenes/{recepcion_id}", response_model=RecepcionMuestraResponse)
 async def obtener_recepcion(
     recepcion_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Obtener recepción de muestra por ID"""
-    recepcion = recepcion_service.obtener_recepcion(db, recepcion_id)
+    recepcion = await consultas_service.obtener_recepcion(db, recepcion_id)
     if not recepcion:
         raise HTTPException(status_code=404, detail="Recepción no encontrada")
     return recepcion
@@ -447,12 +396,117 @@ async def subir_archivo_excel(
     if not file.filename.endswith(('.xlsx', '.xls')):
         raise HTTPException(status_code=400, detail="Solo se permiten archivos Excel")
     
+    ruta_temporal = None
     try:
-        contenido = await file.read()
-        orden = excel_service.procesar_archivo_excel(contenido, db)
+        # Volcar a disco por bloques respetando el tamaño máximo
+        ruta_temporal = await volcar_upload_a_disco(
+            file, settings.max_file_size, chunk_size=settings.upload_chunk_size
+        )
+        orden = excel_service.procesar_archivo_excel_ruta(ruta_temporal, db)
         return {"message": "Archivo procesado exitosamente", "orden_id": orden.id}
+    except FileTooLargeError as e:
+        raise HTTPException(status_code=413, detail=e.message)
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Error procesando archivo: {str(e)}")
+    finally:
+        if ruta_temporal and os.path.exists(ruta_temporal):
+            os.unlink(ruta_temporal)
+
+@app.post("/api/excel/validate")
+async def validar_archivos_excel(files: List[UploadFile] = File(...)):
+    """Validar uno o más archivos Excel sin guardar nada en la base de datos"""
+    resultados = []
+    
+    for file in files:
+        resultado = {"archivo": file.filename}
+        
+        if not file.filename or not file.filename.endswith(('.xlsx', '.xls')):
+            resultado.update(is_valid=False, errors=["Solo se permiten archivos Excel"], warnings=[], stats={})
+            resultados.append(resultado)
+            continue
+        
+        ruta_temporal = None
+        try:
+            ruta_temporal = await volcar_upload_a_disco(
+                file, settings.max_file_size, chunk_size=settings.upload_chunk_size
+            )
+            # Lectura del Excel con pandas fuera del event loop
+            validacion = await run_in_threadpool(excel_validator.validate_excel_file, ruta_temporal)
+            resultado.update(
+                is_valid=validacion['is_valid'],
+                errors=validacion['errors'],
+                warnings=validacion['warnings'],
+                stats=validacion['stats'],
+                orden=validacion['data'].get('orden', {})
+            )
+        except FileTooLargeError as e:
+            resultado.update(is_valid=False, errors=[e.message], warnings=[], stats={})
+        finally:
+            if ruta_temporal and os.path.exists(ruta_temporal):
+                os.unlink(ruta_temporal)
+        
+        resultados.append(resultado)
+    
+    return {
+        "total_archivos": len(resultados),
+        "validos": sum(1 for resultado in resultados if resultado["is_valid"]),
+        "resultados": resultados
+    }
+
+@app.post("/api/excel/bulk-upload")
+async def importar_archivos_excel(
+    files: List[UploadFile] = File(...),
+    db: Session = Depends(get_db)
+):
+    """Importar muchas recepciones a la vez desde archivos Excel o un ZIP"""
+    with tempfile.TemporaryDirectory(prefix="importacion_") as directorio:
+        entradas = []
+        for file in files:
+            nombre = file.filename or ""
+            es_zip = nombre.lower().endswith('.zip')
+            if not es_zip and not nombre.endswith(('.xlsx', '.xls')):
+                entradas.append({"archivo": nombre, "error": "Solo se permiten archivos Excel o ZIP"})
+                continue
+            
+            try:
+                ruta = await volcar_upload_a_disco(
+                    file,
+                    settings.bulk_upload_max_size if es_zip else settings.max_file_size,
+                    chunk_size=settings.upload_chunk_size,
+                    directorio=directorio
+                )
+            except FileTooLargeError as e:
+                entradas.append({"archivo": nombre, "error": e.message})
+                continue
+            
+            if not es_zip:
+                entradas.append({"archivo": nombre, "ruta": ruta})
+                continue
+            
+            try:
+                destino = tempfile.mkdtemp(dir=directorio)
+                extraidas = await run_in_threadpool(
+                    extraer_excels_de_zip, ruta, destino, settings.max_file_size,
+                    settings.zip_max_entries, settings.zip_max_total_size
+                )
+                for entrada in extraidas:
+                    entrada["archivo"] = f"{nombre}/{entrada['archivo']}"
+                    entradas.append(entrada)
+            except zipfile.BadZipFile:
+                entradas.append({"archivo": nombre, "error": "El archivo ZIP no es válido"})
+            except FileTooLargeError as e:
+                entradas.append({"archivo": nombre, "error": e.message})
+        
+        if not entradas:
+            raise HTTPException(status_code=400, detail="No se encontraron archivos Excel para importar")
+        
+        try:
+            # Lectura de los Excel y escrituras en la base fuera del event loop
+            importacion_service = ImportacionMasivaService(db)
+            return await run_in_threadpool(importacion_service.importar, entradas)
+        except Exception as e:
+            app_logger.error(f"Error en importación masiva: {str(e)}")
+            raise HTTPException(status_code=500, detail=f"Error en importación masiva: {str(e)}")
 
 @app.get("/api/excel/template/{recepcion_id}")
 async def descargar_plantilla(
@@ -491,6 +545,59 @@ async def exportar_ordenes(
         raise HTTPException(status_code=500, detail=f"Error exportando órdenes: {str(e)}")
 
 
+@app.post("/api/excel/dossier")
+async def exportar_dossier(request: DossierExportRequest, db: Session = Depends(get_db)):
+    """
+    Exportar en un ZIP la recepción, OT, control de concreto y verificación de
+    varias recepciones. Los documentos se generan en paralelo y se envían a
+    medida que terminan; resumen.json (al final del ZIP) lista los errores.
+    """
+    dossier_service = DossierService(db)
+    try:
+        recepciones = dossier_service.obtener_recepciones(
+            request.recepcion_ids, request.fecha_desde, request.fecha_hasta
+        )
+        if len(recepciones) > settings.dossier_max_recepciones:
+            raise HTTPException(
+                status_code=400,
+                detail=f"La exportación supera el máximo de {settings.dossier_max_recepciones} recepciones"
+            )
+        if not recepciones:
+            raise HTTPException(status_code=404, detail="No se encontraron recepciones para exportar")
+        
+        documentos = dossier_service.preparar_documentos(recepciones, request.tipos)
+    except HTTPException:
+        raise
+    except Exception as e:
+        app_logger.error(f"Error preparando dossier: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error preparando dossier: {str(e)}")
+    
+    app_logger.info(f"Exportando dossier: {len(recepciones)} recepciones, {len(documentos)} documentos")
+    return StreamingResponse(
+        DossierService.generar_zip(documentos),
+        media_type="application/zip",
+        headers={
+            "Content-Disposition": f"attachment; filename=dossier_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
+        }
+    )
+
+
+async def _respuesta_documento(tipo: str, entidad, filename: str) -> Response:
+    """
+    Respuesta con el Excel de una entidad: el pre-generado si sigue vigente para
+    los datos actuales o uno nuevo, enviado por bloques sin guardarlo en el
+    almacén. Las peticiones simultáneas del mismo documento comparten una sola
+    generación y su archivo temporal.
+    """
+    with etapa("preparar"):
+        datos = DOCUMENTOS[tipo][2](entidad)
+    # Bloquea mientras espera la generación (propia o compartida): fuera del event loop
+    documento = await run_in_threadpool(precarga_service.obtener_o_renderizar, tipo, entidad.id, datos)
+    if isinstance(documento, ArchivoTemporal):
+        return respuesta_excel(documento, filename)
+    return FileResponse(path=documento, filename=filename, media_type=MEDIA_TYPE_XLSX)
+
+
 @app.get("/api/ordenes/{recepcion_id}/excel")
 async def generar_excel_recepcion(
     recepcion_id: int,
@@ -502,48 +609,16 @@ async def generar_excel_recepcion(
         
         # Obtener la recepción
         app_logger.info(f"Obteniendo recepción {recepcion_id} de la base de datos")
-        recepcion = recepcion_service.obtener_recepcion(db, recepcion_id)
+        with etapa("db"):
+            recepcion = recepcion_service.obtener_recepcion(db, recepcion_id)
         if not recepcion:
             app_logger.error(f"Recepción {recepcion_id} no encontrada")
             raise HTTPException(status_code=404, detail="Recepción no encontrada")
         
         app_logger.info(f"Recepción encontrada: {recepcion.numero_ot}")
         
-        # Preparar datos para Excel
-        app_logger.info("Preparando datos de recepción para Excel")
-        try:
-            recepcion_dict = _prepare_recepcion_data_for_excel(recepcion)
-            app_logger.info("Datos de recepción preparados correctamente")
-        except Exception as e:
-            app_logger.error(f"Error preparando datos de recepción: {str(e)}")
-            raise e
-        
-        app_logger.info("Preparando datos de muestras para Excel")
-        try:
-            muestras_dict = _prepare_muestras_data_for_excel(recepcion.muestras)
-            app_logger.info(f"Datos de {len(muestras_dict)} muestras preparados correctamente")
-        except Exception as e:
-            app_logger.error(f"Error preparando datos de muestras: {str(e)}")
-            raise e
-        
-        # Generar Excel usando OpenPyXL
-        app_logger.info(f"Generando Excel para recepción {recepcion_id}")
-        try:
-            excel_content = excel_collaborative_service.modificar_excel_con_datos(recepcion_dict, muestras_dict)
-            app_logger.info(f"Excel generado exitosamente, tamaño: {len(excel_content)} bytes")
-        except Exception as e:
-            app_logger.error(f"Error generando Excel: {str(e)}")
-            raise e
-        
-        # Crear respuesta con el Excel
-        app_logger.info("Creando respuesta HTTP con Excel")
-        response = Response(
-            content=excel_content,
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            headers={
-                "Content-Disposition": f"attachment; filename=recepcion_{recepcion.numero_recepcion}.xlsx"
-            }
-        )
+        # Generar Excel (o reutilizar el pre-generado) y enviarlo desde el almacén
+        response = await _respuesta_documento('recepcion', recepcion, f"recepcion_{recepcion.numero_recepcion}.xlsx")
         app_logger.info(f"Excel generado exitosamente para recepción {recepcion_id}")
         return response
         
@@ -590,18 +665,18 @@ async def crear_orden_trabajo(
 async def listar_ordenes_trabajo(
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Listar órdenes de trabajo"""
-    return ot_service.listar_ordenes_trabajo(db, skip=skip, limit=limit)
+    return await consultas_service.listar_ordenes_trabajo(db, skip=skip, limit=limit)
 
 @app.get("/api/ot/{ot_id}", response_model=OrdenTrabajoResponse)
 async def obtener_orden_trabajo(
     ot_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Obtener orden de trabajo por ID"""
-    ot = ot_service.obtener_orden_trabajo(db, ot_id)
+    ot = await consultas_service.obtener_orden_trabajo(db, ot_id)
     if not ot:
         raise HTTPException(status_code=404, detail="Orden de trabajo no encontrada")
     return ot
@@ -653,30 +728,15 @@ async def generar_excel_ot(
         app_logger.info(f"Generando Excel para orden de trabajo {ot_id}")
         
         # Obtener datos de la OT
-        ot = ot_service.obtener_orden_trabajo(db, ot_id)
+        with etapa("db"):
+            ot = ot_service.obtener_orden_trabajo(db, ot_id)
         if not ot:
             raise HTTPException(status_code=404, detail="Orden de trabajo no encontrada")
         
-        # Obtener items de la OT
-        items = ot_service.obtener_items_orden_trabajo(db, ot_id)
-        
-        # Preparar datos para Excel
-        ot_dict = _prepare_ot_data_for_excel(ot)
-        items_dict = _prepare_items_data_for_excel(items)
-        
-        # Generar Excel usando el servicio directo
-        excel_content = ot_excel_collaborative_service.modificar_excel_con_datos(ot_dict, items_dict)
-        
-        filename = f"OT-{ot.numero_ot}.xlsx"
-        
-        return Response(
-            content=excel_content,
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            headers={
-                "Content-Disposition": f"attachment; filename={filename}"
-            }
-        )
+        return await _respuesta_documento('ot', ot, f"OT-{ot.numero_ot}.xlsx")
         
+    except HTTPException:
+        raise
     except Exception as e:
         app_logger.error(f"Error generando Excel para orden de trabajo {ot_id}: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error generando Excel: {str(e)}")
@@ -724,6 +784,7 @@ async def crear_control_concreto(
         db.refresh(db_control)
         
         app_logger.info(f"Control de concreto creado: {db_control.numero_control}")
+        precarga_service.programar('control', db_control.id)
         return db_control
         
     except Exception as e:
@@ -733,9 +794,9 @@ async def crear_control_concreto(
 
 
 @app.get("/api/concreto/control/{control_id}", response_model=ControlConcretoResponse)
-async def obtener_control_concreto(control_id: int, db: Session = Depends(get_db)):
+async def obtener_control_concreto(control_id: int, db: AsyncSession = Depends(get_async_db)):
     """Obtener un control de concreto por ID"""
-    control = db.query(ControlConcreto).filter(ControlConcreto.id == control_id).first()
+    control = await consultas_service.obtener_control(db, control_id)
     if not control:
         raise HTTPException(status_code=404, detail="Control de concreto no encontrado")
     return control
@@ -745,73 +806,54 @@ async def obtener_control_concreto(control_id: int, db: Session = Depends(get_db
 async def listar_controles_concreto(
     skip: int = 0, 
     limit: int = 100, 
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Listar todos los controles de concreto"""
-    controles = db.query(ControlConcreto).offset(skip).limit(limit).all()
-    return controles
+    return await consultas_service.listar_controles(db, skip=skip, limit=limit)
 
 
 @app.post("/api/concreto/generar-excel/{control_id}")
-async def generar_excel_control_concreto(control_id: int, db: Session = Depends(get_db)):
-    """Generar archivo Excel para un control de concreto"""
+async def generar_excel_control_concreto(
+    control_id: int,
+    archivar: bool = Query(False, description="Guardar además una copia en el almacén de archivos generados"),
+    db: Session = Depends(get_db)
+):
+    """Generar archivo Excel para un control de concreto (en memoria; se archiva solo si se pide)"""
     try:
         # Obtener control y probetas
-        control = db.query(ControlConcreto).filter(ControlConcreto.id == control_id).first()
+        with etapa("db"):
+            control = db.query(ControlConcreto).filter(ControlConcreto.id == control_id).first()
         if not control:
             raise HTTPException(status_code=404, detail="Control de concreto no encontrado")
         
-        # Convertir probetas a formato para el servicio
-        probetas_data = []
-        for probeta in control.probetas:
-            probeta_dict = {
-                'item_numero': probeta.item_numero,
-                'orden_trabajo': probeta.orden_trabajo,
-                'codigo_muestra': probeta.codigo_muestra,
-                'codigo_muestra_cliente': probeta.codigo_muestra_cliente,
-                'fecha_rotura': probeta.fecha_rotura,
-                'elemento': probeta.elemento,
-                'fc_kg_cm2': probeta.fc_kg_cm2,
-                'status_ensayado': probeta.status_ensayado
-            }
-            probetas_data.append(probeta_dict)
-        
-        # Datos del cliente para relleno automático
-        datos_cliente = {
-            'codigo_documento': control.codigo_documento,
-            'version': control.version,
-            'fecha_documento': control.fecha_documento,
-            'pagina': control.pagina
-        }
-        
-        # Generar Excel
-        concreto_service = ConcretoExcelService()
-        archivo_path = concreto_service.generar_excel_concreto(probetas_data, datos_cliente)
+        filename = f"control_concreto_{control.numero_control}.xlsx"
+        if not archivar:
+            return await _respuesta_documento('control', control, filename)
         
-        # Actualizar control con ruta del archivo
-        control.archivo_excel = archivo_path
+        # Generar (o esperar la generación en curso) y registrar la clave en el control
+        with etapa("preparar"):
+            datos = DOCUMENTOS['control'][2](control)
+        control.archivo_excel = await run_in_threadpool(precarga_service.generar, 'control', control.id, datos)
         db.commit()
-        
-        # Retornar archivo
         return FileResponse(
-            path=archivo_path,
-            filename=f"control_concreto_{control.numero_control}.xlsx",
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+            path=output_store.resolver(control.archivo_excel),
+            filename=filename,
+            media_type=MEDIA_TYPE_XLSX
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         app_logger.error(f"Error generando Excel para control {control_id}: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error generando Excel: {str(e)}")
 
 
 @app.post("/api/concreto/buscar-recepcion", response_model=BusquedaClienteResponse)
-async def buscar_datos_por_recepcion(request: BusquedaClienteRequest, db: Session = Depends(get_db)):
+async def buscar_datos_por_recepcion(request: BusquedaClienteRequest, db: AsyncSession = Depends(get_async_db)):
     """Buscar datos del cliente y probetas basado en número de recepción"""
     try:
-        # Buscar la recepción en la base de datos
-        recepcion = db.query(RecepcionMuestra).filter(
-            RecepcionMuestra.numero_recepcion == request.numero_recepcion
-        ).first()
+        # Buscar la recepción en la base de datos (con sus muestras de concreto)
+        recepcion = await consultas_service.buscar_recepcion_por_numero(db, request.numero_recepcion)
         
         if not recepcion:
             return BusquedaClienteResponse(
@@ -821,14 +863,9 @@ async def buscar_datos_por_recepcion(request: BusquedaClienteRequest, db: Sessio
                 mensaje=f"No se encontró la recepción: {request.numero_recepcion}"
             )
         
-        # Obtener las muestras de concreto de la recepción
-        muestras = db.query(MuestraConcreto).filter(
-            MuestraConcreto.recepcion_id == recepcion.id
-        ).all()
-        
         # Convertir muestras a probetas de concreto
         probetas = []
-        for i, muestra in enumerate(muestras):
+        for i, muestra in enumerate(recepcion.muestras):
             probeta = ProbetaConcretoBase(
                 item_numero=i + 1,
                 orden_trabajo=recepcion.numero_ot,
@@ -876,8 +913,7 @@ async def eliminar_control_concreto(control_id: int, db: Session = Depends(get_d
             raise HTTPException(status_code=404, detail="Control de concreto no encontrado")
         
         # Eliminar archivo Excel si existe
-        if control.archivo_excel and os.path.exists(control.archivo_excel):
-            os.remove(control.archivo_excel)
+        output_store.eliminar(control.archivo_excel)
         
         db.delete(control)
         db.commit()
@@ -944,26 +980,94 @@ async def crear_verificacion(verificacion_data: VerificacionMuestrasCreate, db:
         raise HTTPException(status_code=500, detail=f"Error creando verificación: {str(e)}")
 
 
-@app.get("/api/verificacion/", response_model=List[VerificacionMuestrasResponse])
-async def listar_verificaciones(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    """Listar todas las verificaciones de muestras"""
+@app.post("/api/verificacion/importar-excel", response_model=VerificacionMuestrasResponse)
+async def importar_excel_verificacion(
+    file: UploadFile = File(...),
+    numero_verificacion: Optional[str] = Form(None),
+    fecha_documento: Optional[str] = Form(None),
+    db: Session = Depends(get_db)
+):
+    """Crear una verificación a partir de un formato V03 llenado en Excel"""
+    if not file.filename or not file.filename.lower().endswith('.xlsx'):
+        raise HTTPException(status_code=400, detail="Solo se permiten archivos .xlsx")
+    
+    ruta_temporal = None
     try:
+        ruta_temporal = await volcar_upload_a_disco(
+            file, settings.max_file_size, chunk_size=settings.upload_chunk_size
+        )
+        
+        verificacion_excel_service = VerificacionExcelService()
+        try:
+            with etapa("leer_excel"):
+                verificacion_data = verificacion_excel_service.importar_excel_verificacion(
+                    ruta_temporal,
+                    numero_verificacion=numero_verificacion or os.path.splitext(os.path.basename(file.filename))[0],
+                    fecha_documento=fecha_documento
+                )
+        except (ValueError, PydanticValidationError) as e:
+            raise HTTPException(status_code=400, detail=f"Error leyendo el formato V03: {str(e)}")
+        
         verificacion_service = VerificacionService(db)
-        verificaciones = verificacion_service.listar_verificaciones(skip=skip, limit=limit)
+        with etapa("db"):
+            verificacion = verificacion_service.crear_verificacion(verificacion_data)
+        app_logger.info(
+            f"Verificación importada desde Excel: {verificacion.numero_verificacion} "
+            f"({len(verificacion_data.muestras_verificadas)} muestras)"
+        )
+        return verificacion
         
-        return verificaciones
+    except FileTooLargeError as e:
+        raise HTTPException(status_code=413, detail=e.message)
+    except HTTPException:
+        raise
+    except Exception as e:
+        app_logger.error(f"Error importando verificación: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error importando verificación: {str(e)}")
+    finally:
+        if ruta_temporal and os.path.exists(ruta_temporal):
+            os.unlink(ruta_temporal)
+
+
+@app.get("/api/verificacion/", response_model=List[VerificacionMuestrasResponse])
+async def listar_verificaciones(skip: int = 0, limit: int = 100, db: AsyncSession = Depends(get_async_db)):
+    """Listar todas las verificaciones de muestras"""
+    try:
+        return await consultas_service.listar_verificaciones(db, skip=skip, limit=limit)
         
     except Exception as e:
         app_logger.error(f"Error listando verificaciones: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error listando verificaciones: {str(e)}")
 
 
+@app.get("/api/verificacion/estadisticas")
+async def estadisticas_verificacion(
+    fecha_desde: Optional[date] = None,
+    fecha_hasta: Optional[date] = None,
+    cliente: Optional[str] = None,
+    bins: int = Query(20, ge=5, le=100),
+    db: Session = Depends(get_db)
+):
+    """Estadísticas de tolerancia, cartas de control y no conformidad de muestras verificadas"""
+    if fecha_desde and fecha_hasta and fecha_desde > fecha_hasta:
+        raise HTTPException(status_code=400, detail="fecha_desde no puede ser posterior a fecha_hasta")
+    
+    try:
+        analytics_service = AnalyticsService(db)
+        return analytics_service.obtener_estadisticas(
+            fecha_desde=fecha_desde, fecha_hasta=fecha_hasta, cliente=cliente, bins=bins
+        )
+        
+    except Exception as e:
+        app_logger.error(f"Error calculando estadísticas de verificación: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error calculando estadísticas: {str(e)}")
+
+
 @app.get("/api/verificacion/{verificacion_id}", response_model=VerificacionMuestrasResponse)
-async def obtener_verificacion(verificacion_id: int, db: Session = Depends(get_db)):
+async def obtener_verificacion(verificacion_id: int, db: AsyncSession = Depends(get_async_db)):
     """Obtener una verificación por ID"""
     try:
-        verificacion_service = VerificacionService(db)
-        verificacion = verificacion_service.obtener_verificacion(verificacion_id)
+        verificacion = await consultas_service.obtener_verificacion(db, verificacion_id)
         
         if not verificacion:
             raise HTTPException(status_code=404, detail="Verificación no encontrada")
@@ -1030,27 +1134,29 @@ async def eliminar_verificacion(verificacion_id: int, db: Session = Depends(get_
 
 @app.post("/api/verificacion/{verificacion_id}/generar-excel")
 async def generar_excel_verificacion(verificacion_id: int, db: Session = Depends(get_db)):
-    """Generar archivo Excel para una verificación"""
+    """Generar y archivar el archivo Excel de una verificación"""
     try:
         verificacion_service = VerificacionService(db)
-        verificacion = verificacion_service.obtener_verificacion(verificacion_id)
+        with etapa("db"):
+            verificacion = verificacion_service.obtener_verificacion(verificacion_id)
         
         if not verificacion:
             raise HTTPException(status_code=404, detail="Verificación no encontrada")
         
-        # Generar Excel
-        excel_service = VerificacionExcelService()
-        filepath = excel_service.generar_excel_verificacion(verificacion)
+        # Generar Excel (o esperar la generación en curso de los mismos datos)
+        with etapa("preparar"):
+            datos = DOCUMENTOS['verificacion'][2](verificacion)
+        clave = await run_in_threadpool(precarga_service.generar, 'verificacion', verificacion_id, datos)
         
-        # Actualizar la ruta en la base de datos
-        verificacion.archivo_excel = filepath
+        # Actualizar la clave en la base de datos
+        verificacion.archivo_excel = clave
         db.commit()
         
-        app_logger.info(f"Excel generado para verificación {verificacion_id}: {filepath}")
+        app_logger.info(f"Excel generado para verificación {verificacion_id}: {clave}")
         
         return {
             "mensaje": "Archivo Excel generado exitosamente",
-            "archivo": filepath,
+            "archivo": clave,
             "verificacion_id": verificacion_id
         }
         
@@ -1062,25 +1168,35 @@ async def generar_excel_verificacion(verificacion_id: int, db: Session = Depends
 
 
 @app.get("/api/verificacion/{verificacion_id}/descargar-excel")
-async def descargar_excel_verificacion(verificacion_id: int, db: Session = Depends(get_db)):
-    """Descargar archivo Excel de una verificación"""
+async def descargar_excel_verificacion(
+    verificacion_id: int,
+    archivado: bool = Query(False, description="Descargar la copia archivada en lugar de generarla al vuelo"),
+    db: Session = Depends(get_db)
+):
+    """Descargar archivo Excel de una verificación, generado en memoria con los datos actuales"""
     try:
         verificacion_service = VerificacionService(db)
-        verificacion = verificacion_service.obtener_verificacion(verificacion_id)
+        with etapa("db"):
+            verificacion = verificacion_service.obtener_verificacion(verificacion_id)
         
         if not verificacion:
             raise HTTPException(status_code=404, detail="Verificación no encontrada")
         
-        if not verificacion.archivo_excel or not os.path.exists(verificacion.archivo_excel):
-            raise HTTPException(status_code=404, detail="Archivo Excel no encontrado")
-        
         filename = f"verificacion_{verificacion.numero_verificacion}.xlsx"
         
-        return FileResponse(
-            path=verificacion.archivo_excel,
-            filename=filename,
-            media_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        )
+        if archivado:
+            ruta = output_store.resolver(verificacion.archivo_excel)
+            if not ruta:
+                # Nunca archivado, o eliminado por el barrido de archivos antiguos
+                raise HTTPException(status_code=404, detail="Archivo Excel no encontrado, genérelo nuevamente")
+            
+            return FileResponse(
+                path=ruta,
+                filename=filename,
+                media_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+            )
+        
+        return await _respuesta_documento('verificacion', verificacion, filename)
         
     except HTTPException:
         raise
@@ -1089,6 +1205,50 @@ async def descargar_excel_verificacion(verificacion_id: int, db: Session = Depen
         raise HTTPException(status_code=500, detail=f"Error descargando Excel: {str(e)}")
 
 
+# ===== TRABAJOS EN SEGUNDO PLANO =====
+# Rutas sin async: el almacén de trabajos es síncrono (SQLite, Redis) y así corre en el pool de hilos
+
+@app.post("/api/jobs", response_model=JobResponse, status_code=202)
+def crear_trabajo(request: JobCreateRequest):
+    """Encolar la generación de un documento; retorna el trabajo para consultar su estado"""
+    if request.tipo == 'dossier':
+        parametros = request.dossier.model_dump(mode="json")
+    else:
+        parametros = {'id': request.entidad_id}
+    
+    try:
+        return trabajos_service.encolar(request.tipo, parametros)
+    except Exception as e:
+        app_logger.error(f"Error encolando trabajo: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error encolando trabajo: {str(e)}")
+
+
+@app.get("/api/jobs/{job_id}", response_model=JobResponse)
+def obtener_trabajo(job_id: str):
+    """Consultar estado y progreso de un trabajo"""
+    trabajo = trabajos_service.obtener(job_id)
+    if not trabajo:
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado")
+    return trabajo
+
+
+@app.get("/api/jobs/{job_id}/descargar")
+def descargar_trabajo(job_id: str):
+    """Descargar el archivo generado por un trabajo completado"""
+    trabajo = trabajos_service.obtener(job_id)
+    if not trabajo:
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado")
+    if trabajo['estado'] != COMPLETADO:
+        raise HTTPException(status_code=409, detail=f"El trabajo no está completado (estado: {trabajo['estado']})")
+    
+    ruta = output_store.resolver(trabajo['resultado'])
+    if not ruta:
+        raise HTTPException(status_code=404, detail="El archivo del trabajo ya no existe, vuelva a generarlo")
+    
+    media_type = "application/zip" if ruta.endswith(".zip") else MEDIA_TYPE_XLSX
+    return FileResponse(path=ruta, filename=trabajo['nombre_archivo'], media_type=media_type)
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -4,7 +4,7 @@ Esquemas Pydantic para validación de datos del sistema de recepción de muestra
 
 from pydantic import BaseModel, Field, EmailStr, validator, root_validator
 from typing import List, Optional, Dict, Any
-from datetime import datetime
+from datetime import date, datetime
 import re
 
 class MuestraConcretoBase(BaseModel):
@@ -563,3 +563,62 @@ class CalculoPatronResponse(BaseModel):
     """Esquema de respuesta para cálculo de patrón de acción"""
     accion_realizar: str = Field(..., description="Acción a realizar calculada por patrón")
     mensaje: str = Field(..., description="Mensaje descriptivo del resultado")
+
+class DossierExportRequest(BaseModel):
+    """Esquema para exportar en un ZIP los documentos de varias recepciones"""
+    recepcion_ids: Optional[List[int]] = Field(None, description="IDs de las recepciones")
+    fecha_desde: Optional[date] = Field(None, description="Fecha de recepción desde (incluida)")
+    fecha_hasta: Optional[date] = Field(None, description="Fecha de recepción hasta (incluida)")
+    tipos: Optional[List[str]] = Field(None, description="Documentos a incluir: recepcion, ot, control, verificacion (todos por defecto)")
+    
+    @validator('tipos')
+    def validate_tipos(cls, v):
+        """Validar tipos de documento"""
+        tipos_validos = ['recepcion', 'ot', 'control', 'verificacion']
+        for tipo in v or []:
+            if tipo not in tipos_validos:
+                raise ValueError(f'Tipo debe ser uno de: {", ".join(tipos_validos)}')
+        return v
+    
+    @root_validator(skip_on_failure=True)
+    def validate_filtro(cls, values):
+        """Exigir ids o un rango de fechas"""
+        if not values.get('recepcion_ids') and not (values.get('fecha_desde') or values.get('fecha_hasta')):
+            raise ValueError('Debe indicar recepcion_ids o un rango de fechas')
+        return values
+
+class JobCreateRequest(BaseModel):
+    """Esquema para encolar la generación de un documento"""
+    tipo: str = Field(..., description="recepcion, ot, control, verificacion o dossier")
+    entidad_id: Optional[int] = Field(None, ge=1, description="ID de la entidad (todos los tipos excepto dossier)")
+    dossier: Optional[DossierExportRequest] = Field(None, description="Filtro del dossier (solo tipo dossier)")
+    
+    @validator('tipo')
+    def validate_tipo(cls, v):
+        """Validar tipo de trabajo"""
+        tipos_validos = ['recepcion', 'ot', 'control', 'verificacion', 'dossier']
+        if v not in tipos_validos:
+            raise ValueError(f'Tipo debe ser uno de: {", ".join(tipos_validos)}')
+        return v
+    
+    @root_validator(skip_on_failure=True)
+    def validate_parametros(cls, values):
+        """Exigir entidad_id o dossier según el tipo"""
+        if values.get('tipo') == 'dossier':
+            if not values.get('dossier'):
+                raise ValueError('El tipo dossier requiere el campo dossier')
+        elif not values.get('entidad_id'):
+            raise ValueError('Debe indicar entidad_id')
+        return values
+
+class JobResponse(BaseModel):
+    """Esquema de respuesta con el estado de un trabajo"""
+    id: str = Field(..., description="ID del trabajo")
+    tipo: str = Field(..., description="Tipo de documento")
+    estado: str = Field(..., description="en_cola, procesando, completado o error")
+    progreso: int = Field(..., description="Progreso de 0 a 100")
+    mensaje: Optional[str] = Field(None, description="Detalle del error, si lo hubo")
+    nombre_archivo: Optional[str] = Field(None, description="Nombre del archivo generado")
+    intentos: int = Field(0, description="Veces que se tomó de la cola (más de una si se interrumpió)")
+    creado: datetime = Field(..., description="Fecha de creación")
+    actualizado: datetime = Field(..., description="Fecha de la última actualización")
@@ -0,0 +1,244 @@
+"""
+Servicio de estadísticas y control estadístico de procesos (SPC)
+para las muestras verificadas (formato V03)
+"""
+
+import logging
+from datetime import date, datetime, time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from config import settings
+from models import MuestraVerificada, VerificacionMuestras
+from utils.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Cache compartido por todas las instancias del servicio
+estadisticas_cache = TTLCache("estadisticas_verificacion", ttl_segundos=settings.analytics_cache_ttl)
+
+# 3/d2 (d2 = 1.128 para rangos móviles de 2 observaciones): límites de la carta I-MR
+FACTOR_LIMITES_IMR = 2.66
+TOLERANCIA_DIAMETRO_MAX = 2.0
+SIN_DATO = "SIN ESPECIFICAR"
+
+
+# Marca en session.info de las sesiones con verificaciones escritas y aún sin commit
+CLAVE_VERIFICACIONES_ESCRITAS = "verificaciones_escritas"
+
+
+@event.listens_for(Session, "after_flush")
+def _marcar_escritura(session, flush_context):
+    """Recordar que la transacción escribió verificaciones (se invalida recién en el commit)"""
+    for instancia in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(instancia, (VerificacionMuestras, MuestraVerificada)):
+            session.info[CLAVE_VERIFICACIONES_ESCRITAS] = True
+            return
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidar_cache_en_escritura(session):
+    """
+    Invalidar el cache de estadísticas al confirmar escrituras de verificaciones;
+    antes del commit, una lectura concurrente volvería a llenarlo con los datos previos
+    """
+    if session.info.pop(CLAVE_VERIFICACIONES_ESCRITAS, False):
+        estadisticas_cache.invalidate()
+
+
+@event.listens_for(Session, "after_rollback")
+def _descartar_escritura(session):
+    session.info.pop(CLAVE_VERIFICACIONES_ESCRITAS, None)
+
+
+class AnalyticsService:
+    """Agregados de tolerancia, no conformidad y acciones sobre muestras verificadas"""
+
+    COLUMNAS = [
+        'fecha', 'cliente', 'equipo_bernier', 'equipo_balanza', 'tipo_testigo',
+        'tolerancia_porcentaje', 'aceptacion_diametro', 'planitud_superior',
+        'planitud_inferior', 'planitud_depresiones', 'accion_realizar'
+    ]
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def obtener_estadisticas(self, fecha_desde: Optional[date] = None, fecha_hasta: Optional[date] = None,
+                             cliente: Optional[str] = None, bins: int = 20) -> Dict[str, Any]:
+        """Obtener estadísticas (usando cache) para los filtros indicados"""
+        clave = (fecha_desde, fecha_hasta, (cliente or '').strip().lower(), bins)
+        return estadisticas_cache.get_or_set(
+            clave, lambda: self.calcular_estadisticas(fecha_desde, fecha_hasta, cliente, bins)
+        )
+
+    def calcular_estadisticas(self, fecha_desde: Optional[date] = None, fecha_hasta: Optional[date] = None,
+                              cliente: Optional[str] = None, bins: int = 20) -> Dict[str, Any]:
+        """Calcular todas las series sin pasar por el cache"""
+        df = self._cargar_muestras(fecha_desde, fecha_hasta, cliente)
+        logger.info(f"Calculando estadísticas de verificación sobre {len(df)} muestras")
+
+        return {
+            'filtros': {
+                'fecha_desde': fecha_desde.isoformat() if fecha_desde else None,
+                'fecha_hasta': fecha_hasta.isoformat() if fecha_hasta else None,
+                'cliente': cliente
+            },
+            'total_muestras': int(len(df)),
+            'tolerancia_por_tipo': self._tolerancia_por_tipo(df, bins),
+            'no_conformidad_por_equipo': {
+                'bernier': self._tasa_no_conformidad(df, 'equipo_bernier'),
+                'balanza': self._tasa_no_conformidad(df, 'equipo_balanza')
+            },
+            'acciones_por_periodo': self._acciones_por_periodo(df),
+            'generado': datetime.now().isoformat()
+        }
+
+    def _cargar_muestras(self, fecha_desde: Optional[date], fecha_hasta: Optional[date],
+                         cliente: Optional[str]) -> pd.DataFrame:
+        """Cargar en un DataFrame solo las columnas necesarias, filtradas en SQL"""
+        consulta = select(
+            VerificacionMuestras.fecha_creacion,
+            VerificacionMuestras.cliente,
+            VerificacionMuestras.equipo_bernier,
+            VerificacionMuestras.equipo_balanza,
+            MuestraVerificada.tipo_testigo,
+            MuestraVerificada.tolerancia_porcentaje,
+            MuestraVerificada.aceptacion_diametro,
+            MuestraVerificada.planitud_superior_aceptacion,
+            MuestraVerificada.planitud_inferior_aceptacion,
+            MuestraVerificada.planitud_depresiones_aceptacion,
+            MuestraVerificada.accion_realizar
+        ).join(MuestraVerificada, MuestraVerificada.verificacion_id == VerificacionMuestras.id)
+
+        if fecha_desde:
+            consulta = consulta.where(VerificacionMuestras.fecha_creacion >= datetime.combine(fecha_desde, time.min))
+        if fecha_hasta:
+            consulta = consulta.where(VerificacionMuestras.fecha_creacion <= datetime.combine(fecha_hasta, time.max))
+        if cliente and cliente.strip():
+            consulta = consulta.where(VerificacionMuestras.cliente.ilike(f"%{cliente.strip()}%"))
+
+        filas = self.db.execute(consulta).all()
+        df = pd.DataFrame.from_records(filas, columns=self.COLUMNAS)
+        if df.empty:
+            return df
+
+        df['fecha'] = pd.to_datetime(df['fecha'], utc=True, errors='coerce').dt.tz_localize(None)
+        df['tolerancia_porcentaje'] = pd.to_numeric(df['tolerancia_porcentaje'], errors='coerce')
+        for columna in ('tipo_testigo', 'equipo_bernier', 'equipo_balanza', 'accion_realizar'):
+            df[columna] = df[columna].fillna('').astype(str).str.strip().replace('', SIN_DATO)
+
+        # Una muestra es no conforme si falla el diámetro o cualquier control de planitud
+        aceptaciones = df[['aceptacion_diametro', 'planitud_superior', 'planitud_inferior', 'planitud_depresiones']]
+        df['no_conforme'] = (
+            aceptaciones.fillna('').astype(str).apply(lambda col: col.str.strip().str.lower() == 'no cumple').any(axis=1)
+        )
+        return df
+
+    def _tolerancia_por_tipo(self, df: pd.DataFrame, bins: int) -> List[Dict[str, Any]]:
+        """Histograma y carta de control I-MR de la tolerancia de diámetro por tipo de testigo"""
+        if df.empty:
+            return []
+
+        medidas = df.dropna(subset=['tolerancia_porcentaje'])
+        if medidas.empty:
+            return []
+
+        # Bordes comunes para que los histogramas sean comparables entre tipos
+        maximo = max(float(medidas['tolerancia_porcentaje'].max()), TOLERANCIA_DIAMETRO_MAX)
+        bordes = np.linspace(0.0, maximo, bins + 1)
+
+        resumen = medidas.groupby('tipo_testigo')['tolerancia_porcentaje'].agg(
+            ['count', 'mean', 'std', 'min', 'max']
+        )
+        resultado = []
+        for tipo, grupo in medidas.groupby('tipo_testigo'):
+            valores = grupo['tolerancia_porcentaje'].to_numpy()
+            conteos, _ = np.histogram(valores, bins=bordes)
+            estad = resumen.loc[tipo]
+            resultado.append({
+                'tipo_testigo': tipo,
+                'n': int(estad['count']),
+                'media': round(float(estad['mean']), 4),
+                'desviacion': round(float(estad['std']), 4) if pd.notna(estad['std']) else 0.0,
+                'minimo': round(float(estad['min']), 4),
+                'maximo': round(float(estad['max']), 4),
+                'fuera_tolerancia': int((valores > TOLERANCIA_DIAMETRO_MAX).sum()),
+                'histograma': {
+                    'bordes': [round(float(b), 4) for b in bordes],
+                    'conteos': conteos.tolist()
+                },
+                'carta_control': self._carta_control_imr(grupo)
+            })
+        return resultado
+
+    def _carta_control_imr(self, grupo: pd.DataFrame) -> Dict[str, Any]:
+        """Carta de individuos y rango móvil sobre la media diaria de tolerancia"""
+        diario = (
+            grupo.dropna(subset=['fecha'])
+            .groupby(grupo['fecha'].dt.normalize())['tolerancia_porcentaje']
+            .agg(['mean', 'count'])
+        )
+        if diario.empty:
+            return {'linea_central': None, 'lcs': None, 'lci': None, 'puntos': []}
+
+        medias = diario['mean']
+        linea_central = float(medias.mean())
+        rango_movil = float(medias.diff().abs().mean()) if len(medias) > 1 else 0.0
+        lcs = linea_central + FACTOR_LIMITES_IMR * rango_movil
+        lci = max(0.0, linea_central - FACTOR_LIMITES_IMR * rango_movil)
+        fuera = (medias > lcs) | (medias < lci)
+
+        return {
+            'linea_central': round(linea_central, 4),
+            'lcs': round(lcs, 4),
+            'lci': round(lci, 4),
+            'limite_especificacion': TOLERANCIA_DIAMETRO_MAX,
+            'puntos': [
+                {
+                    'fecha': fecha.date().isoformat(),
+                    'media': round(float(media), 4),
+                    'n': int(n),
+                    'fuera_de_control': bool(f)
+                }
+                for fecha, media, n, f in zip(medias.index, medias.to_numpy(), diario['count'].to_numpy(), fuera.to_numpy())
+            ]
+        }
+
+    def _tasa_no_conformidad(self, df: pd.DataFrame, columna_equipo: str) -> List[Dict[str, Any]]:
+        """Tasa de muestras no conformes agrupadas por código de equipo"""
+        if df.empty:
+            return []
+
+        agrupado = df.groupby(columna_equipo)['no_conforme'].agg(['count', 'sum'])
+        agrupado['tasa'] = agrupado['sum'] / agrupado['count']
+        agrupado = agrupado.sort_values('tasa', ascending=False)
+        return [
+            {
+                'equipo': equipo,
+                'total': int(fila['count']),
+                'no_conformes': int(fila['sum']),
+                'tasa': round(float(fila['tasa']), 4)
+            }
+            for equipo, fila in agrupado.iterrows()
+        ]
+
+    def _acciones_por_periodo(self, df: pd.DataFrame) -> List[Dict[str, Any]]:
+        """Distribución mensual de la acción a realizar"""
+        fechadas = df.dropna(subset=['fecha']) if not df.empty else df
+        if fechadas.empty:
+            return []
+
+        periodos = fechadas['fecha'].dt.strftime('%Y-%m')
+        tabla = pd.crosstab(periodos, fechadas['accion_realizar'])
+        return [
+            {
+                'periodo': periodo,
+                'total': int(fila.sum()),
+                'acciones': {accion: int(cantidad) for accion, cantidad in fila.items() if cantidad}
+            }
+            for periodo, fila in tabla.sort_index().iterrows()
+        ]
@@ -3,6 +3,7 @@ Servicio para generación de archivos Excel de Control de Concreto
 Basado en el patrón de recepción de muestras con funcionalidad de búsqueda inteligente
 """
 
+import io
 import os
 from typing import List, Dict, Any, Optional
 from openpyxl import load_workbook
@@ -10,6 +11,9 @@ from openpyxl.styles import Alignment, Border, Side, Font, PatternFill
 from openpyxl.utils import get_column_letter
 import logging
 
+from utils.storage import output_store
+from utils.timing import etapa
+
 logger = logging.getLogger(__name__)
 
 
@@ -26,45 +30,70 @@ class ConcretoExcelService:
         if not os.path.exists(self.template_path):
             raise FileNotFoundError(f"Template no encontrado: {self.template_path}")
     
-    def generar_excel_concreto(self, datos_concreto: List[Dict[str, Any]], 
-                             datos_cliente: Optional[Dict[str, Any]] = None) -> str:
+    def renderizar_excel_concreto(self, datos_concreto: List[Dict[str, Any]], 
+                                  datos_cliente: Optional[Dict[str, Any]] = None) -> bytes:
         """
-        Generar archivo Excel de Control de Concreto con búsqueda inteligente
+        Generar en memoria el Excel de Control de Concreto, sin escribir en disco
         
         Args:
             datos_concreto: Lista de datos de probetas de concreto
             datos_cliente: Datos del cliente para relleno automático (opcional)
         
         Returns:
-            Ruta del archivo generado
+            Contenido del archivo Excel
         """
+        workbook = self.construir_workbook(datos_concreto, datos_cliente)
+        excel_buffer = io.BytesIO()
+        with etapa("guardar"):
+            workbook.save(excel_buffer)
+        return excel_buffer.getvalue()
+    
+    def construir_workbook(self, datos_concreto: List[Dict[str, Any]], 
+                           datos_cliente: Optional[Dict[str, Any]] = None):
+        """Cargar el template y rellenarlo con las probetas, sin serializarlo"""
         try:
             # Cargar template
-            workbook = load_workbook(self.template_path)
+            with etapa("plantilla"):
+                workbook = load_workbook(self.template_path)
             worksheet = workbook.active
             
             logger.info(f"Generando Excel de Control de Concreto con {len(datos_concreto)} probetas")
             
-            # Rellenar datos del cliente si están disponibles
-            if datos_cliente:
-                self._rellenar_datos_cliente(worksheet, datos_cliente)
-            
-            # Rellenar datos de probetas
-            self._rellenar_datos_probetas(worksheet, datos_concreto)
+            with etapa("rellenar"):
+                # Rellenar datos del cliente si están disponibles
+                if datos_cliente:
+                    self._rellenar_datos_cliente(worksheet, datos_cliente)
+                
+                # Rellenar datos de probetas
+                self._rellenar_datos_probetas(worksheet, datos_concreto)
             
             # Aplicar formato final
-            self._aplicar_formato_final(worksheet, len(datos_concreto))
+            with etapa("formato"):
+                self._aplicar_formato_final(worksheet, len(datos_concreto))
             
-            # Guardar archivo
-            output_path = self._guardar_archivo(workbook, "control_concreto")
-            logger.info(f"Archivo generado exitosamente: {output_path}")
-            
-            return output_path
+            return workbook
             
         except Exception as e:
             logger.error(f"Error generando Excel de concreto: {e}")
             raise
     
+    def generar_excel_concreto(self, datos_concreto: List[Dict[str, Any]], 
+                             datos_cliente: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Generar el Excel de Control de Concreto y archivarlo en el almacén
+        
+        Args:
+            datos_concreto: Lista de datos de probetas de concreto
+            datos_cliente: Datos del cliente para relleno automático (opcional)
+        
+        Returns:
+            Clave del archivo generado en el almacén
+        """
+        workbook = self.construir_workbook(datos_concreto, datos_cliente)
+        clave = output_store.guardar_workbook(workbook, "control_concreto")
+        logger.info(f"Archivo archivado exitosamente: {clave}")
+        return clave
+    
     def _rellenar_datos_cliente(self, worksheet, datos_cliente: Dict[str, Any]) -> None:
         """Rellenar datos del cliente en el header del documento"""
         try:
@@ -316,22 +345,6 @@ class ConcretoExcelService:
         except Exception as e:
             logger.error(f"Error aplicando formato final: {e}")
     
-    def _guardar_archivo(self, workbook, nombre_base: str) -> str:
-        """Guardar el archivo Excel generado"""
-        import datetime
-        
-        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"{nombre_base}_{timestamp}.xlsx"
-        
-        # Crear directorio de salida si no existe
-        output_dir = os.path.join(os.path.dirname(__file__), '..', 'output')
-        os.makedirs(output_dir, exist_ok=True)
-        
-        output_path = os.path.join(output_dir, filename)
-        workbook.save(output_path)
-        
-        return output_path
-    
     def buscar_datos_cliente(self, codigo_muestra: str) -> Optional[Dict[str, Any]]:
         """
         Búsqueda inteligente de datos del cliente basada en el código de muestra
@@ -0,0 +1,115 @@
+"""
+Servicio de consultas de lectura sobre la sesión async (get_async_db)
+
+Cada consulta carga con selectinload las relaciones que serializa la
+respuesta: con una sesión async no hay carga perezosa, y así un listado
+cuesta una consulta por relación en lugar de una por fila.
+"""
+
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import desc, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from models import (
+    RecepcionMuestra, MuestraConcreto, OrdenTrabajo, ControlConcreto, VerificacionMuestras
+)
+
+
+class ConsultasService:
+    async def listar_recepciones(self, db: AsyncSession, skip: int = 0, limit: int = 100) -> List[RecepcionMuestra]:
+        """Listar recepciones de muestras con paginación"""
+        resultado = await db.scalars(
+            select(RecepcionMuestra).options(selectinload(RecepcionMuestra.muestras))
+            .order_by(desc(RecepcionMuestra.fecha_creacion)).offset(skip).limit(limit)
+        )
+        return list(resultado)
+    
+    async def obtener_recepcion(self, db: AsyncSession, recepcion_id: int) -> Optional[RecepcionMuestra]:
+        """Obtener recepción por ID"""
+        return await db.scalar(
+            select(RecepcionMuestra).options(selectinload(RecepcionMuestra.muestras))
+            .where(RecepcionMuestra.id == recepcion_id)
+        )
+    
+    async def buscar_recepcion_por_numero(self, db: AsyncSession, numero_recepcion: str) -> Optional[RecepcionMuestra]:
+        """Obtener recepción por número de recepción, con sus muestras"""
+        return await db.scalar(
+            select(RecepcionMuestra).options(selectinload(RecepcionMuestra.muestras))
+            .where(RecepcionMuestra.numero_recepcion == numero_recepcion).limit(1)
+        )
+    
+    async def listar_ordenes_trabajo(self, db: AsyncSession, skip: int = 0, limit: int = 100) -> List[OrdenTrabajo]:
+        """Listar órdenes de trabajo con paginación"""
+        resultado = await db.scalars(
+            select(OrdenTrabajo).options(selectinload(OrdenTrabajo.items))
+            .order_by(desc(OrdenTrabajo.fecha_creacion)).offset(skip).limit(limit)
+        )
+        return list(resultado)
+    
+    async def obtener_orden_trabajo(self, db: AsyncSession, ot_id: int) -> Optional[OrdenTrabajo]:
+        """Obtener orden de trabajo por ID"""
+        return await db.scalar(
+            select(OrdenTrabajo).options(selectinload(OrdenTrabajo.items)).where(OrdenTrabajo.id == ot_id)
+        )
+    
+    async def listar_controles(self, db: AsyncSession, skip: int = 0, limit: int = 100) -> List[ControlConcreto]:
+        """Listar controles de concreto con sus probetas"""
+        resultado = await db.scalars(
+            select(ControlConcreto).options(selectinload(ControlConcreto.probetas)).offset(skip).limit(limit)
+        )
+        return list(resultado)
+    
+    async def obtener_control(self, db: AsyncSession, control_id: int) -> Optional[ControlConcreto]:
+        """Obtener control de concreto por ID"""
+        return await db.scalar(
+            select(ControlConcreto).options(selectinload(ControlConcreto.probetas)).where(ControlConcreto.id == control_id)
+        )
+    
+    async def listar_verificaciones(self, db: AsyncSession, skip: int = 0, limit: int = 100) -> List[VerificacionMuestras]:
+        """Listar verificaciones con sus muestras verificadas"""
+        resultado = await db.scalars(
+            select(VerificacionMuestras).options(selectinload(VerificacionMuestras.muestras_verificadas))
+            .offset(skip).limit(limit)
+        )
+        return list(resultado)
+    
+    async def obtener_verificacion(self, db: AsyncSession, verificacion_id: int) -> Optional[VerificacionMuestras]:
+        """Obtener verificación por ID con sus muestras ordenadas por item_numero"""
+        verificacion = await db.scalar(
+            select(VerificacionMuestras).options(selectinload(VerificacionMuestras.muestras_verificadas))
+            .where(VerificacionMuestras.id == verificacion_id)
+        )
+        if verificacion and verificacion.muestras_verificadas:
+            verificacion.muestras_verificadas.sort(key=lambda m: m.item_numero or 0)
+        return verificacion
+    
+    async def estadisticas_dashboard(self, db: AsyncSession, recientes: int = 5) -> Dict[str, Any]:
+        """Totales de recepciones por estado y de muestras, y las recepciones más recientes"""
+        por_estado = dict((await db.execute(
+            select(RecepcionMuestra.estado, func.count()).group_by(RecepcionMuestra.estado)
+        )).all())
+        total_muestras = await db.scalar(select(func.count()).select_from(MuestraConcreto))
+        ultimas = await db.scalars(
+            select(RecepcionMuestra).options(selectinload(RecepcionMuestra.muestras))
+            .order_by(RecepcionMuestra.fecha_creacion.desc()).limit(recientes)
+        )
+        
+        return {
+            "total_ordenes": sum(por_estado.values()),
+            "ordenes_pendientes": por_estado.get("PENDIENTE", 0),
+            "ordenes_completadas": por_estado.get("COMPLETADA", 0),
+            "total_items": total_muestras,
+            "ordenes_recientes": [
+                {
+                    "id": recepcion.id,
+                    "numero_ot": recepcion.numero_ot,
+                    "numero_recepcion": recepcion.numero_recepcion,
+                    "estado": recepcion.estado,
+                    "fecha_creacion": recepcion.fecha_creacion.isoformat() if recepcion.fecha_creacion else None,
+                    "items": [{"id": m.id, "item_numero": m.item_numero} for m in recepcion.muestras]
+                }
+                for recepcion in ultimas
+            ]
+        }
@@ -0,0 +1,202 @@
+"""
+Preparación de los datos que consumen los servicios de Excel
+Convierte los modelos en diccionarios planos (serializables), de modo que
+los documentos puedan generarse en otro proceso sin acceso a la sesión
+"""
+
+import hashlib
+import json
+from types import SimpleNamespace
+from typing import Any, Dict, List, Tuple
+
+from models import (
+    RecepcionMuestra, MuestraConcreto, OrdenTrabajo, ItemOrdenTrabajo,
+    ControlConcreto, VerificacionMuestras
+)
+
+
+def _formatear_fecha(date_value) -> str:
+    """Formatear fecha de manera segura"""
+    if not date_value:
+        return ''
+    if isinstance(date_value, str):
+        return date_value
+    if hasattr(date_value, 'strftime'):
+        return date_value.strftime('%d/%m/%Y')
+    return str(date_value)
+
+
+def _formatear_hora(time_value) -> str:
+    """Formatear hora de manera segura"""
+    if not time_value:
+        return ''
+    if isinstance(time_value, str):
+        return time_value
+    if hasattr(time_value, 'strftime'):
+        return time_value.strftime('%H:%M')
+    return str(time_value)
+
+
+def preparar_datos_recepcion(recepcion: RecepcionMuestra) -> dict:
+    """Preparar datos de recepción para Excel"""
+    return {
+        'numero_ot': recepcion.numero_ot or '',
+        'numero_recepcion': recepcion.numero_recepcion or '',
+        'numero_cotizacion': recepcion.numero_cotizacion or '',
+        # codigo_trazabilidad eliminado
+        # asunto eliminado
+        'cliente': recepcion.cliente or '',
+        'domicilio_legal': recepcion.domicilio_legal or '',
+        'ruc': recepcion.ruc or '',
+        'persona_contacto': recepcion.persona_contacto or '',
+        'email': recepcion.email or '',
+        'telefono': recepcion.telefono or '',
+        'solicitante': recepcion.solicitante or '',
+        'domicilio_solicitante': recepcion.domicilio_solicitante or '',
+        'proyecto': recepcion.proyecto or '',
+        'ubicacion': recepcion.ubicacion or '',
+        'fecha_recepcion': _formatear_fecha(recepcion.fecha_recepcion),
+        'fecha_estimada_culminacion': _formatear_fecha(recepcion.fecha_estimada_culminacion),
+        'emision_fisica': recepcion.emision_fisica or False,
+        'emision_digital': recepcion.emision_digital or False,
+        'entregado_por': recepcion.entregado_por or '',
+        'recibido_por': recepcion.recibido_por or '',
+        'codigo_laboratorio': recepcion.codigo_laboratorio or '',
+        'version': recepcion.version or ''
+    }
+
+
+def preparar_datos_muestras(muestras: List[MuestraConcreto]) -> List[dict]:
+    """Preparar datos de muestras para Excel"""
+    muestras_dict = []
+    for muestra in muestras:
+        # Incluir explicitamente codigo_muestra_lem para columna B
+        muestras_dict.append({
+            'item_numero': muestra.item_numero or 0,
+            'codigo_muestra_lem': getattr(muestra, 'codigo_muestra_lem', '') or '',
+            'codigo_muestra': muestra.codigo_muestra or '',
+            'identificacion_muestra': muestra.identificacion_muestra or '',
+            'estructura': muestra.estructura or '',
+            'fc_kg_cm2': muestra.fc_kg_cm2 or 0,
+            'fecha_moldeo': _formatear_fecha(muestra.fecha_moldeo),
+            'hora_moldeo': _formatear_hora(muestra.hora_moldeo),
+            'edad': muestra.edad or 0,
+            'fecha_rotura': _formatear_fecha(muestra.fecha_rotura),
+            'requiere_densidad': muestra.requiere_densidad or False
+        })
+    return muestras_dict
+
+
+def preparar_datos_ot(ot: OrdenTrabajo) -> dict:
+    """Preparar datos de orden de trabajo para Excel"""
+    return {
+        'numero_ot': ot.numero_ot or '',
+        'numero_recepcion': ot.numero_recepcion or '',
+        'fecha_recepcion': _formatear_fecha(ot.fecha_recepcion),
+        'plazo_entrega_dias': ot.plazo_entrega_dias or '',
+        'fecha_inicio_programado': _formatear_fecha(ot.fecha_inicio_programado),
+        'fecha_fin_programado': _formatear_fecha(ot.fecha_fin_programado),
+        'fecha_inicio_real': _formatear_fecha(ot.fecha_inicio_real),
+        'fecha_fin_real': _formatear_fecha(ot.fecha_fin_real),
+        'variacion_inicio': ot.variacion_inicio or '',
+        'variacion_fin': ot.variacion_fin or '',
+        'duracion_real_dias': ot.duracion_real_dias or '',
+        'observaciones': ot.observaciones or '',
+        'aperturada_por': ot.aperturada_por or '',
+        'designada_a': ot.designada_a or '',
+        'estado': ot.estado or '',
+        'codigo_laboratorio': ot.codigo_laboratorio or '',
+        'version': ot.version or ''
+    }
+
+
+def preparar_datos_items(items: List[ItemOrdenTrabajo]) -> List[dict]:
+    """Preparar datos de items para Excel"""
+    items_dict = []
+    for item in items:
+        items_dict.append({
+            'item_numero': item.item_numero or 0,
+            'codigo_muestra': item.codigo_muestra or '',
+            'descripcion': item.descripcion or '',
+            'cantidad': item.cantidad or 0
+        })
+    return items_dict
+
+
+def preparar_datos_control(control: ControlConcreto) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """Preparar probetas y datos de cabecera de un control de concreto para Excel"""
+    probetas_data = []
+    for probeta in control.probetas:
+        probetas_data.append({
+            'item_numero': probeta.item_numero,
+            'orden_trabajo': probeta.orden_trabajo,
+            'codigo_muestra': probeta.codigo_muestra,
+            'codigo_muestra_cliente': probeta.codigo_muestra_cliente,
+            'fecha_rotura': probeta.fecha_rotura,
+            'elemento': probeta.elemento,
+            'fc_kg_cm2': probeta.fc_kg_cm2,
+            'status_ensayado': probeta.status_ensayado
+        })
+    
+    # Datos del cliente para relleno automático
+    datos_cliente = {
+        'codigo_documento': control.codigo_documento,
+        'version': control.version,
+        'fecha_documento': control.fecha_documento,
+        'pagina': control.pagina
+    }
+    return probetas_data, datos_cliente
+
+
+def _columnas(instancia) -> Dict[str, Any]:
+    return {columna.key: getattr(instancia, columna.key) for columna in instancia.__table__.columns}
+
+
+def preparar_datos_verificacion(verificacion: VerificacionMuestras) -> SimpleNamespace:
+    """
+    Copia desacoplada de la sesión de una verificación y sus muestras.
+    VerificacionExcelService solo lee atributos, así que la copia puede usarse en su lugar.
+    """
+    muestras = [SimpleNamespace(**_columnas(muestra)) for muestra in verificacion.muestras_verificadas]
+    return SimpleNamespace(**_columnas(verificacion), muestras_verificadas=muestras)
+
+
+def _datos_control(control: ControlConcreto) -> Dict[str, Any]:
+    probetas, cliente = preparar_datos_control(control)
+    return {'probetas': probetas, 'cliente': cliente}
+
+
+# Documentos por entidad: tipo -> (modelo, relación a precargar, datos para renderizar_documento, nombre del archivo)
+DOCUMENTOS = {
+    'recepcion': (
+        RecepcionMuestra, RecepcionMuestra.muestras,
+        lambda r: {'recepcion': preparar_datos_recepcion(r), 'muestras': preparar_datos_muestras(r.muestras)},
+        lambda r: f"recepcion_{r.numero_recepcion}.xlsx"
+    ),
+    'ot': (
+        OrdenTrabajo, OrdenTrabajo.items,
+        lambda ot: {'ot': preparar_datos_ot(ot), 'items': preparar_datos_items(ot.items)},
+        lambda ot: f"OT-{ot.numero_ot}.xlsx"
+    ),
+    'control': (
+        ControlConcreto, ControlConcreto.probetas,
+        _datos_control,
+        lambda c: f"control_concreto_{c.numero_control}.xlsx"
+    ),
+    'verificacion': (
+        VerificacionMuestras, VerificacionMuestras.muestras_verificadas,
+        lambda v: {'verificacion': preparar_datos_verificacion(v)},
+        lambda v: f"verificacion_{v.numero_verificacion}.xlsx"
+    ),
+}
+
+
+def huella_datos(datos: Any) -> str:
+    """Hash estable de los datos de entrada de un documento"""
+    def serializable(valor):
+        if isinstance(valor, SimpleNamespace):
+            return vars(valor)
+        return str(valor)
+    
+    texto = json.dumps(datos, default=serializable, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(texto.encode('utf-8')).hexdigest()
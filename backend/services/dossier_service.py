@@ -0,0 +1,262 @@
+"""
+Servicio de exportación de dossiers: todos los documentos de un conjunto de
+recepciones (recepción, OT, control de concreto y verificación) en un solo ZIP
+"""
+
+import io
+import json
+import logging
+import re
+import zipfile
+from concurrent.futures import as_completed
+from datetime import date, datetime, time
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from sqlalchemy.orm import Session, selectinload
+
+from config import settings
+from models import (
+    RecepcionMuestra, OrdenTrabajo, ControlConcreto, ProbetaConcreto,
+    VerificacionMuestras, MuestraVerificada
+)
+from services.concreto_excel_service import ConcretoExcelService
+from services.excel_collaborative_service import ExcelCollaborativeService
+from services.ot_excel_collaborative_service import OTExcelCollaborativeService
+from services.verificacion_excel_service import VerificacionExcelService
+from services.datos_documentos import (
+    preparar_datos_recepcion, preparar_datos_muestras, preparar_datos_ot,
+    preparar_datos_items, preparar_datos_control, preparar_datos_verificacion
+)
+from utils.timing import etapa, medir_etapas
+from utils.workers import obtener_pool_procesos
+
+logger = logging.getLogger(__name__)
+
+TIPOS_DOCUMENTO = ('recepcion', 'ot', 'control', 'verificacion')
+
+# Tamaño de los lotes para consultas con IN (...)
+_TAMANO_LOTE_IN = 500
+
+
+def renderizar_documento(tipo: str, datos: Dict[str, Any]) -> bytes:
+    """
+    Generar un documento a partir de datos ya preparados.
+    Función de módulo para poder ejecutarse en el pool de procesos.
+    """
+    if tipo == 'recepcion':
+        return ExcelCollaborativeService().modificar_excel_con_datos(datos['recepcion'], datos['muestras'])
+    if tipo == 'ot':
+        return OTExcelCollaborativeService().modificar_excel_con_datos(datos['ot'], datos['items'])
+    if tipo == 'control':
+        return ConcretoExcelService().renderizar_excel_concreto(datos['probetas'], datos['cliente'])
+    if tipo == 'verificacion':
+        return VerificacionExcelService().renderizar_excel_verificacion(datos['verificacion'])
+    raise ValueError(f"Tipo de documento no soportado: {tipo}")
+
+
+def construir_workbook(tipo: str, datos: Dict[str, Any]):
+    """Workbook de openpyxl rellenado a partir de datos ya preparados, sin serializar"""
+    if tipo == 'recepcion':
+        return ExcelCollaborativeService().construir_workbook(datos['recepcion'], datos['muestras'])
+    if tipo == 'ot':
+        return OTExcelCollaborativeService().construir_workbook(datos['ot'], datos['items'])
+    if tipo == 'control':
+        return ConcretoExcelService().construir_workbook(datos['probetas'], datos['cliente'])
+    if tipo == 'verificacion':
+        return VerificacionExcelService().construir_workbook(datos['verificacion'])
+    raise ValueError(f"Tipo de documento no soportado: {tipo}")
+
+
+def renderizar_documento_en_archivo(tipo: str, datos: Dict[str, Any], ruta: str) -> Dict[str, float]:
+    """
+    Generar un documento directamente en ruta y retornar los tiempos por etapa,
+    que en el pool de procesos no llegan al registro del proceso principal.
+    El contenido no vuelve serializado al proceso principal: solo la ruta.
+    """
+    with medir_etapas() as tiempos:
+        workbook = construir_workbook(tipo, datos)
+        with etapa("guardar"):
+            workbook.save(ruta)
+    return tiempos
+
+
+def _nombre_seguro(valor: Any) -> str:
+    return re.sub(r'[^A-Za-z0-9_.-]+', '_', str(valor or '')).strip('_') or 'sin_numero'
+
+
+class _BufferZip(io.RawIOBase):
+    """Destino no posicionable para ZipFile: acumula lo escrito hasta que se vacía"""
+    
+    def __init__(self):
+        super().__init__()
+        self._partes: List[bytes] = []
+        self._posicion = 0
+    
+    def writable(self) -> bool:
+        return True
+    
+    def write(self, datos) -> int:
+        self._partes.append(bytes(datos))
+        self._posicion += len(datos)
+        return len(datos)
+    
+    def tell(self) -> int:
+        return self._posicion
+    
+    def vaciar(self) -> bytes:
+        datos = b''.join(self._partes)
+        self._partes.clear()
+        return datos
+
+
+class DossierService:
+    """Resolución de documentos relacionados y generación del ZIP"""
+    
+    def __init__(self, db: Session):
+        self.db = db
+    
+    def obtener_recepciones(self, recepcion_ids: Optional[List[int]] = None,
+                            fecha_desde: Optional[date] = None,
+                            fecha_hasta: Optional[date] = None) -> List[RecepcionMuestra]:
+        """Recepciones por id y/o por rango de fecha de recepción (ambos extremos incluidos)"""
+        query = self.db.query(RecepcionMuestra).options(selectinload(RecepcionMuestra.muestras))
+        if recepcion_ids:
+            query = query.filter(RecepcionMuestra.id.in_(recepcion_ids))
+        if fecha_desde:
+            query = query.filter(RecepcionMuestra.fecha_recepcion >= datetime.combine(fecha_desde, time.min))
+        if fecha_hasta:
+            query = query.filter(RecepcionMuestra.fecha_recepcion <= datetime.combine(fecha_hasta, time.max))
+        return query.order_by(RecepcionMuestra.id).limit(settings.dossier_max_recepciones + 1).all()
+    
+    def preparar_documentos(self, recepciones: List[RecepcionMuestra],
+                            tipos: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """
+        Resolver OT, controles y verificaciones de las recepciones y preparar
+        los datos de cada documento. Retorna [{'tipo', 'archivo', 'datos'}].
+        
+        - OT: misma numero_ot que la recepción
+        - Control de concreto: alguna probeta con orden_trabajo = numero_ot
+        - Verificación: alguna muestra con codigo_lem igual a un código LEM de la recepción
+        
+        Un control o verificación relacionado con varias recepciones se incluye una sola vez,
+        en la carpeta de una de ellas.
+        """
+        tipos = set(tipos or TIPOS_DOCUMENTO)
+        carpetas = {r.numero_ot: _nombre_seguro(f"{r.numero_ot}_{r.numero_recepcion}") for r in recepciones}
+        documentos = []
+        
+        if 'recepcion' in tipos:
+            for recepcion in recepciones:
+                documentos.append({
+                    'tipo': 'recepcion',
+                    'archivo': f"{carpetas[recepcion.numero_ot]}/recepcion_{_nombre_seguro(recepcion.numero_recepcion)}.xlsx",
+                    'datos': {
+                        'recepcion': preparar_datos_recepcion(recepcion),
+                        'muestras': preparar_datos_muestras(recepcion.muestras)
+                    }
+                })
+        
+        numeros_ot = list(carpetas)
+        
+        if 'ot' in tipos:
+            for ot in self._en_lotes(
+                self.db.query(OrdenTrabajo).options(selectinload(OrdenTrabajo.items)),
+                OrdenTrabajo.numero_ot, numeros_ot
+            ):
+                documentos.append({
+                    'tipo': 'ot',
+                    'archivo': f"{carpetas[ot.numero_ot]}/OT-{_nombre_seguro(ot.numero_ot)}.xlsx",
+                    'datos': {'ot': preparar_datos_ot(ot), 'items': preparar_datos_items(ot.items)}
+                })
+        
+        if 'control' in tipos:
+            controles = self._en_lotes(
+                self.db.query(ControlConcreto).join(ControlConcreto.probetas)
+                .options(selectinload(ControlConcreto.probetas)),
+                ProbetaConcreto.orden_trabajo, numeros_ot
+            )
+            for control in controles:
+                numero_ot = next(p.orden_trabajo for p in control.probetas if p.orden_trabajo in carpetas)
+                probetas, cliente = preparar_datos_control(control)
+                documentos.append({
+                    'tipo': 'control',
+                    'archivo': f"{carpetas[numero_ot]}/control_concreto_{_nombre_seguro(control.numero_control)}.xlsx",
+                    'datos': {'probetas': probetas, 'cliente': cliente}
+                })
+        
+        if 'verificacion' in tipos:
+            ot_por_codigo = {}
+            for recepcion in recepciones:
+                for muestra in recepcion.muestras:
+                    if muestra.codigo_muestra_lem:
+                        ot_por_codigo.setdefault(muestra.codigo_muestra_lem, recepcion.numero_ot)
+            
+            verificaciones = self._en_lotes(
+                self.db.query(VerificacionMuestras).join(VerificacionMuestras.muestras_verificadas)
+                .options(selectinload(VerificacionMuestras.muestras_verificadas)),
+                MuestraVerificada.codigo_lem, list(ot_por_codigo)
+            )
+            for verificacion in verificaciones:
+                numero_ot = next(
+                    ot_por_codigo[m.codigo_lem] for m in verificacion.muestras_verificadas
+                    if m.codigo_lem in ot_por_codigo
+                )
+                documentos.append({
+                    'tipo': 'verificacion',
+                    'archivo': f"{carpetas[numero_ot]}/verificacion_{_nombre_seguro(verificacion.numero_verificacion)}.xlsx",
+                    'datos': {'verificacion': preparar_datos_verificacion(verificacion)}
+                })
+        
+        return documentos
+    
+    @staticmethod
+    def _en_lotes(query, columna, valores: List[Any]) -> List[Any]:
+        """Ejecutar query filtrando columna IN valores por lotes, sin repetir entidades"""
+        resultados = {}
+        for inicio in range(0, len(valores), _TAMANO_LOTE_IN):
+            for entidad in query.filter(columna.in_(valores[inicio:inicio + _TAMANO_LOTE_IN])).distinct():
+                resultados.setdefault(entidad.id, entidad)
+        return [resultados[clave] for clave in sorted(resultados)]
+    
+    @staticmethod
+    def generar_zip(documentos: List[Dict[str, Any]],
+                    progreso: Optional[Callable[[int, int], None]] = None) -> Iterator[bytes]:
+        """
+        Generar los documentos en el pool de procesos y escribir cada uno en el ZIP
+        apenas termina. Los documentos que fallan se listan en resumen.json.
+        progreso(terminados, total) se llama después de cada documento.
+        """
+        buffer = _BufferZip()
+        pool = obtener_pool_procesos()
+        futuros = {pool.submit(renderizar_documento, doc['tipo'], doc['datos']): doc for doc in documentos}
+        resumen = {'generados': [], 'errores': []}
+        
+        # Los .xlsx ya están comprimidos: se guardan sin volver a comprimir
+        with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_STORED) as zf:
+            try:
+                for terminados, futuro in enumerate(as_completed(futuros), start=1):
+                    doc = futuros[futuro]
+                    try:
+                        contenido = futuro.result()
+                    except Exception as e:
+                        logger.error(f"Error generando {doc['archivo']}: {str(e)}")
+                        resumen['errores'].append({'archivo': doc['archivo'], 'mensaje': str(e)})
+                    else:
+                        zf.writestr(doc['archivo'], contenido)
+                        resumen['generados'].append(doc['archivo'])
+                    
+                    if progreso:
+                        progreso(terminados, len(futuros))
+                    yield buffer.vaciar()
+                
+                resumen['generados'].sort()
+                zf.writestr('resumen.json', json.dumps(resumen, ensure_ascii=False, indent=2))
+            finally:
+                # Si el cliente se desconecta, no seguir generando
+                for futuro in futuros:
+                    futuro.cancel()
+        
+        yield buffer.vaciar()
+        logger.info(
+            f"Dossier generado: {len(resumen['generados'])} documentos, {len(resumen['errores'])} errores"
+        )
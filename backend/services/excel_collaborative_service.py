@@ -1,10 +1,35 @@
 import io
+import logging
 from copy import copy
+from dataclasses import dataclass
 from typing import List, Dict, Any, Optional
 
 import openpyxl
 from openpyxl.styles import Alignment, Border, Font
 
+from utils.timing import etapa
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ContextoRecepcion:
+    """
+    Estado de un render de recepción. Se crea en cada llamada a construir_workbook
+    y se pasa a los pasos que lo necesitan; el servicio no guarda estado del
+    documento, así que una misma instancia puede renderizar en varios hilos a la vez.
+    """
+    worksheet: Any
+    muestras: List[Dict[str, Any]]
+    fila_inicio: int
+    altura_item: float
+    footer_row: Optional[int] = None
+    
+    @property
+    def total_items(self) -> int:
+        return len(self.muestras)
+
+
 class ExcelCollaborativeService:
     """Servicio para modificar archivos Excel existentes con datos del formulario"""
     
@@ -22,18 +47,30 @@ class ExcelCollaborativeService:
     def modificar_excel_con_datos(self, recepcion_data: Dict[str, Any], muestras: List[Dict[str, Any]], 
                                  template_path: Optional[str] = None) -> bytes:
         """Modificar archivo Excel existente con datos del formulario"""
+        workbook = self.construir_workbook(recepcion_data, muestras, template_path)
+        
+        # Guardar
+        excel_buffer = io.BytesIO()
+        with etapa("guardar"):
+            workbook.save(excel_buffer)
+        excel_buffer.seek(0)
+        
+        # print("TEMPLATE REAL USADO EXITOSAMENTE")
+        return excel_buffer.getvalue()
+    
+    def construir_workbook(self, recepcion_data: Dict[str, Any], muestras: List[Dict[str, Any]], 
+                           template_path: Optional[str] = None):
+        """Cargar el template y rellenarlo con los datos del formulario, sin serializarlo"""
         
         # Ruta del template
         template_file = template_path or self.template_path
         # print(f"USANDO TEMPLATE: {template_file}")
         
         # Cargar template directamente
-        workbook = openpyxl.load_workbook(template_file)
+        with etapa("plantilla"):
+            workbook = openpyxl.load_workbook(template_file)
         worksheet = workbook.active
         
-        # Guardar número de items para uso en safe_set_cell
-        self._total_items = len(muestras)
-        
         # Cambiar "X" por "Descripción" - manejar celdas fusionadas
         try:
             # Buscar la celda que contiene "X" en la fila 22
@@ -63,17 +100,18 @@ class ExcelCollaborativeService:
             pass
         
         # Rellenar datos
-        self._rellenar_datos_recepcion(worksheet, recepcion_data)
-        self._rellenar_datos_muestras(worksheet, muestras)
-        self._ajustar_ancho_columnas(worksheet)
-        
-        # Guardar
-        excel_buffer = io.BytesIO()
-        workbook.save(excel_buffer)
-        excel_buffer.seek(0)
-        
-        # print("TEMPLATE REAL USADO EXITOSAMENTE")
-        return excel_buffer.getvalue()
+        with etapa("rellenar"):
+            self._rellenar_datos_recepcion(worksheet, recepcion_data)
+            contexto = ContextoRecepcion(
+                worksheet=worksheet,
+                muestras=muestras,
+                fila_inicio=self.FILA_INICIO_MUESTRAS,
+                altura_item=worksheet.row_dimensions[self.FILA_INICIO_MUESTRAS].height or self.ALTURA_FILA_ESTANDAR
+            )
+            self._rellenar_datos_muestras(contexto)
+            self._ajustar_ancho_columnas(worksheet)
+        
+        return workbook
     
     def _rellenar_datos_recepcion(self, worksheet, recepcion_data: Dict[str, Any]):
         """Rellenar datos de la recepción en el Excel"""
@@ -98,7 +136,7 @@ class ExcelCollaborativeService:
                 
             except Exception as e:
                 # Log del error pero no interrumpir el flujo
-                print(f"Error estableciendo celda {cell_ref}: {e}")
+                logger.warning("Error estableciendo celda %s: %s", cell_ref, e)
         
         # Datos principales
         safe_set_cell('D6', recepcion_data.get('numero_recepcion', ''))
@@ -145,10 +183,12 @@ class ExcelCollaborativeService:
         # Información de contacto en columna D
         self._agregar_informacion_contacto(worksheet)
         
-        print("Datos de recepción rellenados")
+        logger.debug("Datos de recepción rellenados")
     
-    def _rellenar_datos_muestras(self, worksheet, muestras: List[Dict[str, Any]]):
+    def _rellenar_datos_muestras(self, contexto: ContextoRecepcion):
         """Rellenar datos de las muestras manteniendo el footer en su posición."""
+        worksheet = contexto.worksheet
+        muestras = contexto.muestras
 
         def safe_set_cell(cell_ref: str, value: Any) -> None:
             try:
@@ -167,16 +207,16 @@ class ExcelCollaborativeService:
                 destino.value = value
                 
             except Exception as e:
-                print(f"Error estableciendo celda {cell_ref}: {e}")
+                logger.warning("Error estableciendo celda %s: %s", cell_ref, e)
 
         columnas_tabla = ['A', 'B', 'C', 'D', 'E', 'F', 'G', 'H', 'I', 'J', 'K']
 
-        fila_inicio = self.FILA_INICIO_MUESTRAS
-        total_items = len(muestras)
-        altura_item = worksheet.row_dimensions[fila_inicio].height or self.ALTURA_FILA_ESTANDAR
+        fila_inicio = contexto.fila_inicio
+        total_items = contexto.total_items
+        altura_item = contexto.altura_item
 
-        footer_row = self._find_footer_row(worksheet)
-        if not footer_row:
+        contexto.footer_row = self._find_footer_row(worksheet)
+        if not contexto.footer_row:
             raise ValueError("No se encontró el footer en la plantilla original")
 
         # Ajustar ancho de columna A para evitar "#" en números
@@ -189,11 +229,12 @@ class ExcelCollaborativeService:
         if total_items > 17:
             # Para 18+ items: solo mover footer si es necesario
             from .footer_functions import mover_footer_simple, asegurar_contenido_footer
-            footer_row = mover_footer_simple(worksheet, footer_row, total_items)
-            print(f"Footer ajustado para {total_items} items")
+            with etapa("filas"):
+                contexto.footer_row = mover_footer_simple(worksheet, contexto.footer_row, total_items)
+            logger.debug("Footer ajustado para %s items", total_items)
         else:
             # Para 17 o menos items: mantener template original
-            print(f"Manteniendo template original para {total_items} items")
+            logger.debug("Manteniendo template original para %s items", total_items)
 
         for indice, muestra in enumerate(muestras):
             fila_actual = fila_inicio + indice
@@ -201,16 +242,16 @@ class ExcelCollaborativeService:
 
             # Forzar número de item correcto
             item_numero = indice + 1
-            print(f"Fila {fila_actual}: item_numero forzado={item_numero}")
+            logger.debug("Fila %s: item_numero forzado=%s", fila_actual, item_numero)
             
             # Debug específico para celda A
             try:
                 celda_a = worksheet[f'A{fila_actual}']
-                print(f"  Celda A{fila_actual} antes: {celda_a.value}")
+                logger.debug("Celda A%s antes: %s", fila_actual, celda_a.value)
                 celda_a.value = item_numero
-                print(f"  Celda A{fila_actual} después: {celda_a.value}")
+                logger.debug("Celda A%s después: %s", fila_actual, celda_a.value)
             except Exception as e:
-                print(f"  Error en celda A{fila_actual}: {e}")
+                logger.warning("Error en celda A%s: %s", fila_actual, e)
             
             # Establecer número de item en columna A
             safe_set_cell(f'A{fila_actual}', item_numero)
@@ -225,37 +266,37 @@ class ExcelCollaborativeService:
             
             # Corrección específica para fila 49 - problemas especiales
             if fila_actual == 49:
-                print("Aplicando corrección ESPECÍFICA para fila 49...")
+                logger.debug("Aplicando corrección ESPECÍFICA para fila 49...")
                 # Desfusionar A:B si están fusionadas
                 coord_a_b = f"A{fila_actual}:B{fila_actual}"
                 for rango in list(worksheet.merged_cells.ranges):
                     if rango.coord == coord_a_b:
                         worksheet.unmerge_cells(coord_a_b)
-                        print(f"Desfusionadas A:B en fila 49")
+                        logger.debug("Desfusionadas A:B en fila 49")
                         break
                 
                 # Asegurar que el código esté en B
                 codigo_value = muestra.get('codigo_muestra_lem', '')
                 if codigo_value:
                     worksheet[f'B{fila_actual}'].value = codigo_value
-                    print(f"Código {codigo_value} forzado en B49")
+                    logger.debug("Código %s forzado en B49", codigo_value)
                 
                 # Asegurar ancho de columnas
                 worksheet.column_dimensions['A'].width = 15.0
                 worksheet.column_dimensions['B'].width = 20.0
-                print("Corrección ESPECÍFICA aplicada para fila 49")
+                logger.debug("Corrección ESPECÍFICA aplicada para fila 49")
             
             # Corrección para items 18+ (excluyendo fila 49 que ya se procesó)
             elif fila_actual >= 40:  # A partir del item 18 (fila 40 = item 18)
-                print(f"Aplicando corrección para item 18+ en fila {fila_actual}...")
+                logger.debug("Aplicando corrección para item 18+ en fila %s...", fila_actual)
                 # Asegurar que el código esté en B y sea visible
                 codigo_value = muestra.get('codigo_muestra_lem', '')
                 if codigo_value:
                     worksheet[f'B{fila_actual}'].value = codigo_value
-                    print(f"Código {codigo_value} establecido en B{fila_actual}")
+                    logger.debug("Código %s establecido en B%s", codigo_value, fila_actual)
                 # Asegurar ancho de columna B para códigos
                 worksheet.column_dimensions['B'].width = 20.0
-                print(f"Ancho de columna B ajustado para fila {fila_actual}")
+                logger.debug("Ancho de columna B ajustado para fila %s", fila_actual)
             safe_set_cell(f'D{fila_actual}', muestra.get('identificacion_muestra', ''))
             safe_set_cell(f'E{fila_actual}', muestra.get('estructura', ''))
             safe_set_cell(f'F{fila_actual}', muestra.get('fc_kg_cm2', ''))
@@ -270,14 +311,14 @@ class ExcelCollaborativeService:
             
             # Corrección final específica para fila 49
             if fila_actual == 49:
-                print("Aplicando corrección FINAL para fila 49...")
+                logger.debug("Aplicando corrección FINAL para fila 49...")
                 
                 # Desfusionar A:B definitivamente
                 coord_a_b = f"A49:B49"
                 for rango in list(worksheet.merged_cells.ranges):
                     if rango.coord == coord_a_b:
                         worksheet.unmerge_cells(coord_a_b)
-                        print("Desfusionadas A:B definitivamente en fila 49")
+                        logger.debug("Desfusionadas A:B definitivamente en fila 49")
                         break
                 
                 # Asegurar que B:C estén fusionadas
@@ -289,44 +330,44 @@ class ExcelCollaborativeService:
                         break
                 if not already_merged:
                     worksheet.merge_cells(coord_b_c)
-                    print("Fusionadas B:C definitivamente en fila 49")
+                    logger.debug("Fusionadas B:C definitivamente en fila 49")
                 
                 # Desfusionar F:G definitivamente
                 coord_f_g = f"F49:G49"
                 for rango in list(worksheet.merged_cells.ranges):
                     if rango.coord == coord_f_g:
                         worksheet.unmerge_cells(coord_f_g)
-                        print("Desfusionadas F:G definitivamente en fila 49")
+                        logger.debug("Desfusionadas F:G definitivamente en fila 49")
                         break
                 
                 # Corregir datos específicos de la fila 49
                 # A49: Número de item (no número de fila)
                 worksheet['A49'].value = item_numero
-                print(f"Número de item {item_numero} establecido en A49")
+                logger.debug("Número de item %s establecido en A49", item_numero)
                 
                 # B49: Código de muestra
                 codigo_value = muestra.get('codigo_muestra_lem', '')
                 if codigo_value:
                     worksheet['B49'].value = codigo_value
-                    print(f"Código {codigo_value} establecido en B49")
+                    logger.debug("Código %s establecido en B49", codigo_value)
                 
                 # E49: Estructura (está vacía en la imagen)
                 estructura = muestra.get('estructura', '')
                 if estructura:
                     worksheet['E49'].value = estructura
-                    print(f"Estructura {estructura} establecida en E49")
+                    logger.debug("Estructura %s establecida en E49", estructura)
                 
                 # F49: fc_kg_cm2 (280) - CORRECCIÓN ESPECÍFICA
                 fc_value = muestra.get('fc_kg_cm2', '')
                 if fc_value:
                     worksheet['F49'].value = fc_value
-                    print(f"F49: fc_kg_cm2 {fc_value} establecido correctamente")
+                    logger.debug("F49: fc_kg_cm2 %s establecido correctamente", fc_value)
                 
                 # G49: fecha_moldeo (27/09/2025) - CORRECCIÓN ESPECÍFICA
                 fecha_moldeo = muestra.get('fecha_moldeo', '')
                 if fecha_moldeo:
                     worksheet['G49'].value = fecha_moldeo
-                    print(f"G49: fecha_moldeo {fecha_moldeo} establecido correctamente")
+                    logger.debug("G49: fecha_moldeo %s establecido correctamente", fecha_moldeo)
                 
                 # Aplicar bordes a toda la fila 49
                 from openpyxl.styles import Border, Side
@@ -347,21 +388,22 @@ class ExcelCollaborativeService:
                 worksheet.column_dimensions['A'].width = 15.0
                 worksheet.column_dimensions['B'].width = 20.0
                 
-                print("Corrección FINAL aplicada exitosamente para fila 49")
+                logger.debug("Corrección FINAL aplicada exitosamente para fila 49")
 
-        self._limpiar_filas_restantes(worksheet, fila_inicio + total_items, footer_row, columnas_tabla)
-        # Solo eliminar segunda línea web si hay muchos items
-        if total_items > 17:
-            self._eliminar_segunda_linea_web(worksheet)
-        
-        # Centrar datos de filas específicas (20, 21, 29) cuando tengan items
-        self._centrar_filas_especificas(worksheet, fila_inicio, total_items)
-        
-        # SIEMPRE centrar el último número de item
-        self._centrar_ultimo_item(worksheet, fila_inicio, total_items)
-        
-        # SIEMPRE centrar toda la fila de items
-        self._centrar_toda_fila_items(worksheet, fila_inicio, total_items)
+        with etapa("formato"):
+            self._limpiar_filas_restantes(worksheet, fila_inicio + total_items, contexto.footer_row, columnas_tabla)
+            # Solo eliminar segunda línea web si hay muchos items
+            if total_items > 17:
+                self._eliminar_segunda_linea_web(worksheet)
+            
+            # Centrar datos de filas específicas (20, 21, 29) cuando tengan items
+            self._centrar_filas_especificas(worksheet, fila_inicio, total_items)
+            
+            # SIEMPRE centrar el último número de item
+            self._centrar_ultimo_item(worksheet, fila_inicio, total_items)
+            
+            # SIEMPRE centrar toda la fila de items
+            self._centrar_toda_fila_items(worksheet, fila_inicio, total_items)
     
     def _centrar_filas_especificas(self, worksheet, fila_inicio: int, total_items: int) -> None:
         """Centrar datos de filas específicas (items 20, 21, 24, 25, 26, 27, 29, 40) cuando tengan items"""
@@ -377,7 +419,7 @@ class ExcelCollaborativeService:
             
             # Verificar si la fila está dentro del rango de items
             if fila_inicio <= fila_excel < fila_inicio + total_items:
-                print(f"Centrando fila {fila_excel} (item {item_num})")
+                logger.debug("Centrando fila %s (item %s)", fila_excel, item_num)
                 
                 # Aplicar alineación centrada a todas las columnas de datos
                 for col in ['A', 'B', 'C', 'D', 'E', 'F', 'G', 'H', 'I', 'J', 'K']:
@@ -393,10 +435,10 @@ class ExcelCollaborativeService:
                         
                         # Aplicar alineación centrada
                         celda_destino.alignment = Alignment(horizontal='center', vertical='center')
-                        print(f"  Centrada celda {col}{fila_excel}")
+                        logger.debug("Centrada celda %s%s", col, fila_excel)
                         
                     except Exception as e:
-                        print(f"  Error centrando {col}{fila_excel}: {e}")
+                        logger.warning("Error centrando %s%s: %s", col, fila_excel, e)
                         pass
     
     def _ajustar_ancho_columnas(self, worksheet):
@@ -419,15 +461,15 @@ class ExcelCollaborativeService:
 
     def _asegurar_capacidad_items(self, worksheet, footer_row: int, total_items: int) -> int:
         capacidad_actual = footer_row - self.FILA_INICIO_MUESTRAS
-        print(f"Capacidad actual: {capacidad_actual}, Items necesarios: {total_items}")
+        logger.debug("Capacidad actual: %s, Items necesarios: %s", capacidad_actual, total_items)
         
         # Solo insertar filas si realmente es necesario
         if total_items <= capacidad_actual:
-            print(f"No se necesitan filas adicionales para {total_items} items")
+            logger.debug("No se necesitan filas adicionales para %s items", total_items)
             return footer_row
 
         filas_extra = total_items - capacidad_actual
-        print(f"Insertando {filas_extra} filas adicionales SOLO para items de datos")
+        logger.debug("Insertando %s filas adicionales SOLO para items de datos", filas_extra)
         
         fila_patron = footer_row - 2
         fila_separador = footer_row - 1
@@ -460,7 +502,7 @@ class ExcelCollaborativeService:
 
     def _clonar_fusiones_fila(self, worksheet, fila_origen: int, fila_destino: int) -> None:
         """FUNCIÓN DESHABILITADA - Usar _clonar_fusiones_items_sin_logo en su lugar"""
-        print(f"EVITANDO clonar fusiones en fila {fila_destino} para prevenir logos duplicados")
+        logger.debug("EVITANDO clonar fusiones en fila %s para prevenir logos duplicados", fila_destino)
         # NO hacer nada - evitar completamente la clonación de fusiones
         return
 
@@ -538,7 +580,7 @@ class ExcelCollaborativeService:
         for rango in list(worksheet.merged_cells.ranges):
             if rango.coord == coord_a_b:
                 worksheet.unmerge_cells(coord_a_b)
-                print(f"Desfusionadas celdas A{fila}:B{fila}")
+                logger.debug("Desfusionadas celdas A%s:B%s", fila, fila)
                 break
         
         # Desfusionar F:G si están fusionadas incorrectamente
@@ -546,7 +588,7 @@ class ExcelCollaborativeService:
         for rango in list(worksheet.merged_cells.ranges):
             if rango.coord == coord_f_g:
                 worksheet.unmerge_cells(coord_f_g)
-                print(f"Desfusionadas celdas F{fila}:G{fila}")
+                logger.debug("Desfusionadas celdas F%s:G%s", fila, fila)
                 break
         
         # Solo fusionar B:C, NO A:B ni F:G
@@ -616,20 +658,20 @@ class ExcelCollaborativeService:
             # Buscar por "Entregado por:" o "Recibido por:"
             if isinstance(valor_a, str) and ("Entregado por:" in valor_a or "Recibido por:" in valor_a):
                 footer_row = row
-                print(f"Encontrada fila del footer por texto en columna A: {row}")
+                logger.debug("Encontrada fila del footer por texto en columna A: %s", row)
                 break
             elif isinstance(valor_b, str) and ("Entregado por:" in valor_b or "Recibido por:" in valor_b):
                 footer_row = row
-                print(f"Encontrada fila del footer por texto en columna B: {row}")
+                logger.debug("Encontrada fila del footer por texto en columna B: %s", row)
                 break
             # Fallback: buscar por "Web:" o "geofal"
             elif isinstance(valor_a, str) and ("Web:" in valor_a or "geofal" in valor_a.lower()):
                 footer_row = row
-                print(f"Encontrada fila del footer por Web en columna A: {row}")
+                logger.debug("Encontrada fila del footer por Web en columna A: %s", row)
                 break
         
         if footer_row:
-            print(f"Encontrada fila del footer: {footer_row}")
+            logger.debug("Encontrada fila del footer: %s", footer_row)
             # Fusionar A:B y F:G en la fila del footer
             try:
                 # Verificar si ya están fusionadas
@@ -637,11 +679,11 @@ class ExcelCollaborativeService:
                 
                 if f'A{footer_row}:B{footer_row}' not in merged_ranges:
                     worksheet.merge_cells(f'A{footer_row}:B{footer_row}')
-                    print(f"Fusionada A:B en fila {footer_row}")
+                    logger.debug("Fusionada A:B en fila %s", footer_row)
                 
                 if f'F{footer_row}:G{footer_row}' not in merged_ranges:
                     worksheet.merge_cells(f'F{footer_row}:G{footer_row}')
-                    print(f"Fusionada F:G en fila {footer_row}")
+                    logger.debug("Fusionada F:G en fila %s", footer_row)
                 
                 # SIEMPRE aplicar altura y wrap_text para mantener consistencia
                 worksheet.row_dimensions[footer_row].height = 30  # Altura fija para dos líneas de texto
@@ -650,27 +692,27 @@ class ExcelCollaborativeService:
                 from openpyxl.styles import Alignment
                 worksheet.cell(row=footer_row, column=1).alignment = Alignment(horizontal='left', vertical='center', wrap_text=True)
                 worksheet.cell(row=footer_row, column=6).alignment = Alignment(horizontal='left', vertical='center', wrap_text=True)
-                print(f"Aplicando altura fija y wrap_text SIEMPRE para fila {footer_row}")
+                logger.debug("Aplicando altura fija y wrap_text SIEMPRE para fila %s", footer_row)
                     
             except Exception as e:
-                print(f"Error fusionando footer en fila {footer_row}: {e}")
+                logger.warning("Error fusionando footer en fila %s: %s", footer_row, e)
         else:
-            print("No se encontró la fila del footer")
+            logger.debug("No se encontró la fila del footer")
             # Intentar fusionar directamente en la fila 70
             try:
-                print("Intentando fusionar directamente en fila 70...")
+                logger.debug("Intentando fusionar directamente en fila 70...")
                 worksheet.merge_cells('A70:B70')
                 worksheet.merge_cells('F70:G70')
-                print("Fusionadas celdas en fila 70")
+                logger.debug("Fusionadas celdas en fila 70")
                 
                 # SIEMPRE establecer altura y wrap_text para la fila 70 directa
                 worksheet.row_dimensions[70].height = 30
                 from openpyxl.styles import Alignment
                 worksheet.cell(row=70, column=1).alignment = Alignment(horizontal='left', vertical='center', wrap_text=True)
                 worksheet.cell(row=70, column=6).alignment = Alignment(horizontal='left', vertical='center', wrap_text=True)
-                print("Aplicando altura fija SIEMPRE para fila 70")
+                logger.debug("Aplicando altura fija SIEMPRE para fila 70")
             except Exception as e:
-                print(f"Error fusionando fila 70: {e}")
+                logger.warning("Error fusionando fila 70: %s", e)
 
     def _ajustar_ancho_columna_a(self, worksheet, total_items: int) -> None:
         """Ajustar ancho de columna A de manera precisa para evitar '#' en números"""
@@ -687,7 +729,7 @@ class ExcelCollaborativeService:
         
         # Aplicar el ancho con precisión de 2-3px
         worksheet.column_dimensions['A'].width = ancho
-        print(f"Ajustado ancho de columna A a {ancho} para {total_items} items")
+        logger.debug("Ajustado ancho de columna A a %s para %s items", ancho, total_items)
 
     def _asegurar_campos_importantes(self, worksheet) -> None:
         """Asegurar que los campos importantes SIEMPRE estén presentes sin importar el número de items"""
@@ -698,7 +740,7 @@ class ExcelCollaborativeService:
             
             # Si encontramos "Entregado por:" o "Recibido por:", asegurar que estén completos
             if isinstance(valor_a, str) and ("Entregado por:" in valor_a or "Recibido por:" in valor_a):
-                print(f"Campo importante encontrado en fila {row}: {valor_a}")
+                logger.debug("Campo importante encontrado en fila %s: %s", row, valor_a)
                 # Asegurar que la celda tenga el texto completo con (Cliente)
                 if "Entregado por:" in valor_a:
                     worksheet.cell(row=row, column=1).value = "Entregado por:\n(Cliente)"
@@ -706,7 +748,7 @@ class ExcelCollaborativeService:
                     worksheet.cell(row=row, column=1).value = "Recibido por:"
                 break
             elif isinstance(valor_b, str) and ("Entregado por:" in valor_b or "Recibido por:" in valor_b):
-                print(f"Campo importante encontrado en columna B fila {row}: {valor_b}")
+                logger.debug("Campo importante encontrado en columna B fila %s: %s", row, valor_b)
                 # Asegurar que la celda tenga el texto completo con (Cliente)
                 if "Entregado por:" in valor_b:
                     worksheet.cell(row=row, column=2).value = "Entregado por:\n(Cliente)"
@@ -714,7 +756,7 @@ class ExcelCollaborativeService:
                     worksheet.cell(row=row, column=2).value = "Recibido por:"
                 break
         
-        print("Campos importantes verificados y asegurados")
+        logger.debug("Campos importantes verificados y asegurados")
 
     def _centrar_ultimo_item(self, worksheet, fila_inicio: int, total_items: int) -> None:
         """SIEMPRE centrar el último número de item sin importar la cantidad"""
@@ -728,9 +770,9 @@ class ExcelCollaborativeService:
             try:
                 celda_a = worksheet[f'A{ultima_fila}']
                 celda_a.alignment = Alignment(horizontal='center', vertical='center')
-                print(f"Centrado último item en fila {ultima_fila} (item {total_items})")
+                logger.debug("Centrado último item en fila %s (item %s)", ultima_fila, total_items)
             except Exception as e:
-                print(f"Error centrando último item: {e}")
+                logger.warning("Error centrando último item: %s", e)
     
     def _centrar_toda_fila_items(self, worksheet, fila_inicio: int, total_items: int) -> None:
         """Centrar TODA la fila de items, no solo números específicos"""
@@ -747,7 +789,7 @@ class ExcelCollaborativeService:
                 except Exception:
                     pass
         
-        print(f"Centradas todas las filas de items ({total_items} filas)")
+        logger.debug("Centradas todas las filas de items (%s filas)", total_items)
 
     def _clonar_fusiones_items_sin_logo(self, worksheet, fila_origen: int, fila_destino: int) -> None:
         """Clonar solo fusiones de items, NO del logo ni elementos del template"""
@@ -766,9 +808,9 @@ class ExcelCollaborativeService:
                     if coord not in rangos_existentes:
                         worksheet.merge_cells(coord)
                         rangos_existentes.add(coord)
-                        print(f"Clonada fusión de items: {coord}")
+                        logger.debug("Clonada fusión de items: %s", coord)
                 else:
-                    print(f"Evitando clonar fusión del template: {rango.coord}")
+                    logger.debug("Evitando clonar fusión del template: %s", rango.coord)
         
         # Asegurar bordes después de clonar fusiones
         from openpyxl.styles import Border, Side
@@ -1,10 +1,13 @@
 import io
+import logging
 from copy import copy
 from typing import List, Dict, Any, Optional
 
 import openpyxl
 from openpyxl.styles import Alignment, Border, Font
 
+logger = logging.getLogger(__name__)
+
 class ExcelCollaborativeService:
     """Servicio para modificar archivos Excel existentes con datos del formulario"""
     
@@ -165,7 +168,7 @@ class ExcelCollaborativeService:
         # Información de contacto en columna D
         self._agregar_informacion_contacto(worksheet)
         
-        print("Datos de recepción rellenados")
+        logger.debug("Datos de recepción rellenados")
     
     def _rellenar_datos_muestras(self, worksheet, muestras: List[Dict[str, Any]]):
         """Rellenar datos de las muestras manteniendo el footer en su posición."""
@@ -217,10 +220,10 @@ class ExcelCollaborativeService:
             # Para 18+ items: solo mover footer si es necesario
             from .footer_functions import mover_footer_simple, asegurar_contenido_footer
             footer_row = mover_footer_simple(worksheet, footer_row, total_items)
-            print(f"Footer ajustado para {total_items} items")
+            logger.debug("Footer ajustado para %s items", total_items)
         else:
             # Para 17 o menos items: mantener template original
-            print(f"Manteniendo template original para {total_items} items")
+            logger.debug("Manteniendo template original para %s items", total_items)
 
         for indice, muestra in enumerate(muestras):
             fila_actual = fila_inicio + indice
@@ -228,16 +231,16 @@ class ExcelCollaborativeService:
 
             # Forzar número de item correcto
             item_numero = indice + 1
-            print(f"Fila {fila_actual}: item_numero forzado={item_numero}")
+            logger.debug("Fila %s: item_numero forzado=%s", fila_actual, item_numero)
             
             # Debug específico para celda A
             try:
                 celda_a = worksheet[f'A{fila_actual}']
-                print(f"  Celda A{fila_actual} antes: {celda_a.value}")
+                logger.debug("Celda A%s antes: %s", fila_actual, celda_a.value)
                 celda_a.value = item_numero
-                print(f"  Celda A{fila_actual} después: {celda_a.value}")
+                logger.debug("Celda A%s después: %s", fila_actual, celda_a.value)
             except Exception as e:
-                print(f"  Error en celda A{fila_actual}: {e}")
+                logger.warning("Error en celda A%s: %s", fila_actual, e)
             
             safe_set_cell(f'A{fila_actual}', item_numero)
             codigo_ref = f'B{fila_actual}'
@@ -284,7 +287,7 @@ class ExcelCollaborativeService:
             
             # Verificar si la fila está dentro del rango de items
             if fila_inicio <= fila_excel < fila_inicio + total_items:
-                print(f"Centrando fila {fila_excel} (item {item_num})")
+                logger.debug("Centrando fila %s (item %s)", fila_excel, item_num)
                 
                 # Aplicar alineación centrada a todas las columnas de datos
                 for col in ['A', 'B', 'C', 'D', 'E', 'F', 'G', 'H', 'I', 'J', 'K']:
@@ -300,10 +303,10 @@ class ExcelCollaborativeService:
                         
                         # Aplicar alineación centrada
                         celda_destino.alignment = Alignment(horizontal='center', vertical='center')
-                        print(f"  Centrada celda {col}{fila_excel}")
+                        logger.debug("Centrada celda %s%s", col, fila_excel)
                         
                     except Exception as e:
-                        print(f"  Error centrando {col}{fila_excel}: {e}")
+                        logger.warning("Error centrando %s%s: %s", col, fila_excel, e)
                         pass
     
     def _ajustar_ancho_columnas(self, worksheet):
@@ -326,15 +329,15 @@ class ExcelCollaborativeService:
 
     def _asegurar_capacidad_items(self, worksheet, footer_row: int, total_items: int) -> int:
         capacidad_actual = footer_row - self.FILA_INICIO_MUESTRAS
-        print(f"Capacidad actual: {capacidad_actual}, Items necesarios: {total_items}")
+        logger.debug("Capacidad actual: %s, Items necesarios: %s", capacidad_actual, total_items)
         
         # Solo insertar filas si realmente es necesario
         if total_items <= capacidad_actual:
-            print(f"No se necesitan filas adicionales para {total_items} items")
+            logger.debug("No se necesitan filas adicionales para %s items", total_items)
             return footer_row
 
         filas_extra = total_items - capacidad_actual
-        print(f"Insertando {filas_extra} filas adicionales SOLO para items de datos")
+        logger.debug("Insertando %s filas adicionales SOLO para items de datos", filas_extra)
         
         fila_patron = footer_row - 2
         fila_separador = footer_row - 1
@@ -367,7 +370,7 @@ class ExcelCollaborativeService:
 
     def _clonar_fusiones_fila(self, worksheet, fila_origen: int, fila_destino: int) -> None:
         """FUNCIÓN DESHABILITADA - Usar _clonar_fusiones_items_sin_logo en su lugar"""
-        print(f"EVITANDO clonar fusiones en fila {fila_destino} para prevenir logos duplicados")
+        logger.debug("EVITANDO clonar fusiones en fila %s para prevenir logos duplicados", fila_destino)
         # NO hacer nada - evitar completamente la clonación de fusiones
         return
 
@@ -506,20 +509,20 @@ class ExcelCollaborativeService:
             # Buscar por "Entregado por:" o "Recibido por:"
             if isinstance(valor_a, str) and ("Entregado por:" in valor_a or "Recibido por:" in valor_a):
                 footer_row = row
-                print(f"Encontrada fila del footer por texto en columna A: {row}")
+                logger.debug("Encontrada fila del footer por texto en columna A: %s", row)
                 break
             elif isinstance(valor_b, str) and ("Entregado por:" in valor_b or "Recibido por:" in valor_b):
                 footer_row = row
-                print(f"Encontrada fila del footer por texto en columna B: {row}")
+                logger.debug("Encontrada fila del footer por texto en columna B: %s", row)
                 break
             # Fallback: buscar por "Web:" o "geofal"
             elif isinstance(valor_a, str) and ("Web:" in valor_a or "geofal" in valor_a.lower()):
                 footer_row = row
-                print(f"Encontrada fila del footer por Web en columna A: {row}")
+                logger.debug("Encontrada fila del footer por Web en columna A: %s", row)
                 break
         
         if footer_row:
-            print(f"Encontrada fila del footer: {footer_row}")
+            logger.debug("Encontrada fila del footer: %s", footer_row)
             # Fusionar A:B y F:G en la fila del footer
             try:
                 # Verificar si ya están fusionadas
@@ -527,11 +530,11 @@ class ExcelCollaborativeService:
                 
                 if f'A{footer_row}:B{footer_row}' not in merged_ranges:
                     worksheet.merge_cells(f'A{footer_row}:B{footer_row}')
-                    print(f"Fusionada A:B en fila {footer_row}")
+                    logger.debug("Fusionada A:B en fila %s", footer_row)
                 
                 if f'F{footer_row}:G{footer_row}' not in merged_ranges:
                     worksheet.merge_cells(f'F{footer_row}:G{footer_row}')
-                    print(f"Fusionada F:G en fila {footer_row}")
+                    logger.debug("Fusionada F:G en fila %s", footer_row)
                 
                 # SIEMPRE aplicar altura y wrap_text para mantener consistencia
                 worksheet.row_dimensions[footer_row].height = 30  # Altura fija para dos líneas de texto
@@ -540,27 +543,27 @@ class ExcelCollaborativeService:
                 from openpyxl.styles import Alignment
                 worksheet.cell(row=footer_row, column=1).alignment = Alignment(horizontal='left', vertical='center', wrap_text=True)
                 worksheet.cell(row=footer_row, column=6).alignment = Alignment(horizontal='left', vertical='center', wrap_text=True)
-                print(f"Aplicando altura fija y wrap_text SIEMPRE para fila {footer_row}")
+                logger.debug("Aplicando altura fija y wrap_text SIEMPRE para fila %s", footer_row)
                     
             except Exception as e:
-                print(f"Error fusionando footer en fila {footer_row}: {e}")
+                logger.warning("Error fusionando footer en fila %s: %s", footer_row, e)
         else:
-            print("No se encontró la fila del footer")
+            logger.debug("No se encontró la fila del footer")
             # Intentar fusionar directamente en la fila 70
             try:
-                print("Intentando fusionar directamente en fila 70...")
+                logger.debug("Intentando fusionar directamente en fila 70...")
                 worksheet.merge_cells('A70:B70')
                 worksheet.merge_cells('F70:G70')
-                print("Fusionadas celdas en fila 70")
+                logger.debug("Fusionadas celdas en fila 70")
                 
                 # SIEMPRE establecer altura y wrap_text para la fila 70 directa
                 worksheet.row_dimensions[70].height = 30
                 from openpyxl.styles import Alignment
                 worksheet.cell(row=70, column=1).alignment = Alignment(horizontal='left', vertical='center', wrap_text=True)
                 worksheet.cell(row=70, column=6).alignment = Alignment(horizontal='left', vertical='center', wrap_text=True)
-                print("Aplicando altura fija SIEMPRE para fila 70")
+                logger.debug("Aplicando altura fija SIEMPRE para fila 70")
             except Exception as e:
-                print(f"Error fusionando fila 70: {e}")
+                logger.warning("Error fusionando fila 70: %s", e)
 
     def _ajustar_ancho_columna_a(self, worksheet, total_items: int) -> None:
         """Ajustar ancho de columna A de manera precisa para evitar '#' en números"""
@@ -577,7 +580,7 @@ class ExcelCollaborativeService:
         
         # Aplicar el ancho con precisión de 2-3px
         worksheet.column_dimensions['A'].width = ancho
-        print(f"Ajustado ancho de columna A a {ancho} para {total_items} items")
+        logger.debug("Ajustado ancho de columna A a %s para %s items", ancho, total_items)
 
     def _asegurar_campos_importantes(self, worksheet) -> None:
         """Asegurar que los campos importantes SIEMPRE estén presentes sin importar el número de items"""
@@ -588,7 +591,7 @@ class ExcelCollaborativeService:
             
             # Si encontramos "Entregado por:" o "Recibido por:", asegurar que estén completos
             if isinstance(valor_a, str) and ("Entregado por:" in valor_a or "Recibido por:" in valor_a):
-                print(f"Campo importante encontrado en fila {row}: {valor_a}")
+                logger.debug("Campo importante encontrado en fila %s: %s", row, valor_a)
                 # Asegurar que la celda tenga el texto completo con (Cliente)
                 if "Entregado por:" in valor_a:
                     worksheet.cell(row=row, column=1).value = "Entregado por:\n(Cliente)"
@@ -596,7 +599,7 @@ class ExcelCollaborativeService:
                     worksheet.cell(row=row, column=1).value = "Recibido por:"
                 break
             elif isinstance(valor_b, str) and ("Entregado por:" in valor_b or "Recibido por:" in valor_b):
-                print(f"Campo importante encontrado en columna B fila {row}: {valor_b}")
+                logger.debug("Campo importante encontrado en columna B fila %s: %s", row, valor_b)
                 # Asegurar que la celda tenga el texto completo con (Cliente)
                 if "Entregado por:" in valor_b:
                     worksheet.cell(row=row, column=2).value = "Entregado por:\n(Cliente)"
@@ -604,7 +607,7 @@ class ExcelCollaborativeService:
                     worksheet.cell(row=row, column=2).value = "Recibido por:"
                 break
         
-        print("Campos importantes verificados y asegurados")
+        logger.debug("Campos importantes verificados y asegurados")
 
     def _centrar_ultimo_item(self, worksheet, fila_inicio: int, total_items: int) -> None:
         """SIEMPRE centrar el último número de item sin importar la cantidad"""
@@ -618,9 +621,9 @@ class ExcelCollaborativeService:
             try:
                 celda_a = worksheet[f'A{ultima_fila}']
                 celda_a.alignment = Alignment(horizontal='center', vertical='center')
-                print(f"Centrado último item en fila {ultima_fila} (item {total_items})")
+                logger.debug("Centrado último item en fila %s (item %s)", ultima_fila, total_items)
             except Exception as e:
-                print(f"Error centrando último item: {e}")
+                logger.warning("Error centrando último item: %s", e)
     
     def _centrar_toda_fila_items(self, worksheet, fila_inicio: int, total_items: int) -> None:
         """Centrar TODA la fila de items, no solo números específicos"""
@@ -637,7 +640,7 @@ class ExcelCollaborativeService:
                 except Exception:
                     pass
         
-        print(f"Centradas todas las filas de items ({total_items} filas)")
+        logger.debug("Centradas todas las filas de items (%s filas)", total_items)
 
     def _clonar_fusiones_items_sin_logo(self, worksheet, fila_origen: int, fila_destino: int) -> None:
         """Clonar solo fusiones de items, NO del logo ni elementos del template"""
@@ -656,9 +659,9 @@ class ExcelCollaborativeService:
                     if coord not in rangos_existentes:
                         worksheet.merge_cells(coord)
                         rangos_existentes.add(coord)
-                        print(f"Clonada fusión de items: {coord}")
+                        logger.debug("Clonada fusión de items: %s", coord)
                 else:
-                    print(f"Evitando clonar fusión del template: {rango.coord}")
+                    logger.debug("Evitando clonar fusión del template: %s", rango.coord)
         
         # Asegurar bordes después de clonar fusiones
         from openpyxl.styles import Border, Side
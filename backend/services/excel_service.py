@@ -10,14 +10,46 @@ from openpyxl.utils.dataframe import dataframe_to_rows
 from io import BytesIO
 import tempfile
 import os
+import re
 from datetime import datetime
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple
 from sqlalchemy.orm import Session
 
 from models import RecepcionMuestra, MuestraConcreto
 from schemas import RecepcionMuestraCreate, MuestraConcretoCreate
+from utils.excel_reader import leer_primera_hoja
+from utils.timing import etapa
+
+SIN_ESPECIFICAR = "Sin especificar"
+
+
+def extraer_datos_archivo(ruta: str) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+    """Extraer cabecera e items de un archivo (punto de entrada para el pool de procesos)"""
+    return ExcelService().extraer_datos_ruta(ruta)
 
 class ExcelService:
+    # Etiqueta en columna A -> (campo, columna donde está el valor)
+    ETIQUETAS_ORDEN = {
+        'FECHA DE RECEPCIÓN': ('fecha_recepcion', 2),
+        'PLAZO DE ENTREGA': ('plazo_entrega_dias', 2),
+        'OBSERVACIONES': ('observaciones', 1),
+        'O/T APERTURADA POR': ('aperturada_por', 2),
+        'OT DESIGADA A': ('designada_a', 2),
+    }
+    _PATRON_ETIQUETAS = '(' + '|'.join(re.escape(etiqueta) for etiqueta in ETIQUETAS_ORDEN) + ')'
+    FILA_INICIO_ITEMS = 8
+    COLUMNAS_LECTURA = 10  # A..J, los items usan hasta la columna I
+    
+    # Campos de la cabecera que existen en RecepcionMuestra
+    CAMPOS_RECEPCION_EXCEL = (
+        'numero_ot', 'numero_recepcion', 'fecha_recepcion', 'plazo_entrega_dias',
+        'observaciones', 'aperturada_por', 'designada_a'
+    )
+    CAMPOS_RECEPCION_OBLIGATORIOS = (
+        'numero_recepcion', 'cliente', 'domicilio_legal', 'ruc', 'persona_contacto', 'email',
+        'telefono', 'solicitante', 'domicilio_solicitante', 'proyecto', 'ubicacion'
+    )
+    
     def __init__(self):
         self.template_path = "templates/orden_trabajo_template.xlsx"
     
@@ -26,25 +58,48 @@ class ExcelService:
         try:
             # Leer archivo Excel
             df = pd.read_excel(BytesIO(contenido), sheet_name=0, header=None)
+        except Exception as e:
+            raise Exception(f"Error procesando archivo Excel: {str(e)}")
+        
+        return self._crear_desde_dataframe(df, db)
+    
+    def procesar_archivo_excel_ruta(self, ruta: str, db: Session) -> RecepcionMuestra:
+        """Procesar un archivo Excel en disco leyendo solo la primera hoja y la ventana necesaria"""
+        try:
+            df = self._leer_hoja_ruta(ruta)
+        except Exception as e:
+            raise Exception(f"Error procesando archivo Excel: {str(e)}")
+        
+        return self._crear_desde_dataframe(df, db)
+    
+    def extraer_datos_ruta(self, ruta: str) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+        """Extraer cabecera e items de un archivo sin tocar la base de datos"""
+        df = self._leer_hoja_ruta(ruta)
+        indice = self._indice_etiquetas(df)
+        return self._extraer_datos_orden(df, indice), self._extraer_items(df, indice)
+    
+    def _leer_hoja_ruta(self, ruta: str) -> pd.DataFrame:
+        """Leer la ventana de la primera hoja que usa la extracción"""
+        with etapa("leer_excel"):
+            return leer_primera_hoja(
+                ruta,
+                max_columnas=self.COLUMNAS_LECTURA,
+                etiquetas_fin=self.ETIQUETAS_ORDEN.keys()
+            )
+    
+    def _crear_desde_dataframe(self, df: pd.DataFrame, db: Session) -> RecepcionMuestra:
+        """Crear la recepción y sus muestras a partir de la hoja leída"""
+        try:
+            # Indexar etiquetas una sola vez y extraer cabecera e items
+            with etapa("extraer"):
+                indice = self._indice_etiquetas(df)
+                orden_data = self._extraer_datos_orden(df, indice)
+                items_data = self._extraer_items(df, indice)
             
-            # Extraer datos de la orden
-            orden_data = self._extraer_datos_orden(df)
-            
-            # Extraer items
-            items_data = self._extraer_items(df)
-            
-            # Crear orden en base de datos
-            recepcion = RecepcionMuestra(**orden_data)
-            db.add(recepcion)
-            db.flush()  # Para obtener el ID
-            
-            # Crear items
-            for item_data in items_data:
-                item = MuestraConcreto(recepcion_id=recepcion.id, **item_data)
-                db.add(item)
-            
-            db.commit()
-            db.refresh(recepcion)
+            with etapa("db"):
+                recepcion = self.guardar_recepcion(db, orden_data, items_data)
+                db.commit()
+                db.refresh(recepcion)
             
             return recepcion
             
@@ -52,98 +107,151 @@ class ExcelService:
             db.rollback()
             raise Exception(f"Error procesando archivo Excel: {str(e)}")
     
-    def _extraer_datos_orden(self, df: pd.DataFrame) -> Dict[str, Any]:
-        """Extraer datos de la orden desde el DataFrame"""
-        datos = {}
+    def guardar_recepcion(self, db: Session, orden_data: Dict[str, Any],
+                          items_data: List[Dict[str, Any]]) -> RecepcionMuestra:
+        """Agregar a la sesión la recepción y sus muestras extraídas (sin commit)"""
+        recepcion_dict, muestras = self.mapear_a_modelos(orden_data, items_data)
         
-        # Buscar número OT (fila 5, columna 0)
-        if len(df) > 5 and pd.notna(df.iloc[5, 0]):
-            datos['numero_ot'] = str(df.iloc[5, 0]).strip()
+        recepcion = RecepcionMuestra(**recepcion_dict)
+        db.add(recepcion)
+        db.flush()  # Para obtener el ID
         
-        # Buscar número recepción (fila 5, columna 5)
-        if len(df) > 5 and pd.notna(df.iloc[5, 5]):
-            datos['numero_recepcion'] = str(df.iloc[5, 5]).strip()
+        for muestra_dict in muestras:
+            db.add(MuestraConcreto(recepcion_id=recepcion.id, **muestra_dict))
+        db.flush()
         
-        # Buscar referencia (fila 5, columna 7)
-        if len(df) > 5 and pd.notna(df.iloc[5, 7]):
-            datos['referencia'] = str(df.iloc[5, 7]).strip()
+        return recepcion
+    
+    def mapear_a_modelos(self, orden_data: Dict[str, Any],
+                         items_data: List[Dict[str, Any]]) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+        """
+        Adaptar los datos extraídos a las columnas de RecepcionMuestra y MuestraConcreto.
+        Los campos obligatorios que el formato no trae quedan como "Sin especificar".
+        """
+        if not orden_data.get('numero_ot'):
+            raise ValueError("El archivo no tiene número de OT")
         
-        # Buscar fechas
-        for i in range(len(df)):
-            if pd.notna(df.iloc[i, 0]) and "FECHA DE RECEPCIÓN" in str(df.iloc[i, 0]):
-                if pd.notna(df.iloc[i, 2]):
-                    try:
-                        datos['fecha_recepcion'] = pd.to_datetime(df.iloc[i, 2])
-                    except:
-                        pass
-                break
+        recepcion_dict = {
+            campo: valor for campo, valor in orden_data.items()
+            if campo in self.CAMPOS_RECEPCION_EXCEL
+        }
+        # La referencia del formato corresponde al proyecto
+        recepcion_dict['proyecto'] = orden_data.get('referencia') or SIN_ESPECIFICAR
+        for campo in self.CAMPOS_RECEPCION_OBLIGATORIOS:
+            if not recepcion_dict.get(campo):
+                recepcion_dict[campo] = SIN_ESPECIFICAR
+        if isinstance(recepcion_dict.get('fecha_recepcion'), pd.Timestamp):
+            recepcion_dict['fecha_recepcion'] = recepcion_dict['fecha_recepcion'].to_pydatetime()
         
-        # Buscar plazo de entrega
-        for i in range(len(df)):
-            if pd.notna(df.iloc[i, 0]) and "PLAZO DE ENTREGA" in str(df.iloc[i, 0]):
-                if pd.notna(df.iloc[i, 2]):
-                    try:
-                        datos['plazo_entrega_dias'] = int(df.iloc[i, 2])
-                    except:
-                        pass
-                break
-        
-        # Buscar observaciones
-        for i in range(len(df)):
-            if pd.notna(df.iloc[i, 0]) and "OBSERVACIONES" in str(df.iloc[i, 0]):
-                if pd.notna(df.iloc[i, 1]):
-                    datos['observaciones'] = str(df.iloc[i, 1]).strip()
-                break
-        
-        # Buscar aperturada por
-        for i in range(len(df)):
-            if pd.notna(df.iloc[i, 0]) and "O/T APERTURADA POR" in str(df.iloc[i, 0]):
-                if pd.notna(df.iloc[i, 2]):
-                    datos['aperturada_por'] = str(df.iloc[i, 2]).strip()
-                break
-        
-        # Buscar designada a
-        for i in range(len(df)):
-            if pd.notna(df.iloc[i, 0]) and "OT DESIGADA A" in str(df.iloc[i, 0]):
-                if pd.notna(df.iloc[i, 2]):
-                    datos['designada_a'] = str(df.iloc[i, 2]).strip()
-                break
+        muestras = []
+        for item in items_data:
+            codigo = item.get('codigo_muestra') or None
+            codigo_lem = item.get('codigo_muestra_lem') or None
+            muestras.append({
+                'item_numero': item['item_numero'],
+                'codigo_muestra': codigo,
+                'codigo_muestra_lem': codigo_lem,
+                'identificacion_muestra': codigo or codigo_lem or SIN_ESPECIFICAR,
+                'estructura': item.get('estructura') or SIN_ESPECIFICAR,
+                'fc_kg_cm2': 0.0,
+                'fecha_moldeo': SIN_ESPECIFICAR,
+                'edad': 0,
+                'fecha_rotura': SIN_ESPECIFICAR,
+            })
+        
+        return recepcion_dict, muestras
+    
+    def _indice_etiquetas(self, df: pd.DataFrame) -> pd.Series:
+        """Indexar en una sola pasada las filas cuya columna A contiene una etiqueta conocida"""
+        if df.empty:
+            return pd.Series(dtype=object)
+        
+        columna_a = df.iloc[:, 0].dropna().astype(str)
+        coincidencias = columna_a.str.extract(self._PATRON_ETIQUETAS, expand=False)
+        return coincidencias.dropna()
+    
+    @staticmethod
+    def _valor_celda(df: pd.DataFrame, fila: int, columna: int):
+        """Valor de una celda o None si está vacía o fuera de rango"""
+        if fila >= len(df) or columna >= df.shape[1]:
+            return None
+        valor = df.iat[fila, columna]
+        return valor if pd.notna(valor) else None
+    
+    def _extraer_datos_orden(self, df: pd.DataFrame, indice: pd.Series = None) -> Dict[str, Any]:
+        """Extraer datos de la orden desde el DataFrame"""
+        datos = {}
+        if indice is None:
+            indice = self._indice_etiquetas(df)
+        
+        # Número OT, número recepción y referencia (fila 5, columnas 0, 5 y 7)
+        for campo, columna in (('numero_ot', 0), ('numero_recepcion', 5), ('referencia', 7)):
+            valor = self._valor_celda(df, 5, columna)
+            if valor is not None:
+                datos[campo] = str(valor).strip()
+        
+        # Primera aparición de cada etiqueta
+        posiciones = indice[~indice.duplicated()]
+        for fila, etiqueta in posiciones.items():
+            campo, columna = self.ETIQUETAS_ORDEN[etiqueta]
+            valor = self._valor_celda(df, fila, columna)
+            if valor is None:
+                continue
+            
+            if campo == 'fecha_recepcion':
+                try:
+                    datos[campo] = pd.to_datetime(valor)
+                except (ValueError, TypeError):
+                    pass
+            elif campo == 'plazo_entrega_dias':
+                try:
+                    datos[campo] = int(valor)
+                except (ValueError, TypeError):
+                    pass
+            else:
+                datos[campo] = str(valor).strip()
         
         return datos
     
-    def _extraer_items(self, df: pd.DataFrame) -> List[Dict[str, Any]]:
+    def _extraer_items(self, df: pd.DataFrame, indice: pd.Series = None) -> List[Dict[str, Any]]:
         """Extraer items de la orden desde el DataFrame"""
-        items = []
+        if indice is None:
+            indice = self._indice_etiquetas(df)
         
-        # Buscar la sección de items (desde fila 8 hasta encontrar fechas)
-        # Ajustar el rango para encontrar datos más abajo en el Excel
-        for i in range(8, len(df)):
-            if pd.notna(df.iloc[i, 0]) and "FECHA DE RECEPCIÓN" in str(df.iloc[i, 0]):
-                break
-            
-            # Verificar si hay datos en las columnas de item
-            # Solo requerimos que la columna A (N°) tenga un número válido
-            if (pd.notna(df.iloc[i, 0]) and str(df.iloc[i, 0]).strip().isdigit()):
-                
-                # Manejar tipos de datos correctamente
-                cantidad = 1
-                if pd.notna(df.iloc[i, 7]):
-                    try:
-                        cantidad = int(df.iloc[i, 7])
-                    except (ValueError, TypeError):
-                        cantidad = 1
-                
-                item_data = {
-                    'item_numero': int(df.iloc[i, 0]),
-                    'codigo_muestra_lem': str(df.iloc[i, 1]).strip() if pd.notna(df.iloc[i, 1]) else "",  # Columna B: Código muestra LEM
-                    'codigo_muestra': str(df.iloc[i, 2]).strip() if pd.notna(df.iloc[i, 2]) else "",  # Columna C: Codigo
-                    'estructura': str(df.iloc[i, 3]).strip() if pd.notna(df.iloc[i, 3]) else "",       # Columna D: Estructura
-                    'cantidad': cantidad,
-                    'especificacion': str(df.iloc[i, 8]).strip() if pd.notna(df.iloc[i, 8]) else ""
-                }
-                items.append(item_data)
-        
-        return items
+        # La sección de items va desde la fila 8 hasta la etiqueta de fecha de recepción
+        inicio = self.FILA_INICIO_ITEMS
+        filas_fecha = indice.index[(indice == 'FECHA DE RECEPCIÓN') & (indice.index >= inicio)]
+        fin = int(filas_fecha[0]) if len(filas_fecha) else len(df)
+        if fin <= inicio:
+            return []
+        
+        bloque = df.iloc[inicio:fin].reindex(columns=range(9))
+        
+        # Solo requerimos que la columna A (N°) tenga un número válido
+        numeros = bloque[0].astype(str).str.strip()
+        bloque = bloque[bloque[0].notna() & numeros.str.fullmatch(r"\d+")]
+        if bloque.empty:
+            return []
+        
+        def texto(columna: int) -> List[str]:
+            serie = bloque[columna]
+            return serie.where(serie.notna(), "").astype(str).str.strip().tolist()
+        
+        cantidades = pd.to_numeric(bloque[7], errors='coerce').fillna(1).astype(int).tolist()
+        
+        return [
+            {
+                'item_numero': item_numero,
+                'codigo_muestra_lem': codigo_lem,  # Columna B: Código muestra LEM
+                'codigo_muestra': codigo,          # Columna C: Codigo
+                'estructura': estructura,          # Columna D: Estructura
+                'cantidad': cantidad,
+                'especificacion': especificacion
+            }
+            for item_numero, codigo_lem, codigo, estructura, cantidad, especificacion in zip(
+                numeros[bloque.index].astype(int).tolist(), texto(1), texto(2), texto(3), cantidades, texto(8)
+            )
+        ]
     
     def generar_plantilla_excel(self, recepcion: RecepcionMuestra = None) -> str:
         """Generar plantilla Excel basada en el diseño del PDF"""
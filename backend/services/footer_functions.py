@@ -1,37 +1,43 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+
 def mover_footer_simple(worksheet, footer_row: int, total_items: int) -> int:
     """Mover footer de forma simple sin depender de fusiones - BUENAS PRÁCTICAS"""
     try:
-        print(f"Moviendo footer para {total_items} items")
+        logger.debug("Moviendo footer para %s items", total_items)
         
         # Calcular cuántas filas adicionales necesitamos
         filas_necesarias = total_items - 17  # 17 es la capacidad del template original
         
         if filas_necesarias <= 0:
-            print("No se necesita mover el footer")
+            logger.debug("No se necesita mover el footer")
             return footer_row
         
-        print(f"Insertando {filas_necesarias} filas para acomodar {total_items} items")
+        logger.debug("Insertando %s filas para acomodar %s items", filas_necesarias, total_items)
         
-        # Insertar filas ANTES del footer para empujarlo hacia abajo
-        for i in range(filas_necesarias):
-            worksheet.insert_rows(footer_row - 1, amount=1)
-            footer_row += 1
-            print(f"Fila insertada, footer ahora en {footer_row}")
+        # Insertar filas ANTES del footer para empujarlo hacia abajo, en una sola
+        # llamada: cada insert_rows desplaza todas las celdas de la plantilla
+        # (65k filas) que quedan debajo
+        worksheet.insert_rows(footer_row - 1, amount=filas_necesarias)
+        footer_row += filas_necesarias
+        logger.debug("Filas insertadas, footer ahora en %s", footer_row)
         
         # Asegurar que el footer tenga el contenido correcto
         asegurar_contenido_footer(worksheet, footer_row)
         
-        print(f"Footer movido exitosamente a fila {footer_row}")
+        logger.debug("Footer movido exitosamente a fila %s", footer_row)
         return footer_row
         
     except Exception as e:
-        print(f"Error moviendo footer: {e}")
+        logger.warning("Error moviendo footer: %s", e)
         return footer_row
 
 def asegurar_contenido_footer(worksheet, footer_row: int):
     """Asegurar que el footer tenga el contenido correcto - BUENAS PRÁCTICAS"""
     try:
-        print(f"Asegurando contenido del footer en fila {footer_row}")
+        logger.debug("Asegurando contenido del footer en fila %s", footer_row)
         
         # Buscar y asegurar "Entregado por:"
         for col in range(1, 12):
@@ -40,7 +46,7 @@ def asegurar_contenido_footer(worksheet, footer_row: int):
                 if isinstance(cell.value, str) and "Entregado por:" in cell.value:
                     if "(Cliente)" not in cell.value:
                         cell.value = "Entregado por:\n(Cliente)"
-                    print("'Entregado por:' corregido")
+                    logger.debug("'Entregado por:' corregido")
                     break
             except:
                 continue
@@ -52,7 +58,7 @@ def asegurar_contenido_footer(worksheet, footer_row: int):
                 if isinstance(cell.value, str) and "Recibido por:" in cell.value:
                     if "(Laboratorio GEOFAL)" not in cell.value:
                         cell.value = "Recibido por:\n(Laboratorio GEOFAL)"
-                    print("'Recibido por:' corregido")
+                    logger.debug("'Recibido por:' corregido")
                     break
             except:
                 continue
@@ -60,7 +66,7 @@ def asegurar_contenido_footer(worksheet, footer_row: int):
         # Ajustar altura del footer
         worksheet.row_dimensions[footer_row].height = 35.0
         
-        print("Contenido del footer asegurado")
+        logger.debug("Contenido del footer asegurado")
         
     except Exception as e:
-        print(f"Error asegurando contenido del footer: {e}")
+        logger.warning("Error asegurando contenido del footer: %s", e)
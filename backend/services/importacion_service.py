@@ -0,0 +1,159 @@
+"""
+Servicio de importación masiva de recepciones desde archivos Excel
+Lee los archivos en paralelo, elimina duplicados por contenido y
+guarda las recepciones en transacciones por lotes
+"""
+
+import hashlib
+import logging
+from concurrent.futures import as_completed
+from typing import Any, Dict, List
+
+from sqlalchemy.orm import Session
+
+from config import settings
+from models import RecepcionMuestra
+from services.excel_service import ExcelService, extraer_datos_archivo
+from utils.timing import etapa
+from utils.workers import obtener_pool_procesos
+
+logger = logging.getLogger(__name__)
+
+
+def calcular_sha256(ruta: str, chunk_size: int = 1024 * 1024) -> str:
+    """Hash del contenido de un archivo leído por bloques"""
+    sha = hashlib.sha256()
+    with open(ruta, 'rb') as f:
+        for bloque in iter(lambda: f.read(chunk_size), b''):
+            sha.update(bloque)
+    return sha.hexdigest()
+
+
+class ImportacionMasivaService:
+    """Importación de muchos archivos de recepción en una sola operación"""
+    
+    def __init__(self, db: Session):
+        self.db = db
+        self.excel_service = ExcelService()
+    
+    def importar(self, entradas: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Importar las entradas recibidas ({'archivo', 'ruta'} o {'archivo', 'error'}).
+        Un archivo con error no detiene al resto; cada uno recibe su estado en el reporte.
+        """
+        reporte = [{'archivo': entrada['archivo'], 'estado': 'pendiente'} for entrada in entradas]
+        
+        # 1. Deduplicar por contenido
+        por_hash: Dict[str, int] = {}
+        por_leer: Dict[int, str] = {}
+        for i, entrada in enumerate(entradas):
+            if entrada.get('error'):
+                reporte[i].update(estado='error', mensaje=entrada['error'])
+                continue
+            
+            with etapa("hash"):
+                sha = calcular_sha256(entrada['ruta'])
+            reporte[i]['sha256'] = sha
+            if sha in por_hash:
+                reporte[i].update(
+                    estado='duplicado',
+                    mensaje=f"Mismo contenido que {entradas[por_hash[sha]]['archivo']}"
+                )
+                continue
+            por_hash[sha] = i
+            por_leer[i] = entrada['ruta']
+        
+        # 2. Leer en paralelo
+        with etapa("leer_excel"):
+            extraidos = self._extraer_en_paralelo(por_leer, reporte)
+        
+        with etapa("db"):
+            # 3. Descartar OT ya existentes o repetidas dentro del lote
+            self._marcar_ot_existentes(extraidos, reporte)
+            
+            # 4. Guardar por lotes
+            self._guardar_por_lotes(extraidos, reporte)
+        
+        resumen = {'total': len(reporte)}
+        for fila in reporte:
+            resumen[fila['estado']] = resumen.get(fila['estado'], 0) + 1
+        
+        logger.info(f"Importación masiva: {resumen}")
+        return {'resumen': resumen, 'archivos': reporte}
+    
+    def _extraer_en_paralelo(self, por_leer: Dict[int, str], reporte: List[Dict[str, Any]]) -> Dict[int, tuple]:
+        """Extraer cabecera e items de cada archivo en el pool de procesos"""
+        extraidos = {}
+        if not por_leer:
+            return extraidos
+        
+        pool = obtener_pool_procesos()
+        futuros = {pool.submit(extraer_datos_archivo, ruta): i for i, ruta in por_leer.items()}
+        for futuro in as_completed(futuros):
+            i = futuros[futuro]
+            try:
+                orden_data, items_data = futuro.result()
+            except Exception as e:
+                reporte[i].update(estado='error', mensaje=f"Error leyendo archivo: {str(e)}")
+                continue
+            
+            if not orden_data.get('numero_ot'):
+                reporte[i].update(estado='error', mensaje="El archivo no tiene número de OT")
+                continue
+            
+            reporte[i]['numero_ot'] = orden_data['numero_ot']
+            extraidos[i] = (orden_data, items_data)
+        
+        return extraidos
+    
+    def _marcar_ot_existentes(self, extraidos: Dict[int, tuple], reporte: List[Dict[str, Any]]) -> None:
+        """Quitar de extraidos los archivos cuya OT ya existe o se repite en el lote"""
+        numeros = {orden_data['numero_ot'] for orden_data, _ in extraidos.values()}
+        existentes = set()
+        numeros_lista = list(numeros)
+        for inicio in range(0, len(numeros_lista), 500):
+            existentes.update(
+                numero for (numero,) in self.db.query(RecepcionMuestra.numero_ot)
+                .filter(RecepcionMuestra.numero_ot.in_(numeros_lista[inicio:inicio + 500]))
+            )
+        
+        vistos = {}
+        for i in sorted(extraidos):
+            numero_ot = extraidos[i][0]['numero_ot']
+            if numero_ot in existentes:
+                reporte[i].update(estado='existente', mensaje=f"Ya existe una recepción con el número OT: {numero_ot}")
+                del extraidos[i]
+            elif numero_ot in vistos:
+                reporte[i].update(estado='duplicado', mensaje=f"Número OT repetido en {reporte[vistos[numero_ot]]['archivo']}")
+                del extraidos[i]
+            else:
+                vistos[numero_ot] = i
+    
+    def _guardar_por_lotes(self, extraidos: Dict[int, tuple], reporte: List[Dict[str, Any]]) -> None:
+        """Insertar en transacciones de import_batch_size archivos, con un savepoint por archivo"""
+        indices = sorted(extraidos)
+        tamano_lote = max(1, settings.import_batch_size)
+        
+        for inicio in range(0, len(indices), tamano_lote):
+            lote = indices[inicio:inicio + tamano_lote]
+            guardados = []
+            try:
+                for i in lote:
+                    orden_data, items_data = extraidos[i]
+                    try:
+                        with self.db.begin_nested():
+                            recepcion = self.excel_service.guardar_recepcion(self.db, orden_data, items_data)
+                        guardados.append((i, recepcion.id, len(items_data)))
+                    except Exception as e:
+                        reporte[i].update(estado='error', mensaje=f"Error guardando: {str(e)}")
+                
+                self.db.commit()
+            except Exception as e:
+                self.db.rollback()
+                logger.error(f"Error guardando lote de importación: {str(e)}")
+                for i, _, _ in guardados:
+                    reporte[i].update(estado='error', mensaje=f"Error guardando lote: {str(e)}")
+                continue
+            
+            for i, recepcion_id, total_muestras in guardados:
+                reporte[i].update(estado='importado', recepcion_id=recepcion_id, muestras=total_muestras)
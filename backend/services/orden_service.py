@@ -7,6 +7,7 @@ from sqlalchemy import desc
 from typing import List, Optional
 from models import RecepcionMuestra, MuestraConcreto
 from schemas import RecepcionMuestraCreate, RecepcionMuestraResponse
+from services.precarga_service import precarga_service
 
 class RecepcionService:
     def crear_recepcion(self, db: Session, recepcion_data: RecepcionMuestraCreate) -> RecepcionMuestra:
@@ -53,6 +54,7 @@ class RecepcionService:
             
             db.commit()
             db.refresh(recepcion)
+            precarga_service.programar('recepcion', recepcion.id)
             
             return recepcion
             
@@ -82,6 +84,7 @@ class RecepcionService:
         
         db.commit()
         db.refresh(recepcion)
+        precarga_service.programar('recepcion', recepcion.id)
         
         return recepcion
     
@@ -1,10 +1,15 @@
 import io
+import logging
 from copy import copy
 from typing import List, Dict, Any, Optional
 
 import openpyxl
 from openpyxl.styles import Alignment, Border, Font
 
+from utils.timing import etapa
+
+logger = logging.getLogger(__name__)
+
 class OTExcelCollaborativeService:
     """Servicio para generar archivos Excel de Órdenes de Trabajo"""
     
@@ -18,27 +23,37 @@ class OTExcelCollaborativeService:
     def modificar_excel_con_datos(self, ot_data: Dict[str, Any], items: List[Dict[str, Any]], 
                                  template_path: Optional[str] = None) -> bytes:
         """Modificar archivo Excel existente con datos del formulario"""
+        workbook = self.construir_workbook(ot_data, items, template_path)
+        
+        # Guardar en memoria
+        excel_buffer = io.BytesIO()
+        with etapa("guardar"):
+            workbook.save(excel_buffer)
+        excel_buffer.seek(0)
+        
+        return excel_buffer.getvalue()
+    
+    def construir_workbook(self, ot_data: Dict[str, Any], items: List[Dict[str, Any]], 
+                           template_path: Optional[str] = None):
+        """Cargar el template y rellenarlo con los datos de la OT, sin serializarlo"""
         
         # Ruta del template
         template_file = template_path or self.template_path
         
         # Cargar template directamente
-        workbook = openpyxl.load_workbook(template_file)
+        with etapa("plantilla"):
+            workbook = openpyxl.load_workbook(template_file)
         worksheet = workbook.active
         
         # Rellenar datos
-        self._rellenar_datos_ot(worksheet, ot_data)
-        self._rellenar_datos_items(worksheet, items)
-        
-        # Ajustar ancho de columna C para mejor visualización
-        self._ajustar_ancho_columnas(worksheet)
-        
-        # Guardar en memoria
-        excel_buffer = io.BytesIO()
-        workbook.save(excel_buffer)
-        excel_buffer.seek(0)
+        with etapa("rellenar"):
+            self._rellenar_datos_ot(worksheet, ot_data)
+            self._rellenar_datos_items(worksheet, items)
+            
+            # Ajustar ancho de columna C para mejor visualización
+            self._ajustar_ancho_columnas(worksheet)
         
-        return excel_buffer.getvalue()
+        return workbook
     
     def _rellenar_datos_ot(self, worksheet, ot_data: Dict[str, Any]):
         """Rellenar datos de la orden de trabajo en el Excel"""
@@ -58,7 +73,7 @@ class OTExcelCollaborativeService:
                     worksheet[cell_ref].alignment = Alignment(horizontal='center', vertical='center')
                 
             except Exception as e:
-                print(f"Error escribiendo en {cell_ref}: {e}")
+                logger.warning("Error escribiendo en %s: %s", cell_ref, e)
                 pass
         
         def safe_merge_and_set_cell(start_cell, end_cell, value):
@@ -99,12 +114,12 @@ class OTExcelCollaborativeService:
                 # Solo modificar altura si es necesario
                 if altura_final is not None:
                     worksheet.row_dimensions[fila_numero].height = altura_final
-                    print(f"Fusionado {start_cell}:{end_cell} con valor: '{value}' (altura: {altura_final})")
+                    logger.debug("Fusionado %s:%s con valor: '%s' (altura: %s)", start_cell, end_cell, value, altura_final)
                 else:
-                    print(f"Fusionado {start_cell}:{end_cell} con valor: '{value}' (altura: template original)")
+                    logger.debug("Fusionado %s:%s con valor: '%s' (altura: template original)", start_cell, end_cell, value)
                 
             except Exception as e:
-                print(f"Error fusionando celdas {start_cell}:{end_cell}: {e}")
+                logger.warning("Error fusionando celdas %s:%s: %s", start_cell, end_cell, e)
                 pass
         
         def safe_merge_observaciones(start_cell, end_cell, value):
@@ -125,10 +140,10 @@ class OTExcelCollaborativeService:
                 worksheet[start_cell].alignment = Alignment(horizontal='left', vertical='top', wrap_text=True)
                 
                 # NO modificar altura - usar la altura original del template
-                print(f"Fusionado {start_cell}:{end_cell} con valor: '{value}' (altura: template original)")
+                logger.debug("Fusionado %s:%s con valor: '%s' (altura: template original)", start_cell, end_cell, value)
                 
             except Exception as e:
-                print(f"Error fusionando observaciones {start_cell}:{end_cell}: {e}")
+                logger.warning("Error fusionando observaciones %s:%s: %s", start_cell, end_cell, e)
                 pass
         
         # Datos principales - CENTRADOS
@@ -178,7 +193,7 @@ class OTExcelCollaborativeService:
                     worksheet[cell_ref].alignment = Alignment(horizontal='center', vertical='center')
                 
             except Exception as e:
-                print(f"Error escribiendo item en {cell_ref}: {e}")
+                logger.warning("Error escribiendo item en %s: %s", cell_ref, e)
                 pass
         
         def safe_merge_and_set_cell(start_cell, end_cell, value):
@@ -219,12 +234,12 @@ class OTExcelCollaborativeService:
                 # Solo modificar altura si es necesario
                 if altura_final is not None:
                     worksheet.row_dimensions[fila_numero].height = altura_final
-                    print(f"Fusionado {start_cell}:{end_cell} con valor: '{value}' (altura: {altura_final})")
+                    logger.debug("Fusionado %s:%s con valor: '%s' (altura: %s)", start_cell, end_cell, value, altura_final)
                 else:
-                    print(f"Fusionado {start_cell}:{end_cell} con valor: '{value}' (altura: template original)")
+                    logger.debug("Fusionado %s:%s con valor: '%s' (altura: template original)", start_cell, end_cell, value)
                 
             except Exception as e:
-                print(f"Error fusionando celdas {start_cell}:{end_cell}: {e}")
+                logger.warning("Error fusionando celdas %s:%s: %s", start_cell, end_cell, e)
                 pass
         
         # Columnas: A=ÍTEM, B=CÓDIGO, D-H=DESCRIPCIÓN (fusionada), I=CANTIDAD
@@ -249,7 +264,7 @@ class OTExcelCollaborativeService:
         try:
             # Hacer la columna C más ancha para que los datos no se vean "juntos"
             worksheet.column_dimensions['C'].width = 25  # Ancho más largo para mejor visualización
-            print("Ancho de columna C ajustado a 25")
+            logger.debug("Ancho de columna C ajustado a 25")
         except Exception as e:
-            print(f"Error ajustando ancho de columnas: {e}")
+            logger.warning("Error ajustando ancho de columnas: %s", e)
             pass
\ No newline at end of file
@@ -1,10 +1,13 @@
 import io
+import logging
 from copy import copy
 from typing import List, Dict, Any, Optional
 
 import openpyxl
 from openpyxl.styles import Alignment, Border, Font
 
+logger = logging.getLogger(__name__)
+
 class OTExcelService:
     """Servicio para generar archivos Excel de Órdenes de Trabajo"""
     
@@ -17,35 +20,41 @@ class OTExcelService:
     
     def generar_excel_ot(self, ot_data: Dict[str, Any], items: List[Dict[str, Any]]) -> bytes:
         """Generar Excel para orden de trabajo"""
+        workbook = self.construir_workbook_ot(ot_data, items)
+        
+        # Guardar en memoria
+        excel_buffer = io.BytesIO()
+        workbook.save(excel_buffer)
+        excel_buffer.seek(0)
+        
+        logger.debug("Excel generado exitosamente")
+        return excel_buffer.getvalue()
+    
+    def construir_workbook_ot(self, ot_data: Dict[str, Any], items: List[Dict[str, Any]]):
+        """Cargar el template y rellenarlo con los datos de la OT, sin serializarlo"""
         try:
-            print(f"Intentando cargar template: {self.template_path}")
+            logger.debug("Intentando cargar template: %s", self.template_path)
             
             # Cargar template
             workbook = openpyxl.load_workbook(self.template_path, data_only=False, keep_vba=False)
             worksheet = workbook.active
             
-            print("Template cargado exitosamente")
+            logger.debug("Template cargado exitosamente")
             
             # Verificar rangos fusionados
             merged_ranges = list(worksheet.merged_cells.ranges)
-            print(f"Rangos fusionados encontrados: {len(merged_ranges)}")
+            logger.debug("Rangos fusionados encontrados: %s", len(merged_ranges))
             if merged_ranges:
-                print("Advertencia: El template aún tiene fusiones")
+                logger.warning("Advertencia: El template aún tiene fusiones")
             
             # Rellenar datos
             self._rellenar_datos_ot(worksheet, ot_data)
             self._rellenar_datos_items(worksheet, items)
             
-            # Guardar en memoria
-            excel_buffer = io.BytesIO()
-            workbook.save(excel_buffer)
-            excel_buffer.seek(0)
-            
-            print("Excel generado exitosamente")
-            return excel_buffer.getvalue()
+            return workbook
             
         except Exception as e:
-            print(f"Error generando Excel: {e}")
+            logger.error("Error generando Excel: %s", e)
             raise e
     
     def _rellenar_datos_ot(self, worksheet, ot_data: Dict[str, Any]):
@@ -60,10 +69,10 @@ class OTExcelService:
                 
                 # Escribir directamente en la celda
                 worksheet[cell_ref].value = value
-                print(f"Escrito '{value}' en {cell_ref}")
+                logger.debug("Escrito '%s' en %s", value, cell_ref)
                 
             except Exception as e:
-                print(f"Error escribiendo en {cell_ref}: {e}")
+                logger.warning("Error escribiendo en %s: %s", cell_ref, e)
                 pass
         
         # Datos principales
@@ -96,7 +105,7 @@ class OTExcelService:
         safe_set_cell('C38', ot_data.get('aperturada_por', ''))  # Columna C para pedro
         safe_set_cell('H38', ot_data.get('designada_a', ''))  # Columna H para erick
         
-        print("Datos de OT rellenados")
+        logger.debug("Datos de OT rellenados")
     
     def _rellenar_datos_items(self, worksheet, items: List[Dict[str, Any]]):
         """Rellenar datos de los items en la tabla"""
@@ -109,10 +118,10 @@ class OTExcelService:
                     return
                 
                 worksheet[cell_ref].value = value
-                print(f"Item escrito '{value}' en {cell_ref}")
+                logger.debug("Item escrito '%s' en %s", value, cell_ref)
                 
             except Exception as e:
-                print(f"Error escribiendo item en {cell_ref}: {e}")
+                logger.warning("Error escribiendo item en %s: %s", cell_ref, e)
                 pass
         
         # Columnas: A=ÍTEM, C=CÓDIGO, E=DESCRIPCIÓN, I=CANTIDAD
@@ -127,4 +136,4 @@ class OTExcelService:
             safe_set_cell(f'D{fila_actual}', item.get('descripcion', ''))
             safe_set_cell(f'I{fila_actual}', item.get('cantidad', ''))
         
-        print("Datos de items rellenados")
\ No newline at end of file
+        logger.debug("Datos de items rellenados")
\ No newline at end of file
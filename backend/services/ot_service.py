@@ -8,6 +8,7 @@ from typing import List, Optional
 from models import OrdenTrabajo, ItemOrdenTrabajo
 from schemas import OrdenTrabajoCreate, OrdenTrabajoUpdate
 from services.ot_excel_service import OTExcelService
+from services.precarga_service import precarga_service
 from datetime import datetime
 import re
 
@@ -93,6 +94,7 @@ class OTService:
             
             db.commit()
             db.refresh(db_ot)
+            precarga_service.programar('ot', db_ot.id)
             
             return db_ot
             
@@ -125,6 +127,7 @@ class OTService:
         
         db.commit()
         db.refresh(db_ot)
+        precarga_service.programar('ot', db_ot.id)
         
         return db_ot
     
@@ -0,0 +1,219 @@
+"""
+Pre-generación de documentos después de crear o actualizar una entidad
+Los servicios de escritura avisan con ``programar``; tras unos segundos sin
+nuevos cambios el documento se genera en segundo plano y queda en el cache de
+documentos, de modo que la descarga siguiente no tiene que generarlo.
+Las generaciones simultáneas del mismo documento y versión (descargas,
+pre-generación, trabajos) se agrupan en una sola. Solo la pre-generación y las
+acciones que conservan el documento (archivar, trabajos) lo guardan en el
+almacén; una descarga sin documento vigente envía el archivo temporal recién
+generado, que se elimina al terminar de enviarlo.
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Dict, Optional, Set, Tuple, Union
+
+from sqlalchemy.orm import selectinload
+
+from config import settings
+from database import SessionLocal
+from services.datos_documentos import DOCUMENTOS, huella_datos
+from services.dossier_service import renderizar_documento_en_archivo
+from utils.cache import TTLCache
+from utils.single_flight import SingleFlight
+from utils.storage import output_store
+from utils.streaming import ArchivoTemporal
+from utils.timing import etapa, incorporar_etapas
+from utils.workers import obtener_pool_procesos
+
+logger = logging.getLogger(__name__)
+
+Clave = Tuple[str, int]
+
+
+class PrecargaService:
+    """
+    Cola de pre-generación con agrupación de cambios: cada nuevo aviso para la
+    misma entidad reinicia su espera, así una ráfaga de autoguardados produce
+    un solo documento. El cache guarda por entidad la huella de los datos y la
+    clave del archivo en el almacén; solo hay acierto si la huella coincide
+    con los datos actuales.
+    """
+    
+    def __init__(self, espera_segundos: float, max_pendientes: int, cache: TTLCache):
+        self.espera_segundos = espera_segundos
+        self.max_pendientes = max_pendientes
+        self.cache = cache
+        self._pendientes: Dict[Clave, float] = {}
+        self._en_curso: Set[Clave] = set()
+        self._condicion = threading.Condition()
+        self._detener = False
+        self._hilo: Optional[threading.Thread] = None
+        self.single_flight = SingleFlight("documentos")
+    
+    def programar(self, tipo: str, entidad_id: int) -> None:
+        """Programar (o posponer) la generación del documento de una entidad"""
+        if not self._hilo:
+            return
+        clave = (tipo, entidad_id)
+        with self._condicion:
+            if clave not in self._pendientes and len(self._pendientes) >= self.max_pendientes:
+                logger.warning(f"Cola de pre-generación llena, se omite {tipo} {entidad_id}")
+                return
+            self._pendientes[clave] = time.monotonic() + self.espera_segundos
+            self._condicion.notify_all()
+    
+    def obtener(self, tipo: str, entidad_id: int, huella: str) -> Optional[str]:
+        """
+        Ruta del documento en cache para la huella de los datos actuales, o None.
+        Si la entidad tiene una pre-generación pendiente o en curso, se adelanta
+        y se espera hasta prerender_wait segundos a que termine.
+        """
+        clave = (tipo, entidad_id)
+        with self._condicion:
+            if clave in self._pendientes:
+                self._pendientes[clave] = 0
+                self._condicion.notify_all()
+            self._condicion.wait_for(
+                lambda: clave not in self._pendientes and clave not in self._en_curso,
+                timeout=settings.prerender_wait
+            )
+        
+        entrada = self.cache.get(clave)
+        if entrada is None or entrada[0] != huella:
+            return None
+        return output_store.resolver(entrada[1])
+    
+    def obtener_o_renderizar(self, tipo: str, entidad_id: int, datos) -> Union[str, ArchivoTemporal]:
+        """
+        Documento para los datos actuales de una descarga: la ruta del
+        pre-generado si sigue vigente o el archivo temporal recién generado,
+        que no se guarda en el almacén
+        """
+        with etapa("cache"):
+            huella = huella_datos(datos)
+            ruta = self.obtener(tipo, entidad_id, huella)
+        if ruta:
+            return ruta
+        return self.renderizar(tipo, entidad_id, datos, huella)
+    
+    def renderizar(self, tipo: str, entidad_id: int, datos, huella: Optional[str] = None) -> ArchivoTemporal:
+        """
+        Generar el documento en el pool de procesos, que lo escribe en un
+        archivo temporal. Las llamadas simultáneas para la misma entidad y los
+        mismos datos esperan a la primera y comparten su archivo.
+        """
+        huella = huella or huella_datos(datos)
+        
+        def renderizar_en_pool() -> ArchivoTemporal:
+            ruta = output_store.ruta_temporal(".xlsx")
+            try:
+                # render incluye las etapas internas del proceso del pool y el envío de los datos
+                with etapa("render"):
+                    tiempos = obtener_pool_procesos().submit(renderizar_documento_en_archivo, tipo, datos, ruta).result()
+            except Exception:
+                os.unlink(ruta)
+                raise
+            incorporar_etapas(tiempos)
+            return ArchivoTemporal(ruta)
+        
+        return self.single_flight.ejecutar(('render', tipo, entidad_id, huella), renderizar_en_pool)
+    
+    def generar(self, tipo: str, entidad_id: int, datos, huella: Optional[str] = None) -> str:
+        """
+        Documento guardado en el almacén para las acciones que lo conservan
+        (archivar, pre-generación, trabajos): reutiliza el del cache si sigue
+        vigente o lo genera, lo guarda y lo registra en el cache. Retorna la
+        clave del archivo.
+        """
+        huella = huella or huella_datos(datos)
+        entrada = self.cache.get((tipo, entidad_id))
+        if entrada and entrada[0] == huella and output_store.resolver(entrada[1]):
+            return entrada[1]
+        
+        def renderizar_y_guardar() -> str:
+            documento = self.renderizar(tipo, entidad_id, datos, huella)
+            with etapa("almacen"):
+                # Copia: descargas simultáneas pueden estar enviando el mismo temporal
+                clave_archivo = output_store.copiar_archivo(documento.ruta, tipo)
+            self.cache.set((tipo, entidad_id), (huella, clave_archivo))
+            return clave_archivo
+        
+        return self.single_flight.ejecutar(('almacen', tipo, entidad_id, huella), renderizar_y_guardar)
+    
+    def iniciar(self) -> None:
+        """Iniciar el hilo de pre-generación"""
+        if self._hilo and self._hilo.is_alive():
+            return
+        self._detener = False
+        self._hilo = threading.Thread(target=self._bucle, name="precarga-documentos", daemon=True)
+        self._hilo.start()
+    
+    def detener(self) -> None:
+        """Detener el hilo; las generaciones pendientes se descartan"""
+        with self._condicion:
+            self._detener = True
+            self._pendientes.clear()
+            self._condicion.notify_all()
+        if self._hilo:
+            self._hilo.join(timeout=30)
+            self._hilo = None
+    
+    def _bucle(self) -> None:
+        while True:
+            with self._condicion:
+                if self._detener:
+                    return
+                ahora = time.monotonic()
+                listos = [clave for clave, limite in self._pendientes.items() if limite <= ahora]
+                if not listos:
+                    espera = min(self._pendientes.values()) - ahora if self._pendientes else None
+                    self._condicion.wait(espera)
+                    continue
+                for clave in listos:
+                    del self._pendientes[clave]
+                    self._en_curso.add(clave)
+            
+            for clave in listos:
+                try:
+                    self._generar(*clave)
+                except Exception as e:
+                    logger.error(f"Error pre-generando {clave[0]} {clave[1]}: {str(e)}")
+                finally:
+                    with self._condicion:
+                        self._en_curso.discard(clave)
+                        self._condicion.notify_all()
+    
+    def _generar(self, tipo: str, entidad_id: int) -> None:
+        modelo, relacion, preparar, _ = DOCUMENTOS[tipo]
+        db = SessionLocal()
+        try:
+            entidad = db.query(modelo).options(selectinload(relacion)).filter(modelo.id == entidad_id).first()
+            if not entidad:
+                return  # Eliminada mientras esperaba
+            datos = preparar(entidad)
+        finally:
+            db.close()
+        
+        huella = huella_datos(datos)
+        entrada = self.cache.get((tipo, entidad_id))
+        if entrada and entrada[0] == huella and output_store.resolver(entrada[1]):
+            return  # Sin cambios que afecten al documento
+        
+        self.generar(tipo, entidad_id, datos, huella)
+        logger.info(f"Documento pre-generado: {tipo} {entidad_id}")
+
+
+documentos_cache = TTLCache(
+    "documentos",
+    ttl_segundos=settings.document_cache_ttl,
+    max_entradas=settings.document_cache_max_entries
+)
+precarga_service = PrecargaService(
+    espera_segundos=settings.prerender_delay,
+    max_pendientes=settings.prerender_max_pending,
+    cache=documentos_cache
+)
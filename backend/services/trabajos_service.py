@@ -0,0 +1,177 @@
+"""
+Generación de documentos como trabajos en segundo plano
+La petición solo encola el trabajo; hilos del proceso lo toman de la cola,
+generan el documento en el pool de procesos y lo guardan en el almacén de
+archivos generados, de donde se descarga al terminar. Un hilo de mantenimiento
+renueva los trabajos en curso del proceso y vuelve a encolar los que quedaron
+en proceso cuando otro proceso (o este, antes de reiniciarse) murió
+"""
+
+import logging
+import threading
+from datetime import date
+from typing import Any, Dict, Optional, Set, Tuple
+
+from sqlalchemy.orm import selectinload
+
+from config import settings
+from database import SessionLocal
+from services.datos_documentos import DOCUMENTOS
+from services.dossier_service import DossierService
+from services.precarga_service import precarga_service
+from utils.job_queue import JobStore, COMPLETADO, ERROR
+from utils.storage import output_store
+
+logger = logging.getLogger(__name__)
+
+TIPOS_TRABAJO = tuple(DOCUMENTOS) + ('dossier',)
+
+
+class TrabajosService:
+    """Encolado y ejecución de trabajos de generación de documentos"""
+    
+    def __init__(self, store: JobStore, hilos: int):
+        self.store = store
+        self.hilos = hilos
+        self._detener = threading.Event()
+        self._hilos = []
+        self._en_curso: Set[str] = set()
+        self._lock = threading.Lock()
+    
+    def encolar(self, tipo: str, parametros: Dict[str, Any]) -> Dict[str, Any]:
+        """Crear un trabajo en cola y retornarlo"""
+        if tipo not in TIPOS_TRABAJO:
+            raise ValueError(f"Tipo de trabajo no soportado: {tipo}")
+        trabajo = self.store.crear(tipo, parametros)
+        logger.info(f"Trabajo {trabajo['id']} en cola: {tipo} {parametros}")
+        return trabajo
+    
+    def obtener(self, trabajo_id: str) -> Optional[Dict[str, Any]]:
+        return self.store.obtener(trabajo_id)
+    
+    def iniciar(self) -> None:
+        """Iniciar los hilos que consumen la cola y el de mantenimiento"""
+        self._detener.clear()
+        self._reencolar_vencidos()
+        objetivos = [(self._bucle, f"trabajos-{numero}") for numero in range(self.hilos)]
+        objetivos.append((self._mantener, "trabajos-mantenimiento"))
+        for objetivo, nombre in objetivos:
+            hilo = threading.Thread(target=objetivo, name=nombre, daemon=True)
+            hilo.start()
+            self._hilos.append(hilo)
+    
+    def detener(self) -> None:
+        """Detener los hilos; el trabajo en curso de cada hilo termina antes"""
+        self._detener.set()
+        for hilo in self._hilos:
+            hilo.join(timeout=30)
+        self._hilos = []
+    
+    def _bucle(self) -> None:
+        while not self._detener.is_set():
+            try:
+                trabajo = self.store.tomar_siguiente()
+            except Exception as e:
+                logger.error(f"Error leyendo la cola de trabajos: {str(e)}")
+                trabajo = None
+            if trabajo is None:
+                self._detener.wait(settings.job_poll_interval)
+                continue
+            with self._lock:
+                self._en_curso.add(trabajo['id'])
+            try:
+                self.ejecutar(trabajo)
+            except Exception as e:
+                # Sin almacén para registrar el resultado: el trabajo se reencola al vencer
+                logger.error(f"Error registrando el trabajo {trabajo['id']}: {str(e)}")
+            finally:
+                with self._lock:
+                    self._en_curso.discard(trabajo['id'])
+    
+    def _mantener(self) -> None:
+        """Renovar los trabajos en curso de este proceso y reencolar los vencidos (de cualquier proceso)"""
+        while not self._detener.wait(self.store.vencimiento_segundos / 4):
+            with self._lock:
+                en_curso = list(self._en_curso)
+            for trabajo_id in en_curso:
+                try:
+                    self.store.renovar(trabajo_id)
+                except Exception as e:
+                    logger.error(f"Error renovando el trabajo {trabajo_id}: {str(e)}")
+            self._reencolar_vencidos()
+    
+    def _reencolar_vencidos(self) -> None:
+        try:
+            reclamados = self.store.reencolar_vencidos()
+        except Exception as e:
+            logger.error(f"Error reencolando trabajos vencidos: {str(e)}")
+            return
+        if reclamados:
+            logger.warning(f"{reclamados} trabajos interrumpidos reclamados (de nuevo en cola o con error)")
+    
+    def ejecutar(self, trabajo: Dict[str, Any]) -> None:
+        """Ejecutar un trabajo ya tomado de la cola y registrar su resultado"""
+        trabajo_id = trabajo['id']
+        try:
+            if trabajo['tipo'] == 'dossier':
+                clave, nombre_archivo = self._generar_dossier(trabajo)
+            else:
+                clave, nombre_archivo = self._generar_documento(trabajo)
+        except Exception as e:
+            logger.error(f"Trabajo {trabajo_id} con error: {str(e)}")
+            self.store.actualizar(trabajo_id, estado=ERROR, mensaje=str(e))
+            return
+        
+        self.store.actualizar(
+            trabajo_id, estado=COMPLETADO, progreso=100, resultado=clave, nombre_archivo=nombre_archivo
+        )
+        logger.info(f"Trabajo {trabajo_id} completado: {clave}")
+    
+    def _generar_documento(self, trabajo: Dict[str, Any]) -> Tuple[str, str]:
+        tipo = trabajo['tipo']
+        modelo, relacion, preparar, nombre = DOCUMENTOS[tipo]
+        entidad_id = trabajo['parametros']['id']
+        
+        db = SessionLocal()
+        try:
+            entidad = db.query(modelo).options(selectinload(relacion)).filter(modelo.id == entidad_id).first()
+            if not entidad:
+                raise ValueError(f"No existe {tipo} con id {entidad_id}")
+            datos = preparar(entidad)
+            nombre_archivo = nombre(entidad)
+        finally:
+            db.close()
+        
+        self.store.actualizar(trabajo['id'], progreso=10)
+        return precarga_service.generar(tipo, entidad_id, datos), nombre_archivo
+    
+    def _generar_dossier(self, trabajo: Dict[str, Any]) -> Tuple[str, str]:
+        parametros = trabajo['parametros']
+        fecha_desde = parametros.get('fecha_desde')
+        fecha_hasta = parametros.get('fecha_hasta')
+        
+        db = SessionLocal()
+        try:
+            dossier_service = DossierService(db)
+            recepciones = dossier_service.obtener_recepciones(
+                parametros.get('recepcion_ids'),
+                date.fromisoformat(fecha_desde) if fecha_desde else None,
+                date.fromisoformat(fecha_hasta) if fecha_hasta else None
+            )
+            if len(recepciones) > settings.dossier_max_recepciones:
+                raise ValueError(f"La exportación supera el máximo de {settings.dossier_max_recepciones} recepciones")
+            if not recepciones:
+                raise ValueError("No se encontraron recepciones para exportar")
+            documentos = dossier_service.preparar_documentos(recepciones, parametros.get('tipos'))
+        finally:
+            db.close()
+        
+        def progreso(terminados: int, total: int) -> None:
+            self.store.actualizar(trabajo['id'], progreso=10 + int(85 * terminados / max(total, 1)))
+        
+        self.store.actualizar(trabajo['id'], progreso=10)
+        ruta = output_store.ruta_temporal(".zip")
+        with open(ruta, 'wb') as f:
+            for bloque in DossierService.generar_zip(documentos, progreso):
+                f.write(bloque)
+        return output_store.guardar_archivo(ruta, "dossier"), f"dossier_{trabajo['id'][:8]}.zip"
@@ -3,8 +3,7 @@ Servicio para generar archivos Excel de verificación de muestras cilíndricas
 Basado en el template VERIFICACION CONCRETO - AUTOMATIZADO.xlsx
 """
 
-import os
-import shutil
+import io
 import logging
 from datetime import datetime
 from typing import List, Optional
@@ -14,6 +13,9 @@ from openpyxl.styles import Font, Alignment, Border, Side, PatternFill
 from openpyxl.utils import get_column_letter
 
 from models import VerificacionMuestras, MuestraVerificada
+from schemas import VerificacionMuestrasCreate, MuestraVerificadaCreate
+from utils.storage import output_store
+from utils.timing import etapa
 
 logger = logging.getLogger(__name__)
 
@@ -59,82 +61,117 @@ class VerificacionExcelService:
         'pesar': 22                    # V - Pesar / No pesar
     }
     
+    FILA_INICIO_MUESTRAS = 12
+    # Etiquetas de la fila de equipos -> campo de VerificacionMuestras
+    EQUIPOS = {
+        'Bernier': 'equipo_bernier',
+        'Lainas 1': 'equipo_lainas_1',
+        'Lainas 2': 'equipo_lainas_2',
+        'Escuadra': 'equipo_escuadra',
+        'Balanza': 'equipo_balanza'
+    }
+    # Etiquetas de la cabecera -> campo de VerificacionMuestras
+    ETIQUETAS_CABECERA = {
+        'VERIFICADO POR:': 'verificado_por',
+        'FECHA VERIFIC.:': 'fecha_verificacion',
+        'CLIENTE:': 'cliente'
+    }
+    # Filas vacías seguidas tras las cuales se da por terminada la tabla
+    MAX_FILAS_VACIAS = 20
+    
+    # Estilos básicos del worksheet. Son atributos de clase de solo lectura
+    # (openpyxl copia el estilo al asignarlo a una celda), de modo que el
+    # servicio no guarda estado por documento y puede usarse en varios hilos.
+    # Fuentes
+    font_header = Font(name='Arial', size=12, bold=True)
+    font_title = Font(name='Arial', size=14, bold=True)
+    font_normal = Font(name='Arial', size=10)
+    font_small = Font(name='Arial', size=8)
+    
+    # Alineación
+    align_center = Alignment(horizontal='center', vertical='center')
+    align_left = Alignment(horizontal='left', vertical='center')
+    
+    # Bordes
+    border_thin = Border(
+        left=Side(style='thin'),
+        right=Side(style='thin'),
+        top=Side(style='thin'),
+        bottom=Side(style='thin')
+    )
+    
+    # Colores de fondo
+    fill_header = PatternFill(start_color='D9D9D9', end_color='D9D9D9', fill_type='solid')
+    fill_formula = PatternFill(start_color='E6F3FF', end_color='E6F3FF', fill_type='solid')
+    fill_manual = PatternFill(start_color='FFF2CC', end_color='FFF2CC', fill_type='solid')
+    fill_patron = PatternFill(start_color='E6FFE6', end_color='E6FFE6', fill_type='solid')
+    
     def __init__(self):
-        """Inicializa el servicio con las rutas de template y salida."""
+        """Inicializa el servicio con la ruta del template."""
         # Nuevo template V03 - Archivo xlsx en la raíz de templates
         self.template_path = "templates/VERIFICACION CONCRETO - AUTOMATIZADO.xlsx"
-        self.output_dir = "backend/output"
-        
-        # Asegurar que el directorio de salida existe
-        os.makedirs(self.output_dir, exist_ok=True)
     
-    def generar_excel_verificacion(self, verificacion: VerificacionMuestras) -> str:
+    def renderizar_excel_verificacion(self, verificacion: VerificacionMuestras) -> bytes:
         """
-        Genera un archivo Excel para la verificación de muestras cilíndricas.
+        Genera el Excel de la verificación en memoria, sin escribir en disco.
         
         Args:
             verificacion: Objeto VerificacionMuestras con los datos a llenar
             
         Returns:
-            str: Ruta del archivo Excel generado
+            bytes: Contenido del archivo Excel
             
         Raises:
             ValueError: Si hay error en la generación del archivo
         """
+        wb = self.construir_workbook(verificacion)
+        excel_buffer = io.BytesIO()
+        with etapa("guardar"):
+            wb.save(excel_buffer)
+        return excel_buffer.getvalue()
+    
+    def construir_workbook(self, verificacion: VerificacionMuestras):
+        """
+        Carga el template y lo llena con la verificación, sin serializarlo.
+        
+        Raises:
+            ValueError: Si hay error al llenar el template
+        """
         try:
-            # Crear archivo de salida con timestamp único
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"verificacion_muestras_{timestamp}.xlsx"
-            filepath = os.path.join(self.output_dir, filename)
-            
-            # Copiar el template para preservar formato
-            shutil.copy2(self.template_path, filepath)
-            
-            # Cargar el archivo copiado
-            wb = load_workbook(filepath)
+            # load_workbook ya trabaja sobre una copia en memoria del template
+            with etapa("plantilla"):
+                wb = load_workbook(self.template_path)
             ws = wb.active
             
             # Llenar datos específicos respetando el formato del template
-            self._llenar_datos_template(ws, verificacion)
-            
-            # Guardar el archivo
-            wb.save(filepath)
-            
-            # Actualizar la ruta en la base de datos
-            verificacion.archivo_excel = filepath
-            
-            logger.info(f"Archivo Excel generado exitosamente: {filepath}")
-            return filepath
+            with etapa("rellenar"):
+                self._llenar_datos_template(ws, verificacion)
+            return wb
             
         except Exception as e:
             logger.error(f"Error generando Excel de verificación: {str(e)}")
             raise ValueError(f"Error generando archivo Excel: {str(e)}")
     
-    def _configurar_estilos(self, ws):
-        """Configura los estilos básicos del worksheet"""
-        # Fuentes
-        self.font_header = Font(name='Arial', size=12, bold=True)
-        self.font_title = Font(name='Arial', size=14, bold=True)
-        self.font_normal = Font(name='Arial', size=10)
-        self.font_small = Font(name='Arial', size=8)
-        
-        # Alineación
-        self.align_center = Alignment(horizontal='center', vertical='center')
-        self.align_left = Alignment(horizontal='left', vertical='center')
-        
-        # Bordes
-        self.border_thin = Border(
-            left=Side(style='thin'),
-            right=Side(style='thin'),
-            top=Side(style='thin'),
-            bottom=Side(style='thin')
-        )
+    def generar_excel_verificacion(self, verificacion: VerificacionMuestras) -> str:
+        """
+        Genera el Excel de la verificación y lo archiva en el almacén de archivos generados.
+        
+        Args:
+            verificacion: Objeto VerificacionMuestras con los datos a llenar
+            
+        Returns:
+            str: Clave del archivo en el almacén de archivos generados
+            
+        Raises:
+            ValueError: Si hay error en la generación del archivo
+        """
+        clave = output_store.guardar_workbook(self.construir_workbook(verificacion), "verificacion_muestras")
         
-        # Colores de fondo
-        self.fill_header = PatternFill(start_color='D9D9D9', end_color='D9D9D9', fill_type='solid')
-        self.fill_formula = PatternFill(start_color='E6F3FF', end_color='E6F3FF', fill_type='solid')
-        self.fill_manual = PatternFill(start_color='FFF2CC', end_color='FFF2CC', fill_type='solid')
-        self.fill_patron = PatternFill(start_color='E6FFE6', end_color='E6FFE6', fill_type='solid')
+        # Actualizar la clave en la base de datos
+        verificacion.archivo_excel = clave
+        
+        logger.info(f"Archivo Excel archivado exitosamente: {clave}")
+        return clave
     
     def _generar_encabezado(self, ws, verificacion: VerificacionMuestras):
         """Genera el encabezado del documento"""
@@ -423,9 +460,6 @@ class VerificacionExcelService:
         Crea un Excel desde cero con la estructura de verificación de muestras
         """
         try:
-            # Configurar estilos
-            self._configurar_estilos(ws)
-            
             # Título principal
             ws['A1'] = "VERIFICACIÓN DE MUESTRAS CILINDRICAS DE CONCRETO"
             ws.merge_cells('A1:Q1')
@@ -586,9 +620,6 @@ class VerificacionExcelService:
             verificacion: Objeto VerificacionMuestras con los datos
         """
         try:
-            # Configurar estilos primero
-            self._configurar_estilos(ws)
-            
             # Llenar información general
             self._llenar_informacion_general(ws, verificacion)
             
@@ -643,7 +674,7 @@ class VerificacionExcelService:
     
     def _llenar_datos_muestras(self, ws, verificacion: VerificacionMuestras):
         """Llena los datos de las muestras en las filas correspondientes."""
-        start_row = 12
+        start_row = self.FILA_INICIO_MUESTRAS
         
         for i, muestra in enumerate(verificacion.muestras_verificadas, 1):
             row = start_row + i - 1
@@ -783,3 +814,182 @@ class VerificacionExcelService:
             return "No cumple"
         else:
             return ""
+    
+    def importar_excel_verificacion(self, ruta: str, numero_verificacion: str,
+                                    fecha_documento: Optional[str] = None) -> VerificacionMuestrasCreate:
+        """
+        Lee un formato V03 llenado a mano y lo convierte en una verificación a crear.
+        
+        Recorre la hoja en modo read_only: cabecera (filas 1-9), muestras desde la
+        fila 12 con el mismo orden de columnas que _llenar_fila_muestra, y la fila de
+        equipos y nota al final de la tabla.
+        
+        Args:
+            ruta: Ruta del archivo .xlsx
+            numero_verificacion: Número con el que se registrará la verificación
+            fecha_documento: Fecha del documento (DD/MM/YYYY), por defecto hoy
+            
+        Returns:
+            VerificacionMuestrasCreate: Datos listos para VerificacionService.crear_verificacion
+            
+        Raises:
+            ValueError: Si el archivo no se puede leer o no tiene muestras
+        """
+        try:
+            wb = load_workbook(ruta, read_only=True, data_only=True)
+        except Exception as e:
+            raise ValueError(f"No se pudo abrir el archivo Excel: {str(e)}")
+        
+        datos = {}
+        muestras = []
+        try:
+            ws = wb.worksheets[0]
+            filas_vacias = 0
+            equipos_leidos = False
+            es_formato_v03 = False
+            max_col = max(self.COLUMNS.values())
+            
+            for row, valores in enumerate(ws.iter_rows(max_col=max_col, values_only=True), 1):
+                valores = list(valores) + [None] * (max_col - len(valores))
+                
+                if row < self.FILA_INICIO_MUESTRAS:
+                    es_formato_v03 |= self._leer_cabecera(valores, datos)
+                    continue
+                
+                if self._texto(valores[1]) == "Código equipo":
+                    datos.update(self._leer_equipos(valores))
+                    equipos_leidos = True
+                    continue
+                if self._texto(valores[0]) == "Nota":
+                    datos['nota'] = next((self._texto(v) for v in valores[1:] if self._texto(v)), None)
+                    break
+                
+                # Filas sin datos (la plantilla trae el N° pre-numerado)
+                if all(self._texto(v) == "" for v in valores[1:]):
+                    filas_vacias += 1
+                    if filas_vacias >= self.MAX_FILAS_VACIAS:
+                        break
+                    continue
+                filas_vacias = 0
+                
+                if equipos_leidos:
+                    # Después de la fila de equipos ya no hay muestras
+                    continue
+                muestras.append(self._leer_fila_muestra(valores, len(muestras) + 1))
+        finally:
+            wb.close()
+        
+        if not es_formato_v03:
+            raise ValueError("El archivo no corresponde al formato de verificación V03")
+        if not muestras:
+            raise ValueError("El archivo no contiene muestras desde la fila 12")
+        
+        logger.info(f"Excel de verificación leído: {len(muestras)} muestras")
+        return VerificacionMuestrasCreate(
+            numero_verificacion=numero_verificacion,
+            fecha_documento=fecha_documento or datetime.now().strftime("%d/%m/%Y"),
+            muestras_verificadas=muestras,
+            **datos
+        )
+    
+    def _leer_cabecera(self, valores: list, datos: dict) -> bool:
+        """
+        Toma el primer valor a la derecha de cada etiqueta de cabecera
+        (las etiquetas pueden ocupar celdas fusionadas). Retorna True si la fila
+        contiene alguna etiqueta.
+        """
+        encontrada = False
+        for col, valor in enumerate(valores):
+            texto = self._texto(valor)
+            for etiqueta, campo in self.ETIQUETAS_CABECERA.items():
+                if etiqueta not in texto:
+                    continue
+                encontrada = True
+                if campo in datos:
+                    continue
+                for siguiente in valores[col + 1:]:
+                    if self._texto(siguiente).endswith(':'):
+                        break  # Siguiente etiqueta: el campo quedó vacío
+                    if self._texto(siguiente):
+                        if isinstance(siguiente, datetime):
+                            siguiente = siguiente.strftime("%d/%m/%Y")
+                        datos[campo] = self._texto(siguiente)
+                        break
+        return encontrada
+    
+    def _leer_equipos(self, valores: list) -> dict:
+        """Lee los pares nombre/código de la fila de equipos (desde la columna C)"""
+        equipos = {}
+        for col in range(2, len(valores) - 1, 2):
+            campo = self.EQUIPOS.get(self._texto(valores[col]))
+            if campo:
+                equipos[campo] = self._texto(valores[col + 1]) or None
+        return equipos
+    
+    def _leer_fila_muestra(self, valores: list, numero_por_defecto: int) -> MuestraVerificadaCreate:
+        """Inverso de _llenar_fila_muestra: convierte una fila en una muestra verificada"""
+        def celda(clave):
+            return valores[self.COLUMNS[clave] - 1]
+        
+        numero = self._numero(celda('numero'))
+        tolerancia = self._texto(celda('tolerancia_porcentaje')).rstrip('%').strip()
+        
+        return MuestraVerificadaCreate(
+            item_numero=int(numero) if numero else numero_por_defecto,
+            codigo_lem=self._texto(celda('codigo_lem')) or None,
+            tipo_testigo=self._texto(celda('tipo_testigo')),
+            diametro_1_mm=self._numero(celda('diametro_1')),
+            diametro_2_mm=self._numero(celda('diametro_2')),
+            tolerancia_porcentaje=self._numero(tolerancia),
+            aceptacion_diametro=self._leer_aceptacion(celda('aceptacion_diametro')),
+            perpendicularidad_sup1=self._leer_booleano(celda('perpendicularidad_sup1')),
+            perpendicularidad_sup2=self._leer_booleano(celda('perpendicularidad_sup2')),
+            perpendicularidad_inf1=self._leer_booleano(celda('perpendicularidad_inf1')),
+            perpendicularidad_inf2=self._leer_booleano(celda('perpendicularidad_inf2')),
+            perpendicularidad_medida=self._leer_booleano(celda('perpendicularidad_medida')),
+            planitud_superior_aceptacion=self._leer_aceptacion(celda('planitud_superior')),
+            planitud_inferior_aceptacion=self._leer_aceptacion(celda('planitud_inferior')),
+            planitud_depresiones_aceptacion=self._leer_aceptacion(celda('planitud_depresiones')),
+            accion_realizar=self._texto(celda('accion')) or None,
+            conformidad=self._texto(celda('conformidad')) or None,
+            longitud_1_mm=self._numero(celda('longitud_1')),
+            longitud_2_mm=self._numero(celda('longitud_2')),
+            longitud_3_mm=self._numero(celda('longitud_3')),
+            masa_muestra_aire_g=self._numero(celda('masa')),
+            pesar=self._texto(celda('pesar')) or None
+        )
+    
+    @staticmethod
+    def _texto(valor) -> str:
+        """Texto de una celda sin espacios, "" si está vacía"""
+        return "" if valor is None else str(valor).strip()
+    
+    @staticmethod
+    def _numero(valor) -> Optional[float]:
+        """Número de una celda (acepta coma decimal), None si está vacía o no es numérica"""
+        if valor is None or isinstance(valor, bool):
+            return None
+        if isinstance(valor, (int, float)):
+            return float(valor)
+        try:
+            return float(str(valor).strip().replace(',', '.'))
+        except ValueError:
+            return None
+    
+    def _leer_booleano(self, valor) -> Optional[bool]:
+        """Inverso de _formatear_aceptacion/_formatear_checkbox"""
+        if isinstance(valor, bool):
+            return valor
+        texto = self._texto(valor).lower()
+        if texto in ('cumple', '✓', '✔', 'v', 'si', 'sí'):
+            return True
+        if texto in ('no cumple', '✗', '✘', 'x', 'no'):
+            return False
+        return None
+    
+    def _leer_aceptacion(self, valor) -> Optional[str]:
+        """Normaliza una aceptación a "Cumple"/"No cumple" (None si está vacía)"""
+        booleano = self._leer_booleano(valor)
+        if booleano is None:
+            return self._texto(valor) or None
+        return self._formatear_aceptacion(booleano)
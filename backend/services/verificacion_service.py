@@ -6,6 +6,7 @@ Implementa la lógica de fórmulas y patrones según los requerimientos
 from typing import Dict, Any, Optional, List
 from sqlalchemy.orm import Session
 from models import VerificacionMuestras, MuestraVerificada
+from services.precarga_service import precarga_service
 from schemas import (
     VerificacionMuestrasCreate, 
     MuestraVerificadaCreate,
@@ -297,6 +298,7 @@ class VerificacionService:
             
             self.db.commit()
             self.db.refresh(db_verificacion)
+            precarga_service.programar('verificacion', db_verificacion.id)
             
             return db_verificacion
             
@@ -511,6 +513,7 @@ class VerificacionService:
                 self.db.commit()
             
             self.db.refresh(db_verificacion)
+            precarga_service.programar('verificacion', db_verificacion.id)
             return db_verificacion
             
         except Exception as e:
@@ -0,0 +1,33 @@
+"""
+TTLCache (utils.cache): un valor calculado mientras se invalida el cache no
+debe quedar guardado
+"""
+
+from utils.cache import TTLCache
+
+
+def test_get_or_set_guarda_y_reutiliza():
+    cache = TTLCache("prueba", ttl_segundos=60)
+    llamadas = []
+    
+    def calcular():
+        llamadas.append(1)
+        return {'total': 1}
+    
+    assert cache.get_or_set('clave', calcular) == {'total': 1}
+    assert cache.get_or_set('clave', calcular) == {'total': 1}
+    assert len(llamadas) == 1
+
+
+def test_get_or_set_no_guarda_si_se_invalida_durante_el_calculo():
+    cache = TTLCache("prueba", ttl_segundos=60)
+    
+    def calcular_con_escritura_concurrente():
+        # Otra petición confirma una escritura mientras se calcula
+        cache.invalidate()
+        return {'total': 'anterior'}
+    
+    assert cache.get_or_set('clave', calcular_con_escritura_concurrente) == {'total': 'anterior'}
+    assert cache.get('clave') is None
+    assert cache.get_or_set('clave', lambda: {'total': 'nuevo'}) == {'total': 'nuevo'}
+    assert cache.get('clave') == {'total': 'nuevo'}
@@ -0,0 +1,127 @@
+"""
+Contrato de los almacenamientos de trabajos (utils.job_queue): memoria,
+SQLite y Redis (con fakeredis) deben comportarse igual
+"""
+
+import threading
+import time
+
+import pytest
+
+from utils.job_queue import (
+    JobStore, MemoryJobStore, SQLiteJobStore, RedisJobStore, EN_COLA, PROCESANDO, COMPLETADO, ERROR
+)
+
+VENCIMIENTO = 0.2
+
+
+@pytest.fixture(params=["memory", "sqlite", "fakeredis"])
+def store(request, tmp_path) -> JobStore:
+    opciones = {'vencimiento_segundos': VENCIMIENTO, 'max_intentos': 2}
+    if request.param == "memory":
+        return MemoryJobStore(3600, **opciones)
+    if request.param == "sqlite":
+        return SQLiteJobStore(str(tmp_path / "trabajos.db"), 3600, **opciones)
+    pytest.importorskip("fakeredis")
+    return RedisJobStore("fakeredis://", 3600, **opciones)
+
+
+def test_job_store_es_abstracto():
+    with pytest.raises(TypeError):
+        JobStore(3600)
+
+
+def test_crear_y_obtener(store):
+    trabajo = store.crear('recepcion', {'id': 7})
+    
+    guardado = store.obtener(trabajo['id'])
+    assert guardado['tipo'] == 'recepcion'
+    assert guardado['parametros'] == {'id': 7}
+    assert guardado['estado'] == EN_COLA
+    assert guardado['intentos'] == 0
+    assert store.obtener("no-existe") is None
+
+
+def test_tomar_siguiente_en_orden_de_creacion(store):
+    primero = store.crear('ot', {'id': 1})
+    time.sleep(0.01)
+    segundo = store.crear('ot', {'id': 2})
+    
+    tomado = store.tomar_siguiente()
+    assert tomado['id'] == primero['id']
+    assert tomado['estado'] == PROCESANDO
+    assert tomado['intentos'] == 1
+    assert store.obtener(primero['id'])['estado'] == PROCESANDO
+    assert store.tomar_siguiente()['id'] == segundo['id']
+    assert store.tomar_siguiente() is None
+
+
+def test_actualizar(store):
+    trabajo = store.crear('control', {'id': 3})
+    store.tomar_siguiente()
+    
+    store.actualizar(trabajo['id'], estado=COMPLETADO, progreso=100, resultado="clave.xlsx")
+    
+    guardado = store.obtener(trabajo['id'])
+    assert guardado['estado'] == COMPLETADO
+    assert guardado['progreso'] == 100
+    assert guardado['resultado'] == "clave.xlsx"
+    assert guardado['actualizado'] >= trabajo['actualizado']
+
+
+def test_cada_trabajo_lo_toma_un_solo_consumidor(store):
+    ids = {store.crear('ot', {'id': numero})['id'] for numero in range(40)}
+    tomados = []
+    lock = threading.Lock()
+    
+    def consumir():
+        while (trabajo := store.tomar_siguiente()) is not None:
+            with lock:
+                tomados.append(trabajo['id'])
+    
+    hilos = [threading.Thread(target=consumir) for _ in range(4)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    
+    assert sorted(tomados) == sorted(ids)
+
+
+def test_trabajo_vencido_vuelve_a_la_cola(store):
+    trabajo = store.crear('verificacion', {'id': 5})
+    store.tomar_siguiente()
+    assert store.reencolar_vencidos() == 0
+    
+    time.sleep(VENCIMIENTO * 1.5)
+    
+    assert store.reencolar_vencidos() == 1
+    assert store.obtener(trabajo['id'])['estado'] == EN_COLA
+    retomado = store.tomar_siguiente()
+    assert retomado['id'] == trabajo['id']
+    assert retomado['intentos'] == 2
+
+
+def test_renovar_evita_el_vencimiento(store):
+    trabajo = store.crear('verificacion', {'id': 6})
+    store.tomar_siguiente()
+    
+    for _ in range(3):
+        time.sleep(VENCIMIENTO / 2)
+        store.renovar(trabajo['id'])
+    
+    assert store.reencolar_vencidos() == 0
+    assert store.obtener(trabajo['id'])['estado'] == PROCESANDO
+
+
+def test_intentos_agotados_dejan_el_trabajo_con_error(store):
+    trabajo = store.crear('dossier', {})
+    for _ in range(2):
+        assert store.tomar_siguiente()['id'] == trabajo['id']
+        time.sleep(VENCIMIENTO * 1.5)
+        assert store.reencolar_vencidos() == 1
+    
+    guardado = store.obtener(trabajo['id'])
+    assert guardado['estado'] == ERROR
+    assert "interrumpió 2 veces" in guardado['mensaje']
+    assert store.tomar_siguiente() is None
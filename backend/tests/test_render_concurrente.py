@@ -0,0 +1,52 @@
+"""
+Los servicios de Excel no guardan estado por generación: renderizar
+documentos distintos a la vez desde varios hilos debe producir lo mismo que
+renderizarlos uno tras otro
+"""
+
+import io
+import re
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from benchmarks.datos import DATOS, TIPOS
+from services.dossier_service import renderizar_documento
+
+# 18 items: la recepción inserta filas a partir del item 18
+ITEMS = (1, 18)
+HILOS = 8
+
+# Fecha de guardado que openpyxl escribe en cada documento
+_MODIFICADO = re.compile(rb"<dcterms:modified[^>]*>[^<]*</dcterms:modified>")
+
+
+def _partes(contenido: bytes) -> dict:
+    """
+    Contenido de cada parte del xlsx. Se compara por partes y sin la fecha de
+    modificación porque el zip y docProps/core.xml llevan la hora del guardado.
+    """
+    with zipfile.ZipFile(io.BytesIO(contenido)) as archivo:
+        partes = {nombre: archivo.read(nombre) for nombre in archivo.namelist()}
+    partes['docProps/core.xml'] = _MODIFICADO.sub(b"", partes['docProps/core.xml'])
+    return partes
+
+
+@pytest.fixture(scope="module")
+def documentos():
+    return [(tipo, n, DATOS[tipo](n)) for tipo in TIPOS for n in ITEMS]
+
+
+@pytest.fixture(scope="module")
+def en_serie(documentos):
+    return [_partes(renderizar_documento(tipo, datos)) for tipo, _, datos in documentos]
+
+
+def test_render_en_hilos_igual_que_en_serie(documentos, en_serie):
+    # Todos a la vez: cada servicio renderiza dos documentos distintos en paralelo
+    with ThreadPoolExecutor(max_workers=HILOS) as pool:
+        resultados = list(pool.map(lambda documento: renderizar_documento(documento[0], documento[2]), documentos))
+    
+    for (tipo, n, _), contenido, esperado in zip(documentos, resultados, en_serie):
+        assert _partes(contenido) == esperado, f"{tipo} con {n} items difiere"
@@ -0,0 +1,43 @@
+"""
+Consumidores de la cola de trabajos (services.trabajos_service): un error del
+almacén al registrar un resultado no debe terminar el hilo
+"""
+
+import time
+
+from services.trabajos_service import TrabajosService
+from utils.job_queue import MemoryJobStore, COMPLETADO
+
+
+class StoreQueFallaUnaVez(MemoryJobStore):
+    """Almacén en memoria cuyo primer registro de resultado falla"""
+    
+    def __init__(self, *args, **opciones):
+        super().__init__(*args, **opciones)
+        self.fallos = 0
+    
+    def actualizar(self, trabajo_id, **campos):
+        if "estado" in campos and self.fallos == 0:
+            self.fallos += 1
+            raise ConnectionError("almacén no disponible")
+        return super().actualizar(trabajo_id, **campos)
+
+
+def test_el_hilo_sigue_tras_un_error_del_almacen(monkeypatch):
+    store = StoreQueFallaUnaVez(3600)
+    servicio = TrabajosService(store, hilos=1)
+    monkeypatch.setattr(servicio, '_generar_documento', lambda trabajo: (f"clave-{trabajo['id']}", "doc.xlsx"))
+    
+    primero = store.crear('ot', {'id': 1})
+    segundo = store.crear('ot', {'id': 2})
+    servicio.iniciar()
+    try:
+        limite = time.monotonic() + 5
+        while store.obtener(segundo['id'])['estado'] != COMPLETADO and time.monotonic() < limite:
+            time.sleep(0.05)
+    finally:
+        servicio.detener()
+    
+    assert store.fallos == 1
+    assert store.obtener(segundo['id'])['estado'] == COMPLETADO
+    assert store.obtener(primero['id'])['estado'] != COMPLETADO
@@ -0,0 +1,203 @@
+"""
+Control de admisión para endpoints pesados (generación de Excel, exportaciones
+y cargas de archivos): límite de peticiones simultáneas por clase de endpoint,
+una cola de espera corta y rechazo rápido con 429 + Retry-After cuando la cola
+está llena o la espera se agota
+"""
+
+import asyncio
+import math
+import re
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Pattern, Tuple
+
+from fastapi.responses import JSONResponse
+
+from config import settings
+
+
+class AdmisionRechazada(Exception):
+    """La petición no obtuvo un lugar a tiempo"""
+    
+    def __init__(self, clase: str, retry_after: int):
+        super().__init__(f"Capacidad de '{clase}' agotada")
+        self.clase = clase
+        self.retry_after = retry_after
+
+
+class ClaseAdmision:
+    """
+    Semáforo con cola acotada para una clase de endpoints. Se usa solo desde
+    el event loop, por lo que no necesita locks. Al liberar un lugar se
+    entrega directamente a la petición más antigua de la cola.
+    """
+    
+    def __init__(self, nombre: str, limite: int, max_cola: int, espera_max: float):
+        self.nombre = nombre
+        self.limite = max(1, limite)
+        self.max_cola = max(0, max_cola)
+        self.espera_max = espera_max
+        self._en_curso = 0
+        self._cola: Deque[asyncio.Future] = deque()
+        # Estadísticas
+        self.admitidas = 0
+        self.rechazadas = 0
+        self.cola_max = 0
+        self.espera_total = 0.0
+        self.espera_max_observada = 0.0
+        self.duracion_total = 0.0
+        self.terminadas = 0
+    
+    async def adquirir(self) -> None:
+        """Obtener un lugar, esperando en la cola si hace falta; AdmisionRechazada si no se logra"""
+        if self._en_curso < self.limite and not self._cola:
+            self._en_curso += 1
+            self._registrar_admision(0.0)
+            return
+        
+        if len(self._cola) >= self.max_cola:
+            self.rechazadas += 1
+            raise AdmisionRechazada(self.nombre, self._retry_after())
+        
+        futuro = asyncio.get_running_loop().create_future()
+        self._cola.append(futuro)
+        self.cola_max = max(self.cola_max, len(self._cola))
+        inicio = time.monotonic()
+        try:
+            await asyncio.wait_for(asyncio.shield(futuro), timeout=self.espera_max)
+        except asyncio.TimeoutError:
+            if futuro.done():
+                # El lugar llegó justo al vencer la espera: se devuelve
+                self.liberar()
+            self.rechazadas += 1
+            raise AdmisionRechazada(self.nombre, self._retry_after())
+        except asyncio.CancelledError:
+            # Cliente desconectado mientras esperaba
+            if futuro.done():
+                self.liberar()
+            raise
+        finally:
+            futuro.cancel()
+            try:
+                self._cola.remove(futuro)
+            except ValueError:
+                pass
+        
+        self._registrar_admision(time.monotonic() - inicio)
+    
+    def liberar(self, duracion: Optional[float] = None) -> None:
+        """Liberar un lugar: pasa a la siguiente petición en cola o queda disponible"""
+        if duracion is not None:
+            self.duracion_total += duracion
+            self.terminadas += 1
+        while self._cola:
+            futuro = self._cola.popleft()
+            if not futuro.done():
+                futuro.set_result(None)
+                return
+        self._en_curso -= 1
+    
+    def _registrar_admision(self, espera: float) -> None:
+        self.admitidas += 1
+        self.espera_total += espera
+        self.espera_max_observada = max(self.espera_max_observada, espera)
+    
+    def _retry_after(self) -> int:
+        """Segundos sugeridos para reintentar: lo que tardaría en vaciarse la cola actual"""
+        duracion_media = self.duracion_total / self.terminadas if self.terminadas else 1.0
+        return max(1, math.ceil(duracion_media * (len(self._cola) + 1) / self.limite))
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'limite': self.limite,
+            'max_cola': self.max_cola,
+            'en_curso': self._en_curso,
+            'en_cola': len(self._cola),
+            'cola_max': self.cola_max,
+            'admitidas': self.admitidas,
+            'rechazadas': self.rechazadas,
+            'espera_media_ms': round(1000 * self.espera_total / self.admitidas, 1) if self.admitidas else 0.0,
+            'espera_max_ms': round(1000 * self.espera_max_observada, 1),
+            'duracion_media_ms': round(1000 * self.duracion_total / self.terminadas, 1) if self.terminadas else 0.0
+        }
+
+
+# Clases de endpoints pesados: (método, patrón de ruta, clase)
+_RUTAS: List[Tuple[str, Pattern, str]] = [
+    ("GET", re.compile(r"^/api/ordenes/\d+/excel$"), "render"),
+    ("GET", re.compile(r"^/api/ot/\d+/excel$"), "render"),
+    ("POST", re.compile(r"^/api/concreto/generar-excel/\d+$"), "render"),
+    ("POST", re.compile(r"^/api/verificacion/\d+/generar-excel$"), "render"),
+    ("GET", re.compile(r"^/api/verificacion/\d+/descargar-excel$"), "render"),
+    ("POST", re.compile(r"^/api/excel/dossier$"), "export"),
+    ("POST", re.compile(r"^/api/excel/export$"), "export"),
+    ("GET", re.compile(r"^/api/excel/template/\d+$"), "export"),
+    ("POST", re.compile(r"^/api/excel/(upload|bulk-upload|validate)$"), "upload"),
+    ("POST", re.compile(r"^/api/verificacion/importar-excel$"), "upload"),
+]
+
+
+class ControlAdmision:
+    """Clases de admisión configuradas y su asignación a rutas"""
+    
+    def __init__(self):
+        self.clases = {
+            'render': ClaseAdmision(
+                'render', settings.admission_render_limit, settings.admission_render_queue, settings.admission_max_wait
+            ),
+            'export': ClaseAdmision(
+                'export', settings.admission_export_limit, settings.admission_export_queue, settings.admission_max_wait
+            ),
+            'upload': ClaseAdmision(
+                'upload', settings.admission_upload_limit, settings.admission_upload_queue, settings.admission_max_wait
+            ),
+        }
+    
+    def clase_para(self, metodo: str, ruta: str) -> Optional[ClaseAdmision]:
+        for metodo_ruta, patron, clase in _RUTAS:
+            if metodo == metodo_ruta and patron.match(ruta):
+                return self.clases[clase]
+        return None
+    
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {nombre: clase.stats() for nombre, clase in self.clases.items()}
+
+
+control_admision = ControlAdmision()
+
+
+class AdmisionMiddleware:
+    """
+    Middleware ASGI: el lugar se mantiene hasta terminar de enviar la respuesta,
+    de modo que las descargas y exportaciones por streaming también cuentan
+    """
+    
+    def __init__(self, app, control: ControlAdmision = control_admision):
+        self.app = app
+        self.control = control
+    
+    async def __call__(self, scope, receive, send):
+        clase = None
+        if scope["type"] == "http" and settings.admission_enabled:
+            clase = self.control.clase_para(scope["method"], scope["path"])
+        if clase is None:
+            await self.app(scope, receive, send)
+            return
+        
+        try:
+            await clase.adquirir()
+        except AdmisionRechazada as e:
+            respuesta = JSONResponse(
+                status_code=429,
+                content={"detail": f"Servidor ocupado ({e.clase}), intente nuevamente en {e.retry_after} s"},
+                headers={"Retry-After": str(e.retry_after)}
+            )
+            await respuesta(scope, receive, send)
+            return
+        
+        inicio = time.monotonic()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            clase.liberar(time.monotonic() - inicio)
@@ -0,0 +1,84 @@
+"""
+Cache en memoria con expiración (TTL) e invalidación por espacio de nombres
+"""
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+class TTLCache:
+    """Cache thread-safe con expiración por entrada e invalidación explícita"""
+
+    def __init__(self, nombre: str, ttl_segundos: float = 300, max_entradas: int = 256):
+        self.nombre = nombre
+        self.ttl_segundos = ttl_segundos
+        self.max_entradas = max_entradas
+        self._datos: Dict[Hashable, Tuple[float, Any]] = {}
+        self._lock = threading.Lock()
+        # Aumenta con cada invalidación: un valor calculado antes no se guarda
+        self._generacion = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, clave: Hashable) -> Optional[Any]:
+        """Obtener un valor vigente o None"""
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is None or entrada[0] < time.monotonic():
+                if entrada is not None:
+                    del self._datos[clave]
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entrada[1]
+
+    def set(self, clave: Hashable, valor: Any, ttl_segundos: Optional[float] = None) -> None:
+        """Guardar un valor con el TTL indicado (o el TTL por defecto)"""
+        with self._lock:
+            self._guardar(clave, valor, ttl_segundos)
+
+    def _guardar(self, clave: Hashable, valor: Any, ttl_segundos: Optional[float]) -> None:
+        # Requiere self._lock
+        ttl = self.ttl_segundos if ttl_segundos is None else ttl_segundos
+        if clave not in self._datos and len(self._datos) >= self.max_entradas:
+            # Desalojar la entrada que expira primero
+            clave_antigua = min(self._datos, key=lambda k: self._datos[k][0])
+            del self._datos[clave_antigua]
+        self._datos[clave] = (time.monotonic() + ttl, valor)
+
+    def get_or_set(self, clave: Hashable, factory: Callable[[], Any]) -> Any:
+        """
+        Obtener el valor o calcularlo con factory y guardarlo. Si el cache se
+        invalida mientras factory calcula, el resultado se retorna pero no se
+        guarda: pudo leer datos anteriores a la invalidación.
+        """
+        with self._lock:
+            generacion = self._generacion
+        valor = self.get(clave)
+        if valor is None:
+            valor = factory()
+            with self._lock:
+                if generacion == self._generacion:
+                    self._guardar(clave, valor, None)
+        return valor
+
+    def invalidate(self, clave: Optional[Hashable] = None) -> None:
+        """Invalidar una clave o todo el cache"""
+        with self._lock:
+            self._generacion += 1
+            if clave is None:
+                self._datos.clear()
+            else:
+                self._datos.pop(clave, None)
+
+    def stats(self) -> Dict[str, Any]:
+        """Estadísticas de uso del cache"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'nombre': self.nombre,
+                'entradas': len(self._datos),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / total, 4) if total else 0.0
+            }
@@ -0,0 +1,59 @@
+"""
+Lectura acotada de libros Excel para ingestión
+Usa openpyxl en modo read_only/data_only para no cargar el libro completo en memoria
+"""
+
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+import openpyxl
+import pandas as pd
+
+from utils.exceptions import ExcelProcessingError
+
+
+def leer_primera_hoja(
+    ruta: str,
+    max_columnas: int = 10,
+    max_filas: Optional[int] = None,
+    etiquetas_fin: Iterable[str] = ()
+) -> pd.DataFrame:
+    """
+    Leer la primera hoja como DataFrame sin cabecera (equivalente a
+    pd.read_excel(header=None)) limitado a una ventana de filas y columnas.
+
+    La lectura se detiene en max_filas o en cuanto la columna A contiene
+    todas las etiquetas de etiquetas_fin.
+    """
+    if Path(ruta).suffix.lower() == '.xls':
+        # openpyxl no lee el formato binario antiguo
+        df = pd.read_excel(ruta, sheet_name=0, header=None, nrows=max_filas)
+        return df.iloc[:, :max_columnas]
+
+    try:
+        wb = openpyxl.load_workbook(ruta, read_only=True, data_only=True)
+    except Exception as e:
+        raise ExcelProcessingError(f"No se pudo abrir el archivo Excel: {str(e)}")
+
+    try:
+        ws = wb.worksheets[0]
+        pendientes = set(etiquetas_fin)
+        filas: List[list] = []
+
+        for fila in ws.iter_rows(min_row=1, max_row=max_filas, max_col=max_columnas, values_only=True):
+            valores = list(fila) + [None] * (max_columnas - len(fila))
+            filas.append(valores)
+
+            if pendientes and valores[0] is not None:
+                texto = str(valores[0])
+                pendientes = {etiqueta for etiqueta in pendientes if etiqueta not in texto}
+                if not pendientes:
+                    break
+    finally:
+        wb.close()
+
+    # Igual que pandas: descartar filas vacías al final
+    while filas and all(valor is None for valor in filas[-1]):
+        filas.pop()
+
+    return pd.DataFrame(filas, columns=range(max_columnas), dtype=object)
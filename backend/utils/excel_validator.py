@@ -2,12 +2,19 @@
 Validador para archivos Excel de órdenes de trabajo
 """
 
+import os
 import pandas as pd
 from typing import Dict, List, Tuple, Any
 import re
 from datetime import datetime
 
+from utils.timing import etapa
+
 class ExcelValidator:
+    # Patrones para extraer valores del texto de una celda
+    _EXTRACCION_OT = re.compile(r'(\d{4}-\d{2}-[A-Z]{3})')
+    _EXTRACCION_RECEPCION = re.compile(r'(\d{4}-\d{2})')
+    
     def __init__(self):
         self.required_fields = {
             'orden': ['numero_ot', 'numero_recepcion'],
@@ -19,6 +26,7 @@ class ExcelValidator:
             'numero_recepcion': r'^\d{4}-\d{2}$',     # Ejemplo: 1384-25
             'codigo_muestra': r'^\d{4}-[A-Z]{2}-\d{2}$'  # Ejemplo: 4259-CO-25
         }
+        self._patrones = {campo: re.compile(patron) for campo, patron in self.field_patterns.items()}
     
     def validate_excel_file(self, file_path: str) -> Dict[str, Any]:
         """
@@ -26,38 +34,13 @@ class ExcelValidator:
         Retorna diccionario con resultado de validación
         """
         try:
-            df = pd.read_excel(file_path, sheet_name=0, header=None)
-            
-            validation_result = {
-                'is_valid': True,
-                'errors': [],
-                'warnings': [],
-                'data': {},
-                'stats': {}
-            }
-            
-            # Validar estructura básica
-            structure_errors = self._validate_structure(df)
-            validation_result['errors'].extend(structure_errors)
-            
-            # Extraer y validar datos de orden
-            orden_data, orden_errors = self._extract_and_validate_orden(df)
-            validation_result['data']['orden'] = orden_data
-            validation_result['errors'].extend(orden_errors)
-            
-            # Extraer y validar items
-            items_data, items_errors = self._extract_and_validate_items(df)
-            validation_result['data']['items'] = items_data
-            validation_result['errors'].extend(items_errors)
-            
-            # Generar estadísticas
-            validation_result['stats'] = self._generate_stats(df, items_data)
-            
-            # Determinar si es válido
-            validation_result['is_valid'] = len(validation_result['errors']) == 0
-            
+            with etapa("leer_excel"):
+                df = pd.read_excel(file_path, sheet_name=0, header=None)
+            with etapa("validar"):
+                validation_result = self.validate_dataframe(df)
+            validation_result['stats']['file_size_kb'] = round(os.path.getsize(file_path) / 1024, 2)
             return validation_result
-            
+        
         except Exception as e:
             return {
                 'is_valid': False,
@@ -67,6 +50,47 @@ class ExcelValidator:
                 'stats': {}
             }
     
+    def validate_dataframe(self, df: pd.DataFrame) -> Dict[str, Any]:
+        """Validar una hoja ya leída (sin cabecera)"""
+        validation_result = {
+            'is_valid': True,
+            'errors': [],
+            'warnings': [],
+            'data': {},
+            'stats': {}
+        }
+        
+        # Validar estructura básica
+        structure_errors = self._validate_structure(df)
+        validation_result['errors'].extend(structure_errors)
+        
+        # Extraer y validar datos de orden
+        orden_data, orden_errors = self._extract_and_validate_orden(df)
+        validation_result['data']['orden'] = orden_data
+        validation_result['errors'].extend(orden_errors)
+        
+        # Extraer y validar items
+        items_data, items_errors, items_warnings = self._extract_and_validate_items(df)
+        validation_result['data']['items'] = items_data
+        validation_result['errors'].extend(items_errors)
+        validation_result['warnings'].extend(items_warnings)
+        
+        # Generar estadísticas
+        validation_result['stats'] = self._generate_stats(df, items_data)
+        
+        # Determinar si es válido
+        validation_result['is_valid'] = len(validation_result['errors']) == 0
+        
+        return validation_result
+    
+    @staticmethod
+    def _celdas_como_texto(df: pd.DataFrame) -> pd.Series:
+        """Todas las celdas no vacías como texto, en orden fila a fila"""
+        if df.empty:
+            return pd.Series(dtype=str)
+        celdas = df.stack()
+        return celdas[celdas.notna()].astype(str).str.strip()
+    
     def _validate_structure(self, df: pd.DataFrame) -> List[str]:
         """Validar estructura básica del archivo"""
         errors = []
@@ -79,19 +103,12 @@ class ExcelValidator:
         if len(df.columns) < 8:
             errors.append('El archivo debe tener al menos 8 columnas')
         
-        # Verificar presencia de encabezados clave
+        # Verificar presencia de encabezados clave (primeras 10 filas, 5 columnas)
         required_headers = ['ORDEN DE TRABAJO', 'N° OT', 'ÍTEM']
-        found_headers = []
-        
-        for i in range(min(10, len(df))):
-            for j in range(min(5, len(df.columns))):
-                cell_value = str(df.iloc[i, j]).strip().upper()
-                for header in required_headers:
-                    if header in cell_value and header not in found_headers:
-                        found_headers.append(header)
+        encabezado = self._celdas_como_texto(df.iloc[:10, :5]).str.upper()
         
         for header in required_headers:
-            if header not in found_headers:
+            if not encabezado.str.contains(header, regex=False).any():
                 errors.append(f'No se encontró el encabezado requerido: {header}')
         
         return errors
@@ -100,115 +117,126 @@ class ExcelValidator:
         """Extraer y validar datos de la orden"""
         orden_data = {}
         errors = []
-        
-        # Buscar número OT
-        ot_found = False
-        for i in range(len(df)):
-            for j in range(len(df.columns)):
-                cell_value = str(df.iloc[i, j]).strip()
-                if 'N° OT:' in cell_value or 'N° OT' in cell_value:
-                    # Extraer número OT del texto
-                    ot_match = re.search(r'(\d{4}-\d{2}-[A-Z]{3})', cell_value)
-                    if ot_match:
-                        orden_data['numero_ot'] = ot_match.group(1)
-                        ot_found = True
-                        break
-            if ot_found:
-                break
-        
-        if not ot_found:
-            errors.append('No se encontró el número de OT en el formato correcto')
-        
-        # Buscar número de recepción
-        recepcion_found = False
-        for i in range(len(df)):
-            for j in range(len(df.columns)):
-                cell_value = str(df.iloc[i, j]).strip()
-                if 'N° RECEPCIÓN:' in cell_value or 'N° RECEPCIÓN' in cell_value:
-                    # Extraer número de recepción
-                    rec_match = re.search(r'(\d{4}-\d{2})', cell_value)
-                    if rec_match:
-                        orden_data['numero_recepcion'] = rec_match.group(1)
-                        recepcion_found = True
-                        break
-            if recepcion_found:
-                break
-        
-        if not recepcion_found:
-            errors.append('No se encontró el número de recepción en el formato correcto')
+        celdas = self._celdas_como_texto(df)
+        
+        # Buscar número OT y número de recepción (primera celda con formato válido)
+        busquedas = (
+            ('numero_ot', 'N° OT', self._EXTRACCION_OT,
+             'No se encontró el número de OT en el formato correcto'),
+            ('numero_recepcion', 'N° RECEPCIÓN', self._EXTRACCION_RECEPCION,
+             'No se encontró el número de recepción en el formato correcto'),
+        )
+        for campo, etiqueta, patron, mensaje in busquedas:
+            candidatas = celdas[celdas.str.contains(etiqueta, regex=False)]
+            valores = candidatas.str.extract(patron, expand=False).dropna()
+            if valores.empty:
+                errors.append(mensaje)
+            else:
+                orden_data[campo] = valores.iloc[0]
         
         # Validar formatos
         if 'numero_ot' in orden_data:
-            if not re.match(self.field_patterns['numero_ot'], orden_data['numero_ot']):
+            if not self._patrones['numero_ot'].match(orden_data['numero_ot']):
                 errors.append(f'Formato de número OT inválido: {orden_data["numero_ot"]}')
         
         if 'numero_recepcion' in orden_data:
-            if not re.match(self.field_patterns['numero_recepcion'], orden_data['numero_recepcion']):
+            if not self._patrones['numero_recepcion'].match(orden_data['numero_recepcion']):
                 errors.append(f'Formato de número de recepción inválido: {orden_data["numero_recepcion"]}')
         
         return orden_data, errors
     
-    def _extract_and_validate_items(self, df: pd.DataFrame) -> Tuple[List[Dict[str, Any]], List[str]]:
+    def _extract_and_validate_items(self, df: pd.DataFrame) -> Tuple[List[Dict[str, Any]], List[str], List[str]]:
         """Extraer y validar items de la orden"""
-        items = []
         errors = []
+        warnings = []
         
         # Buscar sección de items (desde fila 8 hasta encontrar fechas)
         start_row = 8
-        end_row = len(df)
-        
-        for i in range(start_row, len(df)):
-            if pd.notna(df.iloc[i, 0]) and "FECHA DE RECEPCIÓN" in str(df.iloc[i, 0]):
-                end_row = i
-                break
-        
-        # Procesar items
-        for i in range(start_row, end_row):
-            if (pd.notna(df.iloc[i, 0]) and 
-                str(df.iloc[i, 0]).strip().isdigit() and
-                pd.notna(df.iloc[i, 1]) and 
-                str(df.iloc[i, 1]).strip()):
-                
-                item_data = {
-                    'item_numero': int(df.iloc[i, 0]),
-                    'codigo_muestra': str(df.iloc[i, 1]).strip(),
-                    'descripcion': str(df.iloc[i, 3]).strip() if pd.notna(df.iloc[i, 3]) else "",
-                    'cantidad': int(df.iloc[i, 7]) if pd.notna(df.iloc[i, 7]) else 1,
-                    'especificacion': str(df.iloc[i, 8]).strip() if pd.notna(df.iloc[i, 8]) else ""
-                }
-                
-                # Validar item
-                item_errors = self._validate_item(item_data)
-                if item_errors:
-                    errors.extend([f"Item {item_data['item_numero']}: {error}" for error in item_errors])
-                else:
-                    items.append(item_data)
+        columna_a = df.iloc[start_row:, 0].dropna().astype(str) if len(df.columns) else pd.Series(dtype=str)
+        filas_fecha = columna_a.index[columna_a.str.contains("FECHA DE RECEPCIÓN", regex=False)]
+        end_row = int(filas_fecha[0]) if len(filas_fecha) else len(df)
+        
+        bloque = df.iloc[start_row:end_row].reindex(columns=range(9))
+        numeros = bloque[0].astype(str).str.strip()
+        codigos = bloque[1].astype(str).str.strip()
+        bloque = bloque[
+            bloque[0].notna() & numeros.str.fullmatch(r'\d+') &
+            bloque[1].notna() & (codigos != '')
+        ]
+        
+        if bloque.empty:
+            errors.append('No se encontraron items válidos en la orden')
+            return [], errors, warnings
+        
+        def texto(columna: int) -> pd.Series:
+            serie = bloque[columna]
+            return serie.where(serie.notna(), '').astype(str).str.strip()
+        
+        # Cantidad: vacía = 1, no numérica o no entera queda como inválida
+        cantidad_bruta = pd.to_numeric(bloque[7], errors='coerce')
+        cantidad_entera = cantidad_bruta.notna() & (cantidad_bruta % 1 == 0)
+        cantidad = cantidad_bruta.where(bloque[7].notna(), 1)
+        
+        columnas = pd.DataFrame({
+            'item_numero': numeros[bloque.index].astype(int),
+            'codigo_muestra': codigos[bloque.index],
+            'descripcion': texto(3),
+            'cantidad': cantidad,
+            'especificacion': texto(8)
+        })
+        
+        # Validaciones por columna completa
+        faltantes = {
+            'item_numero': columnas['item_numero'] == 0,
+            'codigo_muestra': columnas['codigo_muestra'] == '',
+            'descripcion': columnas['descripcion'] == '',
+            'cantidad': columnas['cantidad'].isna() | (columnas['cantidad'] == 0),
+        }
+        codigo_invalido = ~columnas['codigo_muestra'].str.match(self._patrones['codigo_muestra'])
+        cantidad_invalida = bloque[7].notna() & (~cantidad_entera | (cantidad_bruta <= 0))
+        
+        con_error = codigo_invalido | cantidad_invalida
+        for mascara in faltantes.values():
+            con_error |= mascara
+        
+        # Solo se recorren las filas con error para armar los mensajes
+        for idx in columnas.index[con_error]:
+            item_numero = columnas.at[idx, 'item_numero']
+            for campo in self.required_fields['items']:
+                if faltantes[campo].at[idx]:
+                    errors.append(f'Item {item_numero}: Campo requerido faltante: {campo}')
+            if codigo_invalido.at[idx]:
+                errors.append(f'Item {item_numero}: Formato de código de muestra inválido: {columnas.at[idx, "codigo_muestra"]}')
+            if cantidad_invalida.at[idx]:
+                valor = bloque.at[idx, 7]
+                if isinstance(valor, float) and valor.is_integer():
+                    valor = int(valor)
+                errors.append(f'Item {item_numero}: Cantidad debe ser un número entero positivo: {valor}')
+        
+        validos = columnas[~con_error].copy()
+        validos['cantidad'] = validos['cantidad'].astype(int)
+        
+        # Advertencias: duplicados dentro del mismo archivo
+        for campo, nombre in (('item_numero', 'número de item'), ('codigo_muestra', 'código de muestra')):
+            duplicados = columnas.loc[columnas[campo].duplicated(), campo].unique()
+            for valor in duplicados:
+                warnings.append(f'El {nombre} {valor} está repetido')
+        
+        items = [
+            {
+                'item_numero': int(fila.item_numero),
+                'codigo_muestra': fila.codigo_muestra,
+                'descripcion': fila.descripcion,
+                'cantidad': int(fila.cantidad),
+                'especificacion': fila.especificacion
+            }
+            for fila in validos.itertuples(index=False)
+        ]
         
         if not items:
             errors.append('No se encontraron items válidos en la orden')
         
-        return items, errors
-    
-    def _validate_item(self, item: Dict[str, Any]) -> List[str]:
-        """Validar un item individual"""
-        errors = []
-        
-        # Validar campos requeridos
-        for field in self.required_fields['items']:
-            if field not in item or not item[field]:
-                errors.append(f'Campo requerido faltante: {field}')
-        
-        # Validar formato de código de muestra
-        if 'codigo_muestra' in item:
-            if not re.match(self.field_patterns['codigo_muestra'], item['codigo_muestra']):
-                errors.append(f'Formato de código de muestra inválido: {item["codigo_muestra"]}')
-        
-        # Validar cantidad
-        if 'cantidad' in item:
-            if not isinstance(item['cantidad'], int) or item['cantidad'] <= 0:
-                errors.append(f'Cantidad debe ser un número entero positivo: {item["cantidad"]}')
-        
-        return errors
+        return items, errors, warnings
     
     def _generate_stats(self, df: pd.DataFrame, items: List[Dict[str, Any]]) -> Dict[str, Any]:
         """Generar estadísticas del archivo"""
@@ -217,6 +245,6 @@ class ExcelValidator:
             'total_columns': len(df.columns),
             'total_items': len(items),
             'total_cantidad': sum(item.get('cantidad', 0) for item in items),
-            'file_size_kb': 0,  # Se calculará en el servicio principal
+            'file_size_kb': 0,  # Se calculará en validate_excel_file
             'validation_timestamp': datetime.now().isoformat()
         }
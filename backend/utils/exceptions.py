@@ -52,3 +52,8 @@ class RecepcionNotFoundError(BaseAppException):
 class DuplicateRecepcionError(BaseAppException):
     """Error cuando se intenta crear una recepción duplicada"""
     pass
+
+
+class FileTooLargeError(FileProcessingError):
+    """Error cuando un archivo supera el tamaño máximo permitido"""
+    pass
@@ -3,13 +3,185 @@ Manejador de archivos para el sistema
 """
 
 import os
+import re
 import shutil
 import tempfile
 from pathlib import Path
-from typing import Optional, List
+from typing import Optional, List, Pattern, Tuple
 import uuid
+import zipfile
 from datetime import datetime
 
+from fastapi import HTTPException, UploadFile
+from fastapi.responses import JSONResponse
+
+from config import settings
+from utils.exceptions import FileTooLargeError
+
+
+# Rutas de carga de archivos y el setting con el tope de su cuerpo: (método, patrón de ruta, setting)
+_LIMITES_CUERPO: List[Tuple[str, Pattern, str]] = [
+    ("POST", re.compile(r"^/api/excel/bulk-upload$"), "bulk_upload_max_request_size"),
+    ("POST", re.compile(r"^/api/excel/(upload|validate)$"), "max_request_size"),
+    ("POST", re.compile(r"^/api/verificacion/importar-excel$"), "max_request_size"),
+]
+
+
+def limite_cuerpo(metodo: str, ruta: str) -> Optional[int]:
+    """Tope en bytes del cuerpo de la petición (None si la ruta no recibe archivos)"""
+    for metodo_ruta, patron, setting in _LIMITES_CUERPO:
+        if metodo == metodo_ruta and patron.match(ruta):
+            return getattr(settings, setting)
+    return None
+
+
+def _mensaje_limite(max_bytes: int) -> str:
+    return f"La petición supera el tamaño máximo de {max_bytes / (1024 * 1024):.1f} MB"
+
+
+class LimiteCuerpoMiddleware:
+    """
+    Middleware ASGI: limita el cuerpo de las cargas de archivos mientras se
+    recibe, antes de que Starlette lo vuelque completo al parsear el multipart.
+    Rechaza con 413 por Content-Length sin leer nada y, si el cuerpo llega sin
+    largo declarado (o miente), corta la lectura en cuanto supera el tope.
+    """
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        max_bytes = limite_cuerpo(scope["method"], scope["path"]) if scope["type"] == "http" else None
+        if max_bytes is None:
+            await self.app(scope, receive, send)
+            return
+        
+        declarado = dict(scope["headers"]).get(b"content-length")
+        if declarado is not None and declarado.isdigit() and int(declarado) > max_bytes:
+            respuesta = JSONResponse(status_code=413, content={"detail": _mensaje_limite(max_bytes)})
+            await respuesta(scope, receive, send)
+            return
+        
+        recibidos = 0
+        
+        async def recibir_limitado():
+            nonlocal recibidos
+            mensaje = await receive()
+            if mensaje["type"] == "http.request":
+                recibidos += len(mensaje.get("body", b""))
+                if recibidos > max_bytes:
+                    # FastAPI propaga las HTTPException que surgen al leer el formulario
+                    raise HTTPException(status_code=413, detail=_mensaje_limite(max_bytes))
+            return mensaje
+        
+        await self.app(scope, recibir_limitado, send)
+
+
+async def volcar_upload_a_disco(
+    upload: UploadFile,
+    max_bytes: int,
+    chunk_size: int = 1024 * 1024,
+    directorio: Optional[str] = None
+) -> str:
+    """
+    Copiar un archivo subido a un temporal con nombre (los lectores de Excel
+    reciben una ruta) y verificar el tope por archivo. Starlette ya recibió el
+    cuerpo completo en un SpooledTemporaryFile al parsear el formulario: el
+    tope de la petición mientras se recibe lo aplica LimiteCuerpoMiddleware.
+    Retorna la ruta del temporal.
+    """
+    if upload.size is not None and upload.size > max_bytes:
+        raise FileTooLargeError(
+            f"El archivo supera el tamaño máximo de {max_bytes / (1024 * 1024):.1f} MB",
+            details={'max_bytes': max_bytes, 'size': upload.size}
+        )
+
+    suffix = Path(upload.filename or '').suffix
+    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=suffix, dir=directorio)
+    total = 0
+    try:
+        with temp_file:
+            while True:
+                bloque = await upload.read(chunk_size)
+                if not bloque:
+                    break
+                total += len(bloque)
+                if total > max_bytes:
+                    raise FileTooLargeError(
+                        f"El archivo supera el tamaño máximo de {max_bytes / (1024 * 1024):.1f} MB",
+                        details={'max_bytes': max_bytes}
+                    )
+                temp_file.write(bloque)
+    except BaseException:
+        os.unlink(temp_file.name)
+        raise
+
+    return temp_file.name
+
+
+def _copiar_con_limite(origen, destino, max_bytes: int) -> int:
+    """Copiar por bloques hasta max_bytes + 1 (el tamaño declarado en el ZIP puede mentir); retorna lo copiado"""
+    copiados = 0
+    while copiados <= max_bytes:
+        bloque = origen.read(min(1024 * 1024, max_bytes + 1 - copiados))
+        if not bloque:
+            break
+        destino.write(bloque)
+        copiados += len(bloque)
+    return copiados
+
+
+def extraer_excels_de_zip(
+    ruta_zip: str,
+    destino: str,
+    max_bytes_por_archivo: int,
+    max_entradas: int,
+    max_bytes_total: int
+) -> List[dict]:
+    """
+    Extraer los archivos Excel de un ZIP a destino.
+    Retorna una entrada por archivo con 'archivo' y 'ruta' o 'error'.
+    Un ZIP con más de max_entradas entradas o que descomprime más de
+    max_bytes_total en total se rechaza completo (FileTooLargeError).
+    """
+    entradas = []
+    total = 0
+    with zipfile.ZipFile(ruta_zip) as zf:
+        infos = zf.infolist()
+        if len(infos) > max_entradas:
+            raise FileTooLargeError(
+                f"El ZIP tiene {len(infos)} entradas (máximo {max_entradas})",
+                details={'entradas': len(infos), 'max_entradas': max_entradas}
+            )
+        for indice, info in enumerate(infos):
+            nombre = info.filename
+            if info.is_dir() or nombre.startswith('__MACOSX/') or Path(nombre).name.startswith('~$'):
+                continue
+            if Path(nombre).suffix.lower() not in ('.xlsx', '.xls'):
+                continue
+            if info.file_size > max_bytes_por_archivo:
+                entradas.append({'archivo': nombre, 'error': "El archivo supera el tamaño máximo permitido"})
+                continue
+            
+            # Nombre plano para evitar rutas fuera de destino
+            ruta = Path(destino) / f"{indice:05d}{Path(nombre).suffix.lower()}"
+            with zf.open(info) as origen, open(ruta, 'wb') as salida:
+                copiados = _copiar_con_limite(origen, salida, min(max_bytes_por_archivo, max_bytes_total - total))
+            total += copiados
+            if total > max_bytes_total:
+                raise FileTooLargeError(
+                    f"El ZIP descomprime más de {max_bytes_total / (1024 * 1024):.1f} MB",
+                    details={'max_bytes_total': max_bytes_total}
+                )
+            if copiados > max_bytes_por_archivo:
+                ruta.unlink()
+                entradas.append({'archivo': nombre, 'error': "El archivo supera el tamaño máximo permitido"})
+                continue
+            entradas.append({'archivo': nombre, 'ruta': str(ruta)})
+    
+    return entradas
+
+
 class FileHandler:
     def __init__(self, base_path: str = "uploads"):
         self.base_path = Path(base_path)
@@ -0,0 +1,332 @@
+"""
+Cola de trabajos en segundo plano con almacenamiento intercambiable:
+memoria (un solo proceso), SQLite (varios procesos en la misma máquina) o Redis
+
+Un trabajo en PROCESANDO tiene un vencimiento: quien lo ejecuta lo renueva
+periódicamente y, si deja de hacerlo (el proceso o el hilo murió), cualquier
+consumidor lo vuelve a encolar, hasta max_intentos veces antes de darlo por
+fallido.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Any, Dict, Optional
+
+from config import settings
+
+# Estados de un trabajo
+EN_COLA = "en_cola"
+PROCESANDO = "procesando"
+COMPLETADO = "completado"
+ERROR = "error"
+
+
+def nuevo_trabajo(tipo: str, parametros: Dict[str, Any]) -> Dict[str, Any]:
+    ahora = time.time()
+    return {
+        'id': uuid.uuid4().hex,
+        'tipo': tipo,
+        'parametros': parametros,
+        'estado': EN_COLA,
+        'progreso': 0,
+        'mensaje': None,
+        'resultado': None,
+        'nombre_archivo': None,
+        'intentos': 0,
+        'creado': ahora,
+        'actualizado': ahora
+    }
+
+
+def _reclamar(trabajo: Dict[str, Any], max_intentos: int) -> Dict[str, Any]:
+    """Estado de un trabajo PROCESANDO vencido: de nuevo en cola o, agotados los intentos, con error"""
+    if trabajo.get('intentos', 0) >= max_intentos:
+        trabajo.update(estado=ERROR, mensaje=f"El trabajo se interrumpió {trabajo['intentos']} veces")
+    else:
+        trabajo.update(estado=EN_COLA, progreso=0)
+    trabajo['actualizado'] = time.time()
+    return trabajo
+
+
+class JobStore(ABC):
+    """
+    Interfaz del almacenamiento de trabajos. Los trabajos son diccionarios
+    serializables a JSON; tomar_siguiente reclama de forma atómica el trabajo
+    en cola más antiguo y lo pasa a PROCESANDO. actualizar (también sin campos,
+    como renovación) extiende el vencimiento del trabajo en curso.
+    """
+    
+    def __init__(self, ttl_segundos: float, vencimiento_segundos: float = 120.0, max_intentos: int = 3):
+        self.ttl_segundos = ttl_segundos
+        self.vencimiento_segundos = vencimiento_segundos
+        self.max_intentos = max_intentos
+    
+    @abstractmethod
+    def crear(self, tipo: str, parametros: Dict[str, Any]) -> Dict[str, Any]:
+        """Crear un trabajo EN_COLA y retornarlo"""
+    
+    @abstractmethod
+    def obtener(self, trabajo_id: str) -> Optional[Dict[str, Any]]:
+        """Trabajo por id (None si no existe o expiró)"""
+    
+    @abstractmethod
+    def actualizar(self, trabajo_id: str, **campos) -> None:
+        """Actualizar campos del trabajo y su marca de tiempo"""
+    
+    @abstractmethod
+    def tomar_siguiente(self) -> Optional[Dict[str, Any]]:
+        """Reclamar el trabajo en cola más antiguo (pasa a PROCESANDO e incrementa sus intentos)"""
+    
+    @abstractmethod
+    def reencolar_vencidos(self) -> int:
+        """Volver a encolar (o dar por fallidos) los trabajos PROCESANDO no renovados a tiempo; retorna cuántos"""
+    
+    def renovar(self, trabajo_id: str) -> None:
+        """Extender el vencimiento de un trabajo en curso"""
+        self.actualizar(trabajo_id)
+
+
+class MemoryJobStore(JobStore):
+    """Trabajos en memoria del proceso; se pierden al reiniciar"""
+    
+    def __init__(self, ttl_segundos: float, **opciones):
+        super().__init__(ttl_segundos, **opciones)
+        self._trabajos: Dict[str, Dict[str, Any]] = {}
+        self._cola: deque = deque()
+        self._lock = threading.Lock()
+    
+    def crear(self, tipo: str, parametros: Dict[str, Any]) -> Dict[str, Any]:
+        trabajo = nuevo_trabajo(tipo, parametros)
+        with self._lock:
+            self._purgar()
+            self._trabajos[trabajo['id']] = trabajo
+            self._cola.append(trabajo['id'])
+            return dict(trabajo)
+    
+    def obtener(self, trabajo_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            trabajo = self._trabajos.get(trabajo_id)
+            return dict(trabajo) if trabajo else None
+    
+    def actualizar(self, trabajo_id: str, **campos) -> None:
+        with self._lock:
+            if trabajo_id in self._trabajos:
+                self._trabajos[trabajo_id].update(campos, actualizado=time.time())
+    
+    def tomar_siguiente(self) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            while self._cola:
+                trabajo = self._trabajos.get(self._cola.popleft())
+                if trabajo and trabajo['estado'] == EN_COLA:
+                    trabajo.update(estado=PROCESANDO, intentos=trabajo.get('intentos', 0) + 1, actualizado=time.time())
+                    return dict(trabajo)
+            return None
+    
+    def reencolar_vencidos(self) -> int:
+        limite = time.time() - self.vencimiento_segundos
+        with self._lock:
+            vencidos = [
+                t for t in self._trabajos.values() if t['estado'] == PROCESANDO and t['actualizado'] < limite
+            ]
+            for trabajo in vencidos:
+                if _reclamar(trabajo, self.max_intentos)['estado'] == EN_COLA:
+                    self._cola.append(trabajo['id'])
+            return len(vencidos)
+    
+    def _purgar(self) -> None:
+        limite = time.time() - self.ttl_segundos
+        for trabajo_id in [t['id'] for t in self._trabajos.values() if t['actualizado'] < limite]:
+            del self._trabajos[trabajo_id]
+
+
+class SQLiteJobStore(JobStore):
+    """Trabajos en un archivo SQLite, compartido por los procesos de la misma máquina"""
+    
+    def __init__(self, ruta: str, ttl_segundos: float, **opciones):
+        super().__init__(ttl_segundos, **opciones)
+        self.ruta = ruta
+        conn = self._conectar()
+        try:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS trabajos ("
+                "id TEXT PRIMARY KEY, estado TEXT NOT NULL, creado REAL NOT NULL, "
+                "actualizado REAL NOT NULL, datos TEXT NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_trabajos_estado ON trabajos (estado, creado)")
+        finally:
+            conn.close()
+    
+    def _conectar(self) -> sqlite3.Connection:
+        # isolation_level=None: las transacciones se abren explícitamente con BEGIN IMMEDIATE
+        conn = sqlite3.connect(self.ruta, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+    
+    def crear(self, tipo: str, parametros: Dict[str, Any]) -> Dict[str, Any]:
+        trabajo = nuevo_trabajo(tipo, parametros)
+        conn = self._conectar()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM trabajos WHERE actualizado < ?", (time.time() - self.ttl_segundos,))
+            conn.execute(
+                "INSERT INTO trabajos (id, estado, creado, actualizado, datos) VALUES (?, ?, ?, ?, ?)",
+                (trabajo['id'], trabajo['estado'], trabajo['creado'], trabajo['actualizado'], json.dumps(trabajo))
+            )
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+        return trabajo
+    
+    def obtener(self, trabajo_id: str) -> Optional[Dict[str, Any]]:
+        conn = self._conectar()
+        try:
+            fila = conn.execute("SELECT datos FROM trabajos WHERE id = ?", (trabajo_id,)).fetchone()
+        finally:
+            conn.close()
+        return json.loads(fila[0]) if fila else None
+    
+    def actualizar(self, trabajo_id: str, **campos) -> None:
+        conn = self._conectar()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            fila = conn.execute("SELECT datos FROM trabajos WHERE id = ?", (trabajo_id,)).fetchone()
+            if fila:
+                trabajo = json.loads(fila[0])
+                trabajo.update(campos, actualizado=time.time())
+                self._guardar(conn, trabajo)
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+    
+    def tomar_siguiente(self) -> Optional[Dict[str, Any]]:
+        conn = self._conectar()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            fila = conn.execute(
+                "SELECT id, datos FROM trabajos WHERE estado = ? ORDER BY creado LIMIT 1", (EN_COLA,)
+            ).fetchone()
+            trabajo = None
+            if fila:
+                trabajo = json.loads(fila[1])
+                trabajo.update(estado=PROCESANDO, intentos=trabajo.get('intentos', 0) + 1, actualizado=time.time())
+                self._guardar(conn, trabajo)
+            conn.execute("COMMIT")
+            return trabajo
+        finally:
+            conn.close()
+    
+    def reencolar_vencidos(self) -> int:
+        conn = self._conectar()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            filas = conn.execute(
+                "SELECT datos FROM trabajos WHERE estado = ? AND actualizado < ?",
+                (PROCESANDO, time.time() - self.vencimiento_segundos)
+            ).fetchall()
+            for (datos,) in filas:
+                self._guardar(conn, _reclamar(json.loads(datos), self.max_intentos))
+            conn.execute("COMMIT")
+            return len(filas)
+        finally:
+            conn.close()
+    
+    @staticmethod
+    def _guardar(conn: sqlite3.Connection, trabajo: Dict[str, Any]) -> None:
+        conn.execute(
+            "UPDATE trabajos SET estado = ?, actualizado = ?, datos = ? WHERE id = ?",
+            (trabajo['estado'], trabajo['actualizado'], json.dumps(trabajo), trabajo['id'])
+        )
+
+
+class RedisJobStore(JobStore):
+    """
+    Trabajos en Redis (una clave por trabajo con expiración y una lista como cola).
+    Los trabajos en curso están además en un sorted set con su última renovación
+    como score, para encontrar los vencidos sin recorrer todas las claves.
+    Con la URL ``fakeredis://`` usa fakeredis, un Redis en memoria para pruebas locales.
+    """
+    
+    PREFIJO = "labexcel:trabajos"
+    
+    def __init__(self, url: str, ttl_segundos: float, **opciones):
+        super().__init__(ttl_segundos, **opciones)
+        if url.startswith("fakeredis://"):
+            import fakeredis
+            self.redis = fakeredis.FakeRedis()
+        else:
+            import redis
+            self.redis = redis.Redis.from_url(url)
+        self._cola = f"{self.PREFIJO}:cola"
+        self._en_curso = f"{self.PREFIJO}:procesando"
+    
+    def _clave(self, trabajo_id: str) -> str:
+        return f"{self.PREFIJO}:{trabajo_id}"
+    
+    def _guardar(self, trabajo: Dict[str, Any]) -> None:
+        self.redis.set(self._clave(trabajo['id']), json.dumps(trabajo), ex=int(self.ttl_segundos))
+        if trabajo['estado'] == PROCESANDO:
+            self.redis.zadd(self._en_curso, {trabajo['id']: trabajo['actualizado']})
+        else:
+            self.redis.zrem(self._en_curso, trabajo['id'])
+    
+    def crear(self, tipo: str, parametros: Dict[str, Any]) -> Dict[str, Any]:
+        trabajo = nuevo_trabajo(tipo, parametros)
+        self._guardar(trabajo)
+        self.redis.lpush(self._cola, trabajo['id'])
+        return trabajo
+    
+    def obtener(self, trabajo_id: str) -> Optional[Dict[str, Any]]:
+        datos = self.redis.get(self._clave(trabajo_id))
+        return json.loads(datos) if datos else None
+    
+    def actualizar(self, trabajo_id: str, **campos) -> None:
+        # Cada trabajo lo actualiza solo el proceso que lo tomó
+        trabajo = self.obtener(trabajo_id)
+        if trabajo:
+            trabajo.update(campos, actualizado=time.time())
+            self._guardar(trabajo)
+    
+    def tomar_siguiente(self) -> Optional[Dict[str, Any]]:
+        # RPOP es atómico: cada id lo recibe un solo consumidor
+        while True:
+            trabajo_id = self.redis.rpop(self._cola)
+            if trabajo_id is None:
+                return None
+            trabajo = self.obtener(trabajo_id.decode() if isinstance(trabajo_id, bytes) else trabajo_id)
+            if trabajo and trabajo['estado'] == EN_COLA:
+                trabajo.update(estado=PROCESANDO, intentos=trabajo.get('intentos', 0) + 1, actualizado=time.time())
+                self._guardar(trabajo)
+                return trabajo
+    
+    def reencolar_vencidos(self) -> int:
+        reclamados = 0
+        for trabajo_id in self.redis.zrangebyscore(self._en_curso, "-inf", time.time() - self.vencimiento_segundos):
+            # ZREM es atómico: solo un consumidor reclama cada trabajo vencido
+            if not self.redis.zrem(self._en_curso, trabajo_id):
+                continue
+            trabajo = self.obtener(trabajo_id.decode() if isinstance(trabajo_id, bytes) else trabajo_id)
+            if not trabajo or trabajo['estado'] != PROCESANDO:
+                continue
+            self._guardar(_reclamar(trabajo, self.max_intentos))
+            if trabajo['estado'] == EN_COLA:
+                self.redis.lpush(self._cola, trabajo['id'])
+            reclamados += 1
+        return reclamados
+
+
+def crear_job_store() -> JobStore:
+    """Almacenamiento de trabajos según settings.job_backend"""
+    backend = settings.job_backend.lower()
+    opciones = {'vencimiento_segundos': settings.job_lease_seconds, 'max_intentos': settings.job_max_attempts}
+    if backend == "memory":
+        return MemoryJobStore(settings.job_ttl, **opciones)
+    if backend == "sqlite":
+        return SQLiteJobStore(settings.job_sqlite_path, settings.job_ttl, **opciones)
+    if backend == "redis":
+        return RedisJobStore(settings.redis_url, settings.job_ttl, **opciones)
+    raise ValueError(f"job_backend no soportado: {settings.job_backend}")
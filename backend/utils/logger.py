@@ -1,45 +1,222 @@
 """
 Sistema de logging centralizado
+
+Los loggers de la aplicación (y los de los módulos con logging.getLogger(__name__))
+propagan al logger raíz, que solo encola cada registro (QueueHandler); un hilo en
+segundo plano (QueueListener) los formatea y escribe en stdout y en el archivo de
+log, de modo que ninguna petición espera por la salida. Cada registro lleva el
+request_id de la petición en curso.
 """
+import atexit
+import json
 import logging
+import logging.handlers
+import os
+import queue
+import re
 import sys
-from typing import Optional
+import threading
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Dict, Hashable, List, Optional
+
 from config import settings
 
+# Id de la petición en curso ("-" fuera de una petición)
+request_id_actual: ContextVar[str] = ContextVar("request_id", default="-")
+
+# Ids de petición aceptados desde el header X-Request-ID
+_REQUEST_ID_VALIDO = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+# Mensajes distintos con conteo de muestreo antes de reiniciar los contadores
+MAX_CLAVES_MUESTREO = 10000
+
+
+class FiltroContexto(logging.Filter):
+    """Agrega el request_id al registro; corre en el hilo que registra, antes de encolar"""
+    
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_actual.get()
+        return True
+
+
+class FiltroMuestreo(logging.Filter):
+    """
+    Deja pasar 1 de cada ``cada`` registros DEBUG por logger y mensaje (la
+    plantilla sin formatear, por lo que los mensajes con argumentos %s de un
+    mismo bucle comparten contador); los demás niveles pasan siempre
+    """
+    
+    def __init__(self, cada: int):
+        super().__init__()
+        self.cada = cada
+        self._conteos: Dict[Hashable, int] = {}
+        self._lock = threading.Lock()
+    
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG or self.cada <= 1:
+            return True
+        clave = (record.name, record.msg)
+        with self._lock:
+            if len(self._conteos) >= MAX_CLAVES_MUESTREO:
+                self._conteos.clear()
+            conteo = self._conteos.get(clave, 0)
+            self._conteos[clave] = conteo + 1
+        return conteo % self.cada == 0
+
+
+class FormatterJSON(logging.Formatter):
+    """Un objeto JSON por línea, para agregadores de logs"""
+    
+    def format(self, record: logging.LogRecord) -> str:
+        datos = {
+            'timestamp': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'nivel': record.levelname,
+            'logger': record.name,
+            'mensaje': record.getMessage(),
+            'request_id': getattr(record, 'request_id', '-'),
+        }
+        if record.exc_info:
+            datos['excepcion'] = self.formatException(record.exc_info)
+        return json.dumps(datos, ensure_ascii=False, default=str)
+
+
+class ColaNoBloqueante(logging.handlers.QueueHandler):
+    """QueueHandler con cola acotada: si está llena descarta el registro en lugar de bloquear"""
+    
+    def __init__(self, cola: queue.Queue):
+        super().__init__(cola)
+        self.descartados = 0
+    
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.descartados += 1
+
 
 class Logger:
     """Logger centralizado para la aplicación"""
     
     _loggers = {}
+    _handler_cola: Optional[ColaNoBloqueante] = None
+    _listener: Optional[logging.handlers.QueueListener] = None
+    _salidas: List[logging.Handler] = []
+    
+    @classmethod
+    def _formatter(cls) -> logging.Formatter:
+        return FormatterJSON() if settings.log_json else logging.Formatter(settings.log_format)
+    
+    @classmethod
+    def configurar(cls) -> None:
+        """Encolar los registros del logger raíz y escribirlos desde el hilo de salida (una sola vez)"""
+        if cls._handler_cola is not None:
+            return
+        
+        salida = logging.StreamHandler(sys.stdout)
+        salida.setFormatter(cls._formatter())
+        cls._salidas = [salida]
+        
+        cls._handler_cola = ColaNoBloqueante(queue.Queue(maxsize=settings.log_queue_size))
+        cls._handler_cola.addFilter(FiltroContexto())
+        cls._handler_cola.addFilter(FiltroMuestreo(settings.log_debug_sample_rate))
+        
+        raiz = logging.getLogger()
+        raiz.setLevel(getattr(logging, settings.log_level.upper()))
+        raiz.addHandler(cls._handler_cola)
+        cls._iniciar_listener()
+        atexit.register(cls.detener)
+        # Los procesos del pool se crean con fork: heredan la cola pero no el hilo de salida
+        os.register_at_fork(after_in_child=cls._reiniciar_en_hijo)
+    
+    @classmethod
+    def _iniciar_listener(cls) -> None:
+        cls._listener = logging.handlers.QueueListener(
+            cls._handler_cola.queue, *cls._salidas, respect_handler_level=True
+        )
+        cls._listener.start()
+    
+    @classmethod
+    def _reiniciar_en_hijo(cls) -> None:
+        # El proceso hijo atiende tareas de muchas peticiones: no hereda el id de la que lo creó
+        request_id_actual.set("-")
+        if cls._handler_cola is not None:
+            cls._handler_cola.queue = queue.Queue(maxsize=settings.log_queue_size)
+            cls._iniciar_listener()
+    
+    @classmethod
+    def detener(cls) -> None:
+        """Escribir los registros pendientes y detener el hilo de salida"""
+        if cls._listener is not None and cls._listener._thread is not None:
+            cls._listener.stop()
     
     @classmethod
     def get_logger(cls, name: str) -> logging.Logger:
         """Obtener o crear un logger"""
         if name not in cls._loggers:
+            cls.configurar()
             logger = logging.getLogger(name)
             logger.setLevel(getattr(logging, settings.log_level.upper()))
-            
-            # Evitar duplicar handlers
-            if not logger.handlers:
-                handler = logging.StreamHandler(sys.stdout)
-                formatter = logging.Formatter(settings.log_format)
-                handler.setFormatter(formatter)
-                logger.addHandler(handler)
-            
             cls._loggers[name] = logger
         
         return cls._loggers[name]
     
     @classmethod
     def setup_file_logging(cls, log_file: str = "app.log"):
-        """Configurar logging a archivo"""
+        """Configurar logging a archivo (también desde el hilo de salida)"""
+        cls.configurar()
         file_handler = logging.FileHandler(log_file)
-        formatter = logging.Formatter(settings.log_format)
-        file_handler.setFormatter(formatter)
+        file_handler.setFormatter(cls._formatter())
+        cls._salidas.append(file_handler)
+        
+        cls.detener()
+        cls._iniciar_listener()
+    
+    @classmethod
+    def stats(cls) -> Dict[str, int]:
+        """Registros en cola y descartados por cola llena"""
+        if cls._handler_cola is None:
+            return {'en_cola': 0, 'descartados': 0}
+        return {'en_cola': cls._handler_cola.queue.qsize(), 'descartados': cls._handler_cola.descartados}
+
+
+def request_id_de_header(valor: Optional[bytes]) -> str:
+    """Usar el X-Request-ID recibido si es válido o generar uno nuevo"""
+    if valor:
+        texto = valor.decode("latin-1")
+        if _REQUEST_ID_VALIDO.match(texto):
+            return texto
+    return uuid.uuid4().hex[:16]
+
+
+class RequestIdMiddleware:
+    """
+    Middleware ASGI: asigna a cada petición un id (el del header X-Request-ID o
+    uno nuevo), lo deja en el contexto para los registros de log y lo devuelve
+    en la respuesta
+    """
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        request_id = request_id_de_header(dict(scope["headers"]).get(b"x-request-id"))
+        
+        async def enviar(mensaje):
+            if mensaje["type"] == "http.response.start":
+                mensaje = dict(mensaje, headers=[*mensaje.get("headers", []), (b"x-request-id", request_id.encode())])
+            await send(mensaje)
         
-        # Agregar a todos los loggers existentes
-        for logger in cls._loggers.values():
-            logger.addHandler(file_handler)
+        token = request_id_actual.set(request_id)
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            request_id_actual.reset(token)
 
 
 # Loggers específicos
@@ -0,0 +1,254 @@
+"""
+Métricas del proceso en el formato de texto de Prometheus (GET /metrics)
+
+La latencia de cada petición se acumula en un histograma por método, plantilla
+de ruta (/api/ot/{ot_id}, no la ruta concreta, para acotar las series) y
+código de estado. El resto (pool de conexiones, caches, control de admisión,
+etapas de generación) se lee de sus propios contadores al momento de exportar,
+mediante recolectores registrados al iniciar la aplicación.
+"""
+
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+
+from config import settings
+from utils.logger import Logger, api_logger
+from utils.timing import Histograma, registro_etapas
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+PREFIJO = "labexcel"
+
+# Etiqueta de ruta para las peticiones que no coinciden con ningún endpoint
+SIN_RUTA = "sin_ruta"
+
+Etiquetas = Dict[str, str]
+
+
+def _valor(numero: float) -> str:
+    if numero == float("inf"):
+        return "+Inf"
+    return repr(float(numero)) if isinstance(numero, float) else str(numero)
+
+
+def _etiquetas(etiquetas: Etiquetas) -> str:
+    if not etiquetas:
+        return ""
+    partes = []
+    for clave, valor in etiquetas.items():
+        valor = str(valor).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        partes.append(f'{clave}="{valor}"')
+    return "{" + ",".join(partes) + "}"
+
+
+class Exposicion:
+    """Texto de exposición de Prometheus: cada métrica con su HELP, TYPE y muestras"""
+    
+    def __init__(self):
+        self.lineas: List[str] = []
+    
+    def metrica(self, nombre: str, tipo: str, ayuda: str, muestras: Iterable[Tuple[Etiquetas, float]]) -> None:
+        nombre = f"{PREFIJO}_{nombre}"
+        self.lineas.append(f"# HELP {nombre} {ayuda}")
+        self.lineas.append(f"# TYPE {nombre} {tipo}")
+        for etiquetas, numero in muestras:
+            self.lineas.append(f"{nombre}{_etiquetas(etiquetas)} {_valor(numero)}")
+    
+    def histograma(self, nombre: str, ayuda: str, series: Iterable[Tuple[Etiquetas, Histograma]]) -> None:
+        nombre = f"{PREFIJO}_{nombre}"
+        self.lineas.append(f"# HELP {nombre} {ayuda}")
+        self.lineas.append(f"# TYPE {nombre} histogram")
+        for etiquetas, histograma in series:
+            acumulado = 0
+            for limite, conteo in zip((*histograma.buckets, float("inf")), histograma.conteos):
+                acumulado += conteo
+                etiquetas_bucket = dict(etiquetas, le=_valor(float(limite)))
+                self.lineas.append(f"{nombre}_bucket{_etiquetas(etiquetas_bucket)} {acumulado}")
+            self.lineas.append(f"{nombre}_sum{_etiquetas(etiquetas)} {_valor(histograma.suma)}")
+            self.lineas.append(f"{nombre}_count{_etiquetas(etiquetas)} {histograma.cantidad}")
+    
+    def texto(self) -> str:
+        return "\n".join(self.lineas) + "\n"
+
+
+Recolector = Callable[[Exposicion], None]
+
+
+class MetricasHTTP:
+    """Histogramas de latencia por (método, plantilla de ruta, estado) y peticiones en curso"""
+    
+    def __init__(self):
+        self._histogramas: Dict[Tuple[str, str, str], Histograma] = {}
+        self._lock = threading.Lock()
+        self.en_curso = 0
+    
+    def observar(self, metodo: str, ruta: str, estado: int, segundos: float) -> None:
+        clave = (metodo, ruta, str(estado))
+        with self._lock:
+            histograma = self._histogramas.get(clave)
+            if histograma is None:
+                histograma = self._histogramas[clave] = Histograma()
+            histograma.observar(segundos)
+    
+    def histogramas(self) -> Dict[Tuple[str, str, str], Histograma]:
+        with self._lock:
+            return {clave: histograma.copia() for clave, histograma in sorted(self._histogramas.items())}
+
+
+class RegistroMetricas:
+    """Métricas HTTP propias más los recolectores registrados por cada componente"""
+    
+    def __init__(self):
+        self.http = MetricasHTTP()
+        self._recolectores: List[Recolector] = [self._recolectar_http, _recolectar_etapas, _recolectar_logs]
+    
+    def registrar(self, recolector: Recolector) -> None:
+        self._recolectores.append(recolector)
+    
+    def exponer(self) -> str:
+        exposicion = Exposicion()
+        for recolector in self._recolectores:
+            recolector(exposicion)
+        return exposicion.texto()
+    
+    def _recolectar_http(self, exposicion: Exposicion) -> None:
+        exposicion.histograma(
+            "http_request_duration_seconds", "Latencia de las peticiones HTTP por ruta",
+            (({'method': metodo, 'route': ruta, 'status': estado}, histograma)
+             for (metodo, ruta, estado), histograma in self.http.histogramas().items())
+        )
+        exposicion.metrica("http_requests_in_flight", "gauge", "Peticiones HTTP en curso",
+                           [({}, self.http.en_curso)])
+
+
+def _recolectar_etapas(exposicion: Exposicion) -> None:
+    exposicion.histograma(
+        "stage_duration_seconds", "Duración por etapa (consulta, preparación, render, guardado...)",
+        (({'etapa': nombre}, histograma) for nombre, histograma in registro_etapas.histogramas().items())
+    )
+
+
+def _recolectar_logs(exposicion: Exposicion) -> None:
+    stats = Logger.stats()
+    exposicion.metrica("log_queue_size", "gauge", "Registros de log pendientes de escribir",
+                       [({}, stats['en_cola'])])
+    exposicion.metrica("log_dropped_total", "counter", "Registros de log descartados por cola llena",
+                       [({}, stats['descartados'])])
+
+
+registro_metricas = RegistroMetricas()
+
+
+def recolector_caches(*caches) -> Recolector:
+    """Hits, misses, entradas y hit ratio de caches TTLCache"""
+    def recolectar(exposicion: Exposicion) -> None:
+        stats = [cache.stats() for cache in caches]
+        for nombre, campo, tipo, ayuda in (
+            ("cache_hits_total", 'hits', "counter", "Lecturas del cache con valor vigente"),
+            ("cache_misses_total", 'misses', "counter", "Lecturas del cache sin valor vigente"),
+            ("cache_entries", 'entradas', "gauge", "Entradas guardadas en el cache"),
+            ("cache_hit_ratio", 'hit_ratio', "gauge", "Proporción de lecturas con valor vigente"),
+        ):
+            exposicion.metrica(nombre, tipo, ayuda, [({'cache': s['nombre']}, s[campo]) for s in stats])
+    return recolectar
+
+
+def recolector_single_flight(*grupos) -> Recolector:
+    """Ejecuciones reales y compartidas de grupos SingleFlight"""
+    def recolectar(exposicion: Exposicion) -> None:
+        stats = [grupo.stats() for grupo in grupos]
+        exposicion.metrica("single_flight_executions_total", "counter", "Generaciones ejecutadas",
+                           [({'grupo': s['nombre']}, s['ejecutadas']) for s in stats])
+        exposicion.metrica("single_flight_shared_total", "counter",
+                           "Llamadas que esperaron una generación ya en curso",
+                           [({'grupo': s['nombre']}, s['compartidas']) for s in stats])
+    return recolectar
+
+
+def recolector_admision(control) -> Recolector:
+    """Estado del control de admisión por clase de endpoint"""
+    def recolectar(exposicion: Exposicion) -> None:
+        stats = control.stats()
+        for nombre, campo, tipo, ayuda in (
+            ("admission_in_flight", 'en_curso', "gauge", "Peticiones pesadas en curso por clase"),
+            ("admission_queued", 'en_cola', "gauge", "Peticiones pesadas esperando lugar por clase"),
+            ("admission_admitted_total", 'admitidas', "counter", "Peticiones pesadas admitidas"),
+            ("admission_rejected_total", 'rechazadas', "counter", "Peticiones pesadas rechazadas con 429"),
+        ):
+            exposicion.metrica(nombre, tipo, ayuda,
+                               [({'clase': clase}, s[campo]) for clase, s in stats.items()])
+    return recolectar
+
+
+def recolector_pool_db(engines: Dict[str, Any]) -> Recolector:
+    """
+    Conexiones de los pools de SQLAlchemy, con la etiqueta engine (los pools sin
+    tamaño, como el de SQLite en memoria, solo informan las prestadas)
+    """
+    def recolectar(exposicion: Exposicion) -> None:
+        pools = [({'engine': nombre}, engine.pool) for nombre, engine in engines.items()]
+        for nombre, metodo, ayuda in (
+            ("db_pool_size", "size", "Tamaño configurado del pool de conexiones"),
+            ("db_pool_checked_out", "checkedout", "Conexiones prestadas en este momento"),
+            ("db_pool_checked_in", "checkedin", "Conexiones libres en el pool"),
+            ("db_pool_overflow", "overflow", "Conexiones abiertas por encima del tamaño del pool"),
+        ):
+            muestras = [(etiquetas, getattr(pool, metodo)()) for etiquetas, pool in pools if hasattr(pool, metodo)]
+            if muestras:
+                exposicion.metrica(nombre, "gauge", ayuda, muestras)
+        medidos = [(etiquetas, pool) for etiquetas, pool in pools if hasattr(pool, "capacidad")]
+        if medidos:
+            exposicion.metrica("db_pool_saturation", "gauge", "Conexiones prestadas sobre tamaño más overflow",
+                               [(etiquetas, round(pool.checkedout() / pool.capacidad(), 4)) for etiquetas, pool in medidos])
+        datos = [(etiquetas, pool.telemetria.copia()) for etiquetas, pool in pools if hasattr(pool, "telemetria")]
+        if datos:
+            exposicion.histograma("db_pool_checkout_wait_seconds", "Espera para obtener una conexión del pool",
+                                  [(etiquetas, d['espera']) for etiquetas, d in datos])
+            exposicion.metrica("db_pool_timeouts_total", "counter", "Esperas de conexión que agotaron el timeout",
+                               [(etiquetas, d['timeouts']) for etiquetas, d in datos])
+            exposicion.metrica("db_pool_invalidations_total", "counter",
+                               "Conexiones descartadas por caídas (pre-ping o error de conexión)",
+                               [(etiquetas, d['invalidaciones']) for etiquetas, d in datos])
+    return recolectar
+
+
+def _plantilla_ruta(scope) -> str:
+    ruta = scope.get("route")
+    return getattr(ruta, "path", None) or SIN_RUTA
+
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI: mide cada petición hasta terminar de enviar la respuesta y
+    la registra con la plantilla de ruta que resolvió el router (disponible en
+    el scope una vez atendida)
+    """
+    
+    def __init__(self, app, registro: RegistroMetricas = registro_metricas):
+        self.app = app
+        self.registro = registro
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.metrics_enabled:
+            await self.app(scope, receive, send)
+            return
+        
+        estado = 500
+        
+        async def enviar(mensaje):
+            nonlocal estado
+            if mensaje["type"] == "http.response.start":
+                estado = mensaje["status"]
+            await send(mensaje)
+        
+        http = self.registro.http
+        http.en_curso += 1
+        inicio = time.perf_counter()
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            duracion = time.perf_counter() - inicio
+            http.en_curso -= 1
+            ruta = _plantilla_ruta(scope)
+            http.observar(scope["method"], ruta, estado, duracion)
+            api_logger.debug(f"{scope['method']} {ruta} {estado} {1000 * duracion:.1f}ms")
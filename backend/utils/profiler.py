@@ -0,0 +1,229 @@
+"""
+Profiler por muestreo para analizar en producción dónde se va el CPU
+
+Un hilo toma cada ``intervalo`` segundos las pilas de todos los hilos del
+proceso (sys._current_frames) durante una ventana acotada y las acumula en
+formato colapsado (una línea "marco;marco;...;marco cantidad" por pila, la
+entrada de flamegraph.pl, speedscope o inferno). Opcionalmente registra con
+tracemalloc los sitios que más memoria asignaron durante la ventana.
+
+La generación de Excel corre en el pool de procesos: cada worker tiene un hilo
+que vigila un directorio de control y, al aparecer una sesión, muestrea su
+propio proceso y deja ahí su resultado, que el proceso principal combina con
+el suyo. Fuera de una sesión el costo es intentar abrir un archivo por segundo en
+cada worker.
+"""
+
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter
+from typing import Any, Dict, List
+
+from config import settings
+
+# Espera entre revisiones del directorio de control en los workers
+INTERVALO_VIGILANCIA = 1.0
+ARCHIVO_SESION = "sesion.json"
+
+# Directorio de control compartido con los workers del pool
+DIRECTORIO_CONTROL = os.path.join(tempfile.gettempdir(), f"labexcel-perfil-{os.getpid()}")
+
+
+def _prefijos_rutas() -> List[str]:
+    """Rutas de sys.path, de la más larga a la más corta, para acortar los nombres de archivo"""
+    return sorted({os.path.join(os.path.abspath(ruta), "") for ruta in sys.path if ruta}, key=len, reverse=True)
+
+
+class Muestreador:
+    """Pilas colapsadas y, opcionalmente, sitios de asignación de memoria de este proceso"""
+    
+    def __init__(self, intervalo: float, memoria: bool = False, top_asignaciones: int = 25):
+        self.intervalo = intervalo
+        self.memoria = memoria
+        self.top_asignaciones = top_asignaciones
+        self.pilas: Counter = Counter()
+        self.muestras = 0
+        self._nombres: Dict[Any, str] = {}
+        self._prefijos = _prefijos_rutas()
+    
+    def _archivo(self, ruta: str) -> str:
+        for prefijo in self._prefijos:
+            if ruta.startswith(prefijo):
+                return ruta[len(prefijo):]
+        return ruta
+    
+    def _nombre(self, codigo) -> str:
+        nombre = self._nombres.get(codigo)
+        if nombre is None:
+            nombre = self._nombres[codigo] = (
+                f"{codigo.co_name} ({self._archivo(codigo.co_filename)}:{codigo.co_firstlineno})"
+            )
+        return nombre
+    
+    def _muestrear(self, propio: int, etiqueta: str) -> None:
+        hilos = {hilo.ident: hilo.name for hilo in threading.enumerate()}
+        for ident, marco in sys._current_frames().items():
+            if ident == propio:
+                continue
+            pila = []
+            while marco is not None:
+                pila.append(self._nombre(marco.f_code))
+                marco = marco.f_back
+            pila.append(hilos.get(ident, f"hilo-{ident}"))
+            pila.append(etiqueta)
+            self.pilas[";".join(reversed(pila))] += 1
+        self.muestras += 1
+    
+    def ejecutar(self, duracion: float, etiqueta: str) -> Dict[str, Any]:
+        """Muestrear durante ``duracion`` segundos desde el hilo actual (excluido de las pilas)"""
+        iniciado_aqui = self.memoria and not tracemalloc.is_tracing()
+        if iniciado_aqui:
+            tracemalloc.start()
+        inicial = tracemalloc.take_snapshot() if self.memoria else None
+        
+        propio = threading.get_ident()
+        fin = time.monotonic() + duracion
+        while time.monotonic() < fin:
+            self._muestrear(propio, etiqueta)
+            time.sleep(self.intervalo)
+        
+        resultado: Dict[str, Any] = {
+            'proceso': etiqueta, 'muestras': self.muestras, 'pilas': dict(self.pilas), 'asignaciones': []
+        }
+        if self.memoria:
+            final = tracemalloc.take_snapshot()
+            pico = tracemalloc.get_traced_memory()[1]
+            if iniciado_aqui:
+                tracemalloc.stop()
+            resultado['asignaciones'] = [
+                {
+                    'proceso': etiqueta,
+                    'sitio': f"{self._archivo(diferencia.traceback[0].filename)}:{diferencia.traceback[0].lineno}",
+                    'kb': round(diferencia.size_diff / 1024, 1),
+                    'bloques': diferencia.count_diff,
+                }
+                for diferencia in final.compare_to(inicial, 'lineno')[:self.top_asignaciones]
+            ]
+            resultado['pico_memoria_kb'] = round(pico / 1024, 1)
+        return resultado
+
+
+class SesionEnCurso(Exception):
+    """Ya hay una sesión de perfilado en curso"""
+
+
+class Profiler:
+    """Sesiones de perfilado del proceso principal y de los workers del pool (una a la vez)"""
+    
+    def __init__(self, directorio: str = DIRECTORIO_CONTROL):
+        self.directorio = directorio
+        self._lock = threading.Lock()
+    
+    def perfilar(self, duracion: float, intervalo: float, memoria: bool) -> Dict[str, Any]:
+        if not self._lock.acquire(blocking=False):
+            raise SesionEnCurso("Ya hay una sesión de perfilado en curso")
+        try:
+            sesion = uuid.uuid4().hex
+            os.makedirs(self.directorio, exist_ok=True)
+            # Restos de sesiones anteriores de workers que terminaron después del plazo
+            for nombre in os.listdir(self.directorio):
+                os.remove(os.path.join(self.directorio, nombre))
+            self._publicar({'id': sesion, 'duracion': duracion, 'intervalo': intervalo, 'memoria': memoria})
+            try:
+                principal = Muestreador(intervalo, memoria).ejecutar(duracion, "principal")
+                workers = self._resultados_workers(sesion, fin=time.monotonic() + 2 * INTERVALO_VIGILANCIA + 1)
+            finally:
+                os.remove(os.path.join(self.directorio, ARCHIVO_SESION))
+            return self._combinar(duracion, intervalo, [principal, *workers])
+        finally:
+            self._lock.release()
+    
+    def _publicar(self, sesion: Dict[str, Any]) -> None:
+        temporal = os.path.join(self.directorio, f".{ARCHIVO_SESION}")
+        with open(temporal, 'w') as f:
+            json.dump(sesion, f)
+        os.replace(temporal, os.path.join(self.directorio, ARCHIVO_SESION))
+    
+    def _resultados_workers(self, sesion: str, fin: float) -> List[Dict[str, Any]]:
+        """Esperar los resultados de los workers que tomaron la sesión (los que empezaron tarde terminan tarde)"""
+        while True:
+            tomados = [n for n in os.listdir(self.directorio) if n.startswith(f"tomada-{sesion}-")]
+            listos = [n for n in os.listdir(self.directorio) if n.startswith(f"resultado-{sesion}-")]
+            if len(listos) >= len(tomados) or time.monotonic() >= fin:
+                break
+            time.sleep(0.1)
+        resultados = []
+        for nombre in tomados + listos:
+            ruta = os.path.join(self.directorio, nombre)
+            if nombre in listos:
+                with open(ruta) as f:
+                    resultados.append(json.load(f))
+            os.remove(ruta)
+        return resultados
+    
+    @staticmethod
+    def _combinar(duracion: float, intervalo: float, resultados: List[Dict[str, Any]]) -> Dict[str, Any]:
+        pilas: Counter = Counter()
+        propias: Counter = Counter()
+        asignaciones = []
+        picos = {}
+        for resultado in resultados:
+            if 'pico_memoria_kb' in resultado:
+                picos[resultado['proceso']] = resultado['pico_memoria_kb']
+            for pila, cantidad in resultado['pilas'].items():
+                pilas[pila] += cantidad
+                propias[pila.rsplit(";", 1)[-1]] += cantidad
+            asignaciones.extend(resultado['asignaciones'])
+        total = sum(pilas.values()) or 1
+        return {
+            'duracion_s': duracion,
+            'intervalo_ms': round(1000 * intervalo, 2),
+            'procesos': len(resultados),
+            'muestras': sum(resultado['muestras'] for resultado in resultados),
+            'top_funciones': [
+                {'funcion': funcion, 'muestras': cantidad, 'porcentaje': round(100 * cantidad / total, 1)}
+                for funcion, cantidad in propias.most_common(25)
+            ],
+            'asignaciones': sorted(asignaciones, key=lambda a: a['kb'], reverse=True)[:25],
+            'pico_memoria_kb': picos,
+            'colapsado': "\n".join(f"{pila} {cantidad}" for pila, cantidad in pilas.most_common()),
+        }
+
+
+profiler = Profiler()
+
+
+def _vigilar(directorio: str) -> None:
+    """Hilo de cada worker del pool: atiende las sesiones publicadas en el directorio de control"""
+    ultima = None
+    ruta_sesion = os.path.join(directorio, ARCHIVO_SESION)
+    etiqueta = f"worker-{os.getpid()}"
+    while True:
+        time.sleep(INTERVALO_VIGILANCIA)
+        try:
+            with open(ruta_sesion) as f:
+                sesion = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if sesion['id'] == ultima:
+            continue
+        ultima = sesion['id']
+        sufijo = f"-{sesion['id']}-{os.getpid()}.json"
+        open(os.path.join(directorio, "tomada" + sufijo), 'w').close()
+        resultado = Muestreador(sesion['intervalo'], sesion['memoria']).ejecutar(sesion['duracion'], etiqueta)
+        temporal = os.path.join(directorio, ".resultado" + sufijo)
+        with open(temporal, 'w') as f:
+            json.dump(resultado, f)
+        os.replace(temporal, os.path.join(directorio, "resultado" + sufijo))
+
+
+def iniciar_vigilancia_worker(directorio: str) -> None:
+    """Initializer del pool de procesos: hilo de perfilado en espera (solo con el profiler habilitado)"""
+    if settings.profiler_admin_token:
+        threading.Thread(target=_vigilar, args=(directorio,), name="profiler", daemon=True).start()
@@ -0,0 +1,57 @@
+"""
+Agrupación de llamadas concurrentes idénticas (single-flight): mientras una
+llamada para una clave está en curso, las demás con la misma clave esperan su
+resultado en lugar de repetir el trabajo
+"""
+
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """Ejecuta a lo sumo una función por clave a la vez y comparte su resultado (o error)"""
+    
+    def __init__(self, nombre: str):
+        self.nombre = nombre
+        self._en_vuelo: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+        self.ejecutadas = 0
+        self.compartidas = 0
+    
+    def ejecutar(self, clave: Hashable, funcion: Callable[[], Any]) -> Any:
+        """Ejecutar funcion, o esperar la ejecución en curso para la misma clave"""
+        with self._lock:
+            futuro = self._en_vuelo.get(clave)
+            lider = futuro is None
+            if lider:
+                futuro = Future()
+                self._en_vuelo[clave] = futuro
+                self.ejecutadas += 1
+            else:
+                self.compartidas += 1
+        
+        if not lider:
+            return futuro.result()
+        
+        try:
+            resultado = funcion()
+        except BaseException as e:
+            futuro.set_exception(e)
+            raise
+        else:
+            futuro.set_result(resultado)
+            return resultado
+        finally:
+            with self._lock:
+                del self._en_vuelo[clave]
+    
+    def stats(self) -> Dict[str, Any]:
+        """Ejecuciones reales y llamadas que compartieron una ejecución en curso"""
+        with self._lock:
+            return {
+                'nombre': self.nombre,
+                'en_curso': len(self._en_vuelo),
+                'ejecutadas': self.ejecutadas,
+                'compartidas': self.compartidas
+            }
@@ -0,0 +1,145 @@
+"""
+Instrumentación de las consultas SQL
+
+Eventos del engine de SQLAlchemy que cuentan las sentencias y el tiempo en la
+base de datos de cada petición (headers X-DB-Queries y X-DB-Time-Ms, etapa
+``sql`` de Server-Timing) y registran en el log las consultas lentas con sus
+parámetros; en modo debug, también su plan de ejecución (EXPLAIN).
+"""
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, List, Optional, Tuple
+
+from sqlalchemy import event
+
+from config import settings
+from utils.logger import db_logger
+from utils.timing import registrar_etapa
+
+# Largo máximo de sentencias y parámetros en el log
+MAX_LARGO_LOG = 2000
+
+
+class ConteoConsultas:
+    """Sentencias ejecutadas y tiempo acumulado dentro de un bloque contar_consultas()"""
+    
+    def __init__(self, guardar_sentencias: bool = False):
+        self.cantidad = 0
+        self.segundos = 0.0
+        self.sentencias: Optional[List[str]] = [] if guardar_sentencias else None
+    
+    def registrar(self, sentencia: str, segundos: float) -> None:
+        self.cantidad += 1
+        self.segundos += segundos
+        if self.sentencias is not None:
+            self.sentencias.append(sentencia)
+
+
+# Conteos activos en el contexto actual (los bloques anidados suman en todos)
+_conteos_actuales: ContextVar[Tuple[ConteoConsultas, ...]] = ContextVar("conteos_consultas", default=())
+
+
+@contextmanager
+def contar_consultas(guardar_sentencias: bool = False) -> Iterator[ConteoConsultas]:
+    """Contar las consultas ejecutadas dentro del bloque (en este contexto y en los hilos que lo heredan)"""
+    conteo = ConteoConsultas(guardar_sentencias)
+    token = _conteos_actuales.set(_conteos_actuales.get() + (conteo,))
+    try:
+        yield conteo
+    finally:
+        _conteos_actuales.reset(token)
+
+
+@contextmanager
+def presupuesto_consultas(maximo: int) -> Iterator[ConteoConsultas]:
+    """
+    Fallar (AssertionError) si el bloque ejecuta más de ``maximo`` consultas;
+    pensado para pruebas, el mensaje incluye las sentencias ejecutadas
+    """
+    with contar_consultas(guardar_sentencias=True) as conteo:
+        yield conteo
+    if conteo.cantidad > maximo:
+        detalle = "\n".join(f"  {sentencia}" for sentencia in conteo.sentencias)
+        raise AssertionError(f"Se ejecutaron {conteo.cantidad} consultas (presupuesto {maximo}):\n{detalle}")
+
+
+def _recortar(texto: str) -> str:
+    return texto if len(texto) <= MAX_LARGO_LOG else texto[:MAX_LARGO_LOG] + "..."
+
+
+def _plan_ejecucion(conn, sentencia: str, parametros) -> str:
+    """EXPLAIN de la sentencia en un cursor aparte (el de la consulta aún tiene sus resultados pendientes)"""
+    prefijo = "EXPLAIN QUERY PLAN " if conn.dialect.name == "sqlite" else "EXPLAIN "
+    cursor = conn.connection.dbapi_connection.cursor()
+    try:
+        cursor.execute(prefijo + sentencia, parametros)
+        return "\n".join(" | ".join(str(valor) for valor in fila) for fila in cursor.fetchall())
+    finally:
+        cursor.close()
+
+
+def _antes_de_ejecutar(conn, cursor, sentencia, parametros, contexto, executemany):
+    # Una conexión ejecuta una sentencia a la vez: basta con un valor (sin pila que se desbalancee si falla)
+    conn.info["inicio_consulta"] = time.perf_counter()
+
+
+def _despues_de_ejecutar(conn, cursor, sentencia, parametros, contexto, executemany):
+    segundos = time.perf_counter() - conn.info.pop("inicio_consulta", time.perf_counter())
+    for conteo in _conteos_actuales.get():
+        conteo.registrar(sentencia, segundos)
+    
+    if settings.sql_slow_query_ms and segundos * 1000 >= settings.sql_slow_query_ms:
+        db_logger.warning(
+            f"Consulta lenta ({1000 * segundos:.1f} ms): {_recortar(sentencia)} | "
+            f"parámetros: {_recortar(repr(parametros))}"
+        )
+        if settings.debug and not executemany and sentencia.lstrip()[:6].upper() == "SELECT":
+            try:
+                db_logger.warning(f"Plan de ejecución:\n{_plan_ejecucion(conn, sentencia, parametros)}")
+            except Exception as e:
+                db_logger.warning(f"No se pudo obtener el plan de ejecución: {e}")
+
+
+def instrumentar_engine(engine) -> None:
+    """Registrar los eventos de conteo y consultas lentas en el engine (una sola vez)"""
+    if not event.contains(engine, "before_cursor_execute", _antes_de_ejecutar):
+        event.listen(engine, "before_cursor_execute", _antes_de_ejecutar)
+        event.listen(engine, "after_cursor_execute", _despues_de_ejecutar)
+
+
+class ConsultasSQLMiddleware:
+    """
+    Middleware ASGI: cuenta las consultas de cada petición, las informa en los
+    headers X-DB-Queries y X-DB-Time-Ms y como etapa ``sql`` de Server-Timing,
+    y advierte en el log las peticiones que superan sql_queries_warn (N+1)
+    """
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.sql_instrumentation_enabled:
+            await self.app(scope, receive, send)
+            return
+        
+        with contar_consultas() as conteo:
+            async def enviar(mensaje):
+                if mensaje["type"] == "http.response.start":
+                    if conteo.cantidad:
+                        registrar_etapa("sql", conteo.segundos)
+                    mensaje = dict(mensaje, headers=[
+                        *mensaje.get("headers", []),
+                        (b"x-db-queries", str(conteo.cantidad).encode()),
+                        (b"x-db-time-ms", f"{1000 * conteo.segundos:.1f}".encode())
+                    ])
+                await send(mensaje)
+            
+            await self.app(scope, receive, enviar)
+        
+        if settings.sql_queries_warn and conteo.cantidad > settings.sql_queries_warn:
+            db_logger.warning(
+                f"{scope['method']} {scope['path']} ejecutó {conteo.cantidad} consultas "
+                f"({1000 * conteo.segundos:.1f} ms en la base de datos)"
+            )
@@ -0,0 +1,219 @@
+"""
+Almacén de archivos generados (Excel) con nombres por contenido,
+directorios por fecha y política de expiración por antigüedad y tamaño
+"""
+
+import hashlib
+import logging
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Optional
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Clave: AAAA/MM/DD/<prefijo>_<hash>.<ext>
+_PATRON_CLAVE = re.compile(r'^\d{4}/\d{2}/\d{2}/[A-Za-z0-9_.-]+$')
+
+
+class OutputStore:
+    """
+    Guarda archivos generados bajo claves estables del tipo
+    ``2025/01/27/verificacion_<sha256>.xlsx``. La clave es lo que se persiste
+    en la base de datos (``archivo_excel``); la ruta física se resuelve con
+    ``resolver``.
+    """
+    
+    def __init__(self, base_dir: str, max_bytes: int, max_edad_dias: float, intervalo_barrido: float):
+        self.base_dir = Path(base_dir)
+        self.max_bytes = max_bytes
+        self.max_edad_segundos = max_edad_dias * 86400
+        self.intervalo_barrido = intervalo_barrido
+        self._tmp_dir = self.base_dir / ".tmp"
+        self._lock = threading.Lock()
+        self._detener = threading.Event()
+        self._hilo: Optional[threading.Thread] = None
+    
+    def ruta_temporal(self, sufijo: str = ".xlsx") -> str:
+        """Ruta temporal en el mismo disco del almacén (para mover sin copiar)"""
+        self._tmp_dir.mkdir(parents=True, exist_ok=True)
+        fd, ruta = tempfile.mkstemp(suffix=sufijo, dir=self._tmp_dir)
+        os.close(fd)
+        return ruta
+    
+    def guardar_archivo(self, ruta_origen: str, prefijo: str) -> str:
+        """Mover un archivo ya escrito al almacén y retornar su clave"""
+        sha = hashlib.sha256()
+        with open(ruta_origen, 'rb') as f:
+            for bloque in iter(lambda: f.read(1024 * 1024), b''):
+                sha.update(bloque)
+        
+        clave = self._clave(prefijo, sha.hexdigest(), Path(ruta_origen).suffix or ".xlsx")
+        destino = self.base_dir / clave
+        
+        # Bajo el lock para que el barrido no borre el directorio recién creado
+        with self._lock:
+            destino.parent.mkdir(parents=True, exist_ok=True)
+            if destino.exists():
+                # Mismo contenido ya guardado hoy: renovar su antigüedad
+                os.unlink(ruta_origen)
+                os.utime(destino)
+            else:
+                os.replace(ruta_origen, destino)
+        
+        return clave
+    
+    def copiar_archivo(self, ruta_origen: str, prefijo: str) -> str:
+        """Guardar una copia de un archivo que sigue en uso (p. ej. mientras se envía) y retornar su clave"""
+        ruta = self.ruta_temporal(Path(ruta_origen).suffix or ".xlsx")
+        shutil.copyfile(ruta_origen, ruta)
+        return self.guardar_archivo(ruta, prefijo)
+    
+    def guardar_bytes(self, contenido: bytes, prefijo: str, extension: str = ".xlsx") -> str:
+        """Guardar contenido en memoria y retornar su clave"""
+        ruta = self.ruta_temporal(extension)
+        with open(ruta, 'wb') as f:
+            f.write(contenido)
+        return self.guardar_archivo(ruta, prefijo)
+    
+    def guardar_workbook(self, workbook, prefijo: str) -> str:
+        """Serializar un workbook de openpyxl directamente en el almacén y retornar su clave"""
+        ruta = self.ruta_temporal(".xlsx")
+        try:
+            workbook.save(ruta)
+        except Exception:
+            os.unlink(ruta)
+            raise
+        return self.guardar_archivo(ruta, prefijo)
+    
+    @staticmethod
+    def _clave(prefijo: str, sha256: str, extension: str) -> str:
+        prefijo = re.sub(r'[^A-Za-z0-9_-]+', '_', prefijo) or "archivo"
+        return f"{datetime.now():%Y/%m/%d}/{prefijo}_{sha256[:32]}{extension}"
+    
+    @staticmethod
+    def es_clave(valor: Optional[str]) -> bool:
+        """Indica si el valor es una clave del almacén (y no una ruta antigua)"""
+        return bool(valor) and bool(_PATRON_CLAVE.match(valor))
+    
+    def resolver(self, valor: Optional[str]) -> Optional[str]:
+        """
+        Ruta física de una clave, o None si no existe.
+        Acepta también rutas antiguas guardadas antes del almacén.
+        """
+        if not valor:
+            return None
+        ruta = self.base_dir / valor if self.es_clave(valor) else Path(valor)
+        return str(ruta) if ruta.is_file() else None
+    
+    def eliminar(self, valor: Optional[str]) -> bool:
+        """Eliminar el archivo de una clave (o ruta antigua)"""
+        ruta = self.resolver(valor)
+        if not ruta:
+            return False
+        try:
+            os.unlink(ruta)
+            return True
+        except OSError:
+            return False
+    
+    def barrer(self) -> Dict[str, int]:
+        """Eliminar archivos vencidos y, si se supera max_bytes, los más antiguos"""
+        with self._lock:
+            ahora = time.time()
+            archivos = []
+            eliminados_edad = 0
+            
+            for ruta in self.base_dir.glob("[0-9][0-9][0-9][0-9]/*/*/*"):
+                try:
+                    stat = ruta.stat()
+                except FileNotFoundError:
+                    continue
+                if ahora - stat.st_mtime > self.max_edad_segundos:
+                    self._borrar(ruta)
+                    eliminados_edad += 1
+                else:
+                    archivos.append((stat.st_mtime, stat.st_size, ruta))
+            
+            # Temporales abandonados (escrituras interrumpidas)
+            if self._tmp_dir.exists():
+                for ruta in self._tmp_dir.iterdir():
+                    try:
+                        if ahora - ruta.stat().st_mtime > 3600:
+                            self._borrar(ruta)
+                    except FileNotFoundError:
+                        continue
+            
+            total = sum(tamano for _, tamano, _ in archivos)
+            eliminados_tamano = 0
+            archivos.sort()
+            for _, tamano, ruta in archivos:
+                if total <= self.max_bytes:
+                    break
+                self._borrar(ruta)
+                total -= tamano
+                eliminados_tamano += 1
+            
+            self._limpiar_directorios_vacios()
+        
+        if eliminados_edad or eliminados_tamano:
+            logger.info(
+                f"Barrido de archivos generados: {eliminados_edad} por antigüedad, "
+                f"{eliminados_tamano} por tamaño, {total} bytes en uso"
+            )
+        return {'eliminados_edad': eliminados_edad, 'eliminados_tamano': eliminados_tamano, 'bytes_en_uso': total}
+    
+    @staticmethod
+    def _borrar(ruta: Path) -> None:
+        try:
+            ruta.unlink()
+        except OSError:
+            pass
+    
+    def _limpiar_directorios_vacios(self) -> None:
+        # Del más profundo al menos profundo: día, mes, año
+        for patron in ("[0-9][0-9][0-9][0-9]/*/*", "[0-9][0-9][0-9][0-9]/*", "[0-9][0-9][0-9][0-9]"):
+            for directorio in self.base_dir.glob(patron):
+                if directorio.is_dir():
+                    try:
+                        directorio.rmdir()
+                    except OSError:
+                        pass  # No está vacío
+    
+    def iniciar_barrido(self) -> None:
+        """Iniciar el hilo de barrido periódico"""
+        if self._hilo and self._hilo.is_alive():
+            return
+        self._detener.clear()
+        self._hilo = threading.Thread(target=self._bucle_barrido, name="output-store-sweeper", daemon=True)
+        self._hilo.start()
+    
+    def detener_barrido(self) -> None:
+        """Detener el hilo de barrido"""
+        self._detener.set()
+        if self._hilo:
+            self._hilo.join(timeout=5)
+            self._hilo = None
+    
+    def _bucle_barrido(self) -> None:
+        while not self._detener.is_set():
+            try:
+                self.barrer()
+            except Exception as e:
+                logger.error(f"Error en barrido de archivos generados: {str(e)}")
+            self._detener.wait(self.intervalo_barrido)
+
+
+output_store = OutputStore(
+    settings.output_dir,
+    max_bytes=settings.output_max_bytes,
+    max_edad_dias=settings.output_max_age_days,
+    intervalo_barrido=settings.output_sweep_interval
+)
@@ -0,0 +1,69 @@
+"""
+Respuestas HTTP que envían archivos Excel por bloques desde el archivo temporal
+en que se generaron, sin mantener el documento completo en memoria como bytes
+"""
+
+import os
+import weakref
+from typing import BinaryIO, Iterator, Optional
+
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+
+from config import settings
+
+MEDIA_TYPE_XLSX = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+class ArchivoTemporal:
+    """
+    Documento generado en un archivo temporal, compartido entre las peticiones
+    que esperaban la misma generación. El archivo se elimina cuando ya nadie
+    lo referencia: cada respuesta lo mantiene vivo hasta terminar el envío.
+    """
+    
+    def __init__(self, ruta: str):
+        self.ruta = ruta
+        self.tamano = os.path.getsize(ruta)
+        weakref.finalize(self, _eliminar, ruta)
+
+
+def _eliminar(ruta: str) -> None:
+    try:
+        os.unlink(ruta)
+    except OSError:
+        pass
+
+
+def leer_por_bloques(archivo: BinaryIO, chunk_size: int) -> Iterator[bytes]:
+    """Leer un archivo desde el inicio en bloques de chunk_size bytes"""
+    archivo.seek(0)
+    while True:
+        bloque = archivo.read(chunk_size)
+        if not bloque:
+            break
+        yield bloque
+
+
+def respuesta_excel(documento: ArchivoTemporal, filename: str, chunk_size: Optional[int] = None) -> StreamingResponse:
+    """
+    Respuesta de descarga para un documento generado en un archivo temporal.
+    Cada respuesta abre su propio descriptor y envía el archivo por bloques
+    con Content-Length; el descriptor se cierra al terminar el envío.
+    """
+    archivo = open(documento.ruta, 'rb')
+    
+    return StreamingResponse(
+        leer_por_bloques(archivo, chunk_size or settings.stream_chunk_size),
+        media_type=MEDIA_TYPE_XLSX,
+        headers={
+            "Content-Disposition": f"attachment; filename={filename}",
+            "Content-Length": str(documento.tamano)
+        },
+        background=BackgroundTask(_cerrar, archivo, documento)
+    )
+
+
+def _cerrar(archivo: BinaryIO, documento: ArchivoTemporal) -> None:
+    # documento llega solo para seguir referenciado (y su archivo en disco) hasta aquí
+    archivo.close()
@@ -0,0 +1,159 @@
+"""
+Medición de tiempos por etapa (consulta a la base, preparación de datos, carga
+de la plantilla, relleno, guardado, lectura de archivos importados...)
+Cada etapa se acumula en un histograma del proceso y, si hay una petición en
+curso, en sus tiempos, que se envían en el header Server-Timing
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from config import settings
+
+# Límites superiores de los buckets en segundos
+BUCKETS: Tuple[float, ...] = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Histograma:
+    """Histograma de duraciones con buckets fijos; el último bucket es +Inf"""
+    
+    def __init__(self, buckets: Tuple[float, ...] = BUCKETS):
+        self.buckets = buckets
+        self.conteos = [0] * (len(buckets) + 1)
+        self.cantidad = 0
+        self.suma = 0.0
+        self.maximo = 0.0
+    
+    def observar(self, segundos: float) -> None:
+        self.conteos[bisect.bisect_left(self.buckets, segundos)] += 1
+        self.cantidad += 1
+        self.suma += segundos
+        self.maximo = max(self.maximo, segundos)
+    
+    def copia(self) -> "Histograma":
+        copia = Histograma(self.buckets)
+        copia.conteos = list(self.conteos)
+        copia.cantidad, copia.suma, copia.maximo = self.cantidad, self.suma, self.maximo
+        return copia
+    
+    def percentil(self, p: float) -> float:
+        """Estimación del percentil p: límite superior del bucket que lo contiene (acotado al máximo)"""
+        if not self.cantidad:
+            return 0.0
+        objetivo = p / 100 * self.cantidad
+        acumulado = 0
+        for indice, conteo in enumerate(self.conteos):
+            acumulado += conteo
+            if acumulado >= objetivo:
+                return min(self.buckets[indice], self.maximo) if indice < len(self.buckets) else self.maximo
+        return self.maximo
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'cantidad': self.cantidad,
+            'media_ms': round(1000 * self.suma / self.cantidad, 1) if self.cantidad else 0.0,
+            'p50_ms': round(1000 * self.percentil(50), 1),
+            'p95_ms': round(1000 * self.percentil(95), 1),
+            'p99_ms': round(1000 * self.percentil(99), 1),
+            'max_ms': round(1000 * self.maximo, 1)
+        }
+
+
+class RegistroTiempos:
+    """Histogramas de duración por nombre, compartidos por los hilos del proceso"""
+    
+    def __init__(self):
+        self._histogramas: Dict[str, Histograma] = {}
+        self._lock = threading.Lock()
+    
+    def observar(self, nombre: str, segundos: float) -> None:
+        with self._lock:
+            histograma = self._histogramas.get(nombre)
+            if histograma is None:
+                histograma = self._histogramas[nombre] = Histograma()
+            histograma.observar(segundos)
+    
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {nombre: histograma.stats() for nombre, histograma in sorted(self._histogramas.items())}
+    
+    def histogramas(self) -> Dict[str, Histograma]:
+        """Copia consistente de los histogramas, para exportarlos sin mantener el lock"""
+        with self._lock:
+            return {nombre: histograma.copia() for nombre, histograma in sorted(self._histogramas.items())}
+
+
+registro_etapas = RegistroTiempos()
+
+# Tiempos por etapa de la petición (o generación) en curso
+_tiempos_actuales: ContextVar[Optional[Dict[str, float]]] = ContextVar("tiempos_etapas", default=None)
+
+
+def registrar_etapa(nombre: str, segundos: float) -> None:
+    registro_etapas.observar(nombre, segundos)
+    tiempos = _tiempos_actuales.get()
+    if tiempos is not None:
+        tiempos[nombre] = tiempos.get(nombre, 0.0) + segundos
+
+
+@contextmanager
+def etapa(nombre: str) -> Iterator[None]:
+    """Medir el bloque como la etapa ``nombre`` (las repeticiones se suman)"""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        registrar_etapa(nombre, time.perf_counter() - inicio)
+
+
+@contextmanager
+def medir_etapas() -> Iterator[Dict[str, float]]:
+    """Acumular en un diccionario propio las etapas medidas dentro del bloque"""
+    tiempos: Dict[str, float] = {}
+    token = _tiempos_actuales.set(tiempos)
+    try:
+        yield tiempos
+    finally:
+        _tiempos_actuales.reset(token)
+
+
+def incorporar_etapas(tiempos: Dict[str, float]) -> None:
+    """Registrar etapas medidas en otro proceso (pool de procesos) como si fueran de este"""
+    for nombre, segundos in tiempos.items():
+        registrar_etapa(nombre, segundos)
+
+
+def valor_server_timing(tiempos: Dict[str, float], total: float) -> str:
+    partes = [f"{nombre};dur={1000 * segundos:.1f}" for nombre, segundos in tiempos.items()]
+    partes.append(f"total;dur={1000 * total:.1f}")
+    return ", ".join(partes)
+
+
+class ServerTimingMiddleware:
+    """
+    Middleware ASGI: mide las etapas de cada petición y las agrega en el header
+    Server-Timing. Solo incluye lo ocurrido antes de enviar los headers; lo
+    medido durante un streaming se registra igual en los histogramas.
+    """
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.server_timing_enabled:
+            await self.app(scope, receive, send)
+            return
+        
+        inicio = time.perf_counter()
+        with medir_etapas() as tiempos:
+            async def enviar(mensaje):
+                if mensaje["type"] == "http.response.start":
+                    valor = valor_server_timing(tiempos, time.perf_counter() - inicio)
+                    mensaje = dict(mensaje, headers=[*mensaje.get("headers", []), (b"server-timing", valor.encode())])
+                await send(mensaje)
+            
+            await self.app(scope, receive, enviar)
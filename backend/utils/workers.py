@@ -0,0 +1,41 @@
+"""
+Pool de procesos compartido para trabajo CPU intensivo (lectura y generación de Excel)
+"""
+
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from config import settings
+from utils.profiler import DIRECTORIO_CONTROL, iniciar_vigilancia_worker
+
+_pool: Optional[ProcessPoolExecutor] = None
+_lock = threading.Lock()
+
+
+def numero_workers() -> int:
+    """Cantidad de procesos configurada (0 = uno por CPU)"""
+    return settings.process_workers or os.cpu_count() or 1
+
+
+def obtener_pool_procesos() -> ProcessPoolExecutor:
+    """Obtener (creando si hace falta) el pool de procesos de la aplicación"""
+    global _pool
+    with _lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=numero_workers(),
+                initializer=iniciar_vigilancia_worker,
+                initargs=(DIRECTORIO_CONTROL,)
+            )
+        return _pool
+
+
+def cerrar_pool_procesos() -> None:
+    """Cerrar el pool de procesos si fue creado"""
+    global _pool
+    with _lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True, cancel_futures=True)
+            _pool = None